@@ -1,44 +1,55 @@
+import csv
 import datetime
 import re
 from abc import ABC
 from functools import lru_cache
 from typing import (Any, Callable, Dict, Iterable, Iterator, List, NewType,
-                    Optional, Type, TypeVar, Union)
+                    Optional, Tuple, Type, TypeVar, Union)
 
-from fastapi import Body, Depends, HTTPException, Query, Request
+import orjson
+from fastapi import (Body, Depends, File, HTTPException, Query, Request,
+                     UploadFile)
 from pydantic.fields import ModelField
 from pydantic.utils import deep_update
 from sqlalchemy import Column, Table, delete, insert
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import InstrumentedAttribute, RelationshipProperty
+from sqlalchemy.sql import Select
 from sqlalchemy.util import md5_hex
 from sqlalchemy_database import AsyncDatabase
 from sqlmodel import SQLModel, select
 from starlette import status
-from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.responses import (HTMLResponse, JSONResponse, Response,
+                                 StreamingResponse)
 from starlette.templating import Jinja2Templates
 
 import msaSDK.admin
 from msaSDK.auth.auth import Auth
-from msaCRUD import MSARouterMixin, MSASQLModelCrud, MSASQLModelSelector
+from msaCRUD import MSARouterMixin, MSASQLModelSelector
 from msaCRUD.parser import (MSASQLModelFieldParser, SQLModelField,
                             SQLModelListField, get_python_type_parse)
 from msaCRUD.schema import MSACRUDEnum, MSACRUDOut, MSACRUDPaginator
 from msaCRUD.utils import (parser_item_id, parser_str_set_list,
                            schema_create_by_schema)
+from msaSDK.crud import MSAKeysetSQLModelCrud
 from msaSDK.service import MSAApp
 
 from msaUtils.base_model import MSABaseModel
 from .frontend.components import (Action, ActionType, App, ColumnOperation,
                                   Dialog, Form, FormItem, Iframe, InputExcel,
-                                  InputTable, MSAUITpl, Page, PageSchema,
+                                  InputFile, InputTable, MSAUITpl, Page, PageSchema,
                                   Picker, Remark, Service, TableColumn,
                                   TableCRUD)
 from .frontend.constants import (DisplayModeEnum, LevelEnum, SizeEnum,
                                  TabsModeEnum)
 from .frontend.types import (MSAUIAPI, MSABaseUIApiOut, MSABaseUIModel,
                              MSAUISchemaNode)
+from .exporter import EXPORT_FORMATS, EXPORT_MEDIA_TYPES, iterExport
+from .importer import (IMPORT_FORMATS, MSAImportResult, MSAModelImporter,
+                       getImportFormat, iterImportRows)
+from .loading import MSALoadPlan, labelKey
 from .parser import MSAUIParser
+from .search import MSAFTSIndex
 from .utils.functools import cached_property
 from .utils.translation import i18n as _
 
@@ -64,8 +75,10 @@ class LinkModelForm:
             link_model: Union[SQLModel, Table],
             link_col: Column,
             item_col: Column,
+            insfield: Optional[InstrumentedAttribute] = None,
     ):
         self.link_model = link_model
+        self.insfield = insfield
         self.pk_admin = pk_admin
         self.display_admin = display_admin
         assert self.display_admin, "display_admin is None"
@@ -120,6 +133,7 @@ class LinkModelForm:
                 link_model=table,
                 link_col=link_key.parent,
                 item_col=item_key.parent,
+                insfield=insfield,
             )
         return None
 
@@ -157,6 +171,8 @@ class LinkModelForm:
                 )
             )
             result = await self.pk_admin.db.async_execute(stmt)
+            # the link_model filtered lists of the display admin changed
+            self.display_admin.on_write()
             return BaseApiOut(data=result.rowcount)  # type: ignore
 
         return route
@@ -190,6 +206,7 @@ class LinkModelForm:
                 result = await self.pk_admin.db.async_execute(stmt)
             except Exception as error:
                 return self.pk_admin.error_execute_sql(request=request, error=error)
+            self.display_admin.on_write()
             return BaseApiOut(data=result.rowcount)  # type: ignore
 
         return route
@@ -312,7 +329,7 @@ class LinkModelForm:
         return self
 
 
-class BaseModelAdmin(MSASQLModelCrud):
+class BaseModelAdmin(MSAKeysetSQLModelCrud):
     list_display: List[Union[SQLModelListField, TableColumn]] = []
     """Fields to be displayed"""
     list_per_page: int = 10
@@ -325,6 +342,16 @@ class BaseModelAdmin(MSASQLModelCrud):
     """Batch Edit Fields"""
     search_fields: List[SQLModelField] = []
     """Fuzzy search fields"""
+    search_fts: bool = False
+    """Search the search_fields through an SQLite FTS5 table, ranked by relevance"""
+    index_create: bool = False
+    """Create missing indexes of the filter columns at startup, see MSAIndexAdvisor"""
+    import_chunk_size: int = 1000
+    """Rows per insert and transaction of the file import"""
+    import_max_errors: int = 100
+    """Maximum number of row errors reported by the file import"""
+    export_batch_size: int = 1000
+    """Rows per fetch of the streaming export"""
 
     def __init__(self, app: "AdminApp", model=None):
         if model:
@@ -335,6 +362,17 @@ class BaseModelAdmin(MSASQLModelCrud):
         self.engine = self.engine or self.app.db.engine
         self.parser = MSASQLModelFieldParser(default_model=self.model)
         list_display_insfield = self.parser.filter_insfield(self.list_display)
+        # relationships are not selected as columns, the load_plan loads them per page
+        self.list_relationships: List[InstrumentedAttribute] = [
+            insfield
+            for insfield in list_display_insfield
+            if isinstance(insfield.prop, RelationshipProperty)
+        ]
+        list_display_insfield = [
+            insfield
+            for insfield in list_display_insfield
+            if not isinstance(insfield.prop, RelationshipProperty)
+        ]
         self.list_filter = self.list_filter or list_display_insfield
         self.fields = self.fields or [self.model]
         self.fields.extend(list_display_insfield)
@@ -344,6 +382,66 @@ class BaseModelAdmin(MSASQLModelCrud):
     def router_path(self) -> str:
         return self.app.router_path + self.router.prefix
 
+    @cached_property
+    def fts_index(self) -> Optional[MSAFTSIndex]:
+        if not self.search_fts or not MSAFTSIndex.supported(self.model, self.engine):
+            return None
+        fields = [
+            insfield
+            for insfield in self.parser.filter_insfield(self.search_fields)
+            if insfield.class_ is self.model
+        ]
+        return MSAFTSIndex(self.model, fields) if fields else None
+
+    @cached_property
+    def load_plan(self) -> MSALoadPlan:
+        relationships = list(self.list_relationships)
+        for insfield in self.link_model_fields:
+            if isinstance(insfield.prop, RelationshipProperty) and insfield.key not in {
+                relationship.key for relationship in relationships
+            }:
+                relationships.append(insfield)
+        # foreign key columns of the list with a ModelAdmin of the referenced table, shown by its label
+        foreign_keys = [
+            column
+            for column in self.model.__table__.columns
+            if column.foreign_keys
+               and column.name in self._list_fields_ins
+               and self.app.site.get_model_admin(list(column.foreign_keys)[0].column.table.name)
+        ]
+        return MSALoadPlan(self.model, relationships, foreign_keys)
+
+    async def on_list_after(
+            self, request: Request, items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return await self.load_plan.load(self.db, items)
+
+    async def on_startup(self) -> None:
+        """Called once after the site is mounted, builds the FTS5 search table."""
+        if self.fts_index and self.fts_index.tokenizer is None:
+            await self.fts_index.create(self.engine)
+
+    async def filter_list(
+            self, request: Request, stmt: Select, filters_data: Optional[Dict[str, Any]]
+    ) -> Tuple[Select, Optional[List[Any]]]:
+        index = self.fts_index
+        if not filters_data or index is None:
+            return await super().filter_list(request, stmt, filters_data)
+        if index.tokenizer is None:
+            await index.create(self.engine)
+        terms, filters_data = {}, dict(filters_data)
+        for name in index.fields:
+            value = filters_data.get(name)
+            if isinstance(value, str) and value.startswith("[~]"):
+                term = value[3:].strip()
+                if index.matchable(term):
+                    terms[name] = term
+                    del filters_data[name]
+        stmt, ranking = await super().filter_list(request, stmt, filters_data)
+        if not terms:
+            return stmt, ranking
+        return index.search(stmt, terms)
+
     def get_link_model_forms(self) -> List[LinkModelForm]:
         self.link_model_forms = list(
             filter(
@@ -370,6 +468,9 @@ class BaseModelAdmin(MSASQLModelCrud):
             self, request: Request, modelfield: ModelField
     ) -> TableColumn:
         column = MSAUIParser(modelfield).as_table_column()
+        if any(fk.name == modelfield.alias for fk in self.load_plan.foreign_keys):
+            column.type = "tpl"
+            column.tpl = "${%s || %s}" % (labelKey(modelfield.alias), modelfield.alias)
         if (
                 await self.has_update_permission(request, None, None)
                 and modelfield.name in self.schema_update.__fields__
@@ -388,11 +489,21 @@ class BaseModelAdmin(MSASQLModelCrud):
                     column.quickEdit.update({"mode": "inline"})
         return column
 
+    def get_list_relationship_column(self, insfield: InstrumentedAttribute) -> TableColumn:
+        name = labelKey(insfield.key)
+        if insfield.prop.uselist:
+            return TableColumn(type="tpl", label=insfield.key, name=name, tpl="${%s|join:, }" % name)
+        return TableColumn(label=insfield.key, name=name)
+
     async def get_list_columns(self, request: Request) -> List[TableColumn]:
         columns = []
         for field in await self.get_list_display(request):
             if isinstance(field, MSABaseUIModel):
                 columns.append(field)
+            elif isinstance(field, InstrumentedAttribute) and isinstance(
+                    field.prop, RelationshipProperty
+            ):
+                columns.append(self.get_list_relationship_column(field))
             elif isinstance(field, type) and issubclass(field, SQLModel):
                 ins_list = self.parser.get_sqlmodel_insfield(field)
                 modelfield_list = [
@@ -418,7 +529,12 @@ class BaseModelAdmin(MSASQLModelCrud):
                         width=160,
                         label=link_form.display_admin.page_schema.label,
                         breakpoint="*",
-                        buttons=[form],
+                        buttons=[
+                            MSAUITpl(tpl="${%s|join:, } " % labelKey(link_form.insfield.key)),
+                            form,
+                        ]
+                        if link_form.insfield is not None
+                        else [form],
                     )
                 )
         return columns
@@ -442,6 +558,22 @@ class BaseModelAdmin(MSASQLModelCrud):
             data=data,
         )
 
+    async def get_export_action(self, request: Request) -> Optional[Action]:
+        if not await self.has_list_permission(request, None, None):
+            return None
+        list_api = await self.get_list_table_api(request)
+        return ActionType.Download(
+            icon="fa fa-download pull-left",
+            label=_("Export"),
+            api=MSAUIAPI(
+                method="POST",
+                url=f"{self.router_path}/export?"
+                    + "format=csv&orderBy=${orderBy}&orderDir=${orderDir}",
+                data=list_api.data,
+                responseType="blob",
+            ),
+        )
+
     async def get_list_table(self, request: Request) -> TableCRUD:
         headerToolbar = [
             "filter-toggler",
@@ -609,6 +741,21 @@ class BaseModelAdmin(MSASQLModelCrud):
             ],
         )
 
+    async def get_import_form(self, request: Request) -> Form:
+        return Form(
+            api=f"post:{self.router_path}/import",
+            mode=DisplayModeEnum.normal,
+            body=[
+                InputFile(
+                    name="file",
+                    label=_("File"),
+                    accept=",".join("." + fmt for fmt in IMPORT_FORMATS) + ",.jsonl",
+                    asBlob=True,
+                    required=True,
+                ),
+            ],
+        )
+
     async def get_update_form(self, request: Request, bulk: bool = False) -> Form:
         if not bulk:
             api = f"put:{self.router_path}/item/${self.pk_name}"
@@ -653,6 +800,20 @@ class BaseModelAdmin(MSASQLModelCrud):
             ),
         )
 
+    async def get_import_action(self, request: Request) -> Optional[Action]:
+        if not await self.has_create_permission(request, None):
+            return None
+        return ActionType.Dialog(
+            icon="fa fa-upload pull-left",
+            label=_("Import"),
+            level=LevelEnum.primary,
+            dialog=Dialog(
+                title=_("Import"),
+                size=SizeEnum.lg,
+                body=await self.get_import_form(request),
+            ),
+        )
+
     async def get_update_action(
             self, request: Request, bulk: bool = False
     ) -> Optional[Action]:
@@ -708,6 +869,8 @@ class BaseModelAdmin(MSASQLModelCrud):
         actions = [
             await self.get_create_action(request, bulk=False),
             await self.get_create_action(request, bulk=True),
+            await self.get_import_action(request),
+            await self.get_export_action(request),
         ]
         return list(filter(None, actions))
 
@@ -725,6 +888,112 @@ class BaseModelAdmin(MSASQLModelCrud):
         ]
         return list(filter(None, bulkActions))
 
+    @property
+    def route_import(self) -> Callable:
+        async def route(
+                request: Request,
+                file: UploadFile = File(...),
+                format: Optional[str] = Query(
+                    None, description="csv, xlsx or ndjson, Default by the file suffix"
+                ),
+                stream: bool = Query(
+                    False, description="Stream the progress after every chunk as NDJSON"
+                ),
+        ):
+            if not await self.has_create_permission(request, None):
+                return self.error_no_router_permission(request)
+            try:
+                format = format or getImportFormat(file.filename, file.content_type)
+                rows = iterImportRows(file.file, format)
+            except ValueError as e:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e)) from e
+            importer = MSAModelImporter(
+                self, chunk_size=self.import_chunk_size, max_errors=self.import_max_errors
+            )
+            if stream:
+                async def progress():
+                    try:
+                        async for result in importer.run(request, rows):
+                            yield result.json() + "\n"
+                    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                        yield orjson.dumps({"error": str(e)}).decode() + "\n"
+
+                return StreamingResponse(progress(), media_type="application/x-ndjson")
+            result = MSAImportResult()
+            try:
+                async for result in importer.run(request, rows):
+                    pass
+            except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    f"Import stopped after {result.rows} rows ({result.inserted} inserted,"
+                    f" {result.failed} failed): {e}",
+                ) from e
+            return MSACRUDOut(data=result)
+
+        return route
+
+    @property
+    def route_export(self) -> Callable:
+        async def route(
+                request: Request,
+                paginator: self.paginator = Depends(self.paginator),  # type: ignore
+                filters: self.schema_filter = Body(None),  # type: ignore
+                stmt: Select = Depends(self._select_maker),
+                format: str = Query("csv", description="csv, ndjson or parquet"),
+        ):
+            if not await self.has_list_permission(request, paginator, filters):
+                return self.error_no_router_permission(request)
+            if format not in EXPORT_FORMATS:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    "Unsupported export format, use one of: " + ", ".join(EXPORT_FORMATS),
+                )
+            # the filters and ordering of /list, without paging
+            filters_data = await self.on_filter_pre(request, filters)
+            stmt, ranking = await self.filter_list(request, stmt, filters_data)
+            orderBy = self._calc_ordering(paginator.orderBy, paginator.orderDir)
+            if ranking and not paginator.orderBy:
+                orderBy = ranking
+            if orderBy:
+                stmt = stmt.order_by(*orderBy)
+            try:
+                content = iterExport(
+                    self.engine, stmt, format=format, batch_size=self.export_batch_size
+                )
+            except ValueError as e:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e)) from e
+            filename = f"{self.model.__tablename__}.{format}"
+            return StreamingResponse(
+                content,
+                media_type=EXPORT_MEDIA_TYPES[format],
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            )
+
+        return route
+
+    def register_export(self):
+        """Register the streaming export route ``POST /export``, filtered like ``POST /list``."""
+        self.router.add_api_route(
+            "/export",
+            self.route_export,
+            methods=["POST"],
+            response_class=StreamingResponse,
+            name="export",
+        )
+        return self
+
+    def register_import(self):
+        """Register the streaming file import route ``POST /import``."""
+        self.router.add_api_route(
+            "/import",
+            self.route_import,
+            methods=["POST"],
+            response_model=MSACRUDOut[MSAImportResult],
+            name="import",
+        )
+        return self
+
     async def _conv_modelfields_to_formitems(
             self,
             request: Request,
@@ -1095,6 +1364,8 @@ class ModelAdmin(BaseModelAdmin, PageAdmin):
         for form in self.link_model_forms:
             form.register_router()
         self.register_crud()
+        self.register_import()
+        self.register_export()
         super(ModelAdmin, self).register_router()
         return self
 
@@ -1368,6 +1639,20 @@ class AdminApp(PageAdmin, AdminGroup):
             self.__register_lock = True
         return self
 
+    async def on_startup(self) -> None:
+        """Run the startup hooks of the registered ModelAdmins and sub AdminApps."""
+        for admin in self._registered.values():
+            if isinstance(admin, (BaseModelAdmin, AdminApp)):
+                await admin.on_startup()
+
+    def iter_model_admins(self) -> Iterator[BaseModelAdmin]:
+        """Iterate the registered ModelAdmins, also of the sub AdminApps."""
+        for admin in self._registered.values():
+            if isinstance(admin, BaseModelAdmin):
+                yield admin
+            elif isinstance(admin, AdminApp):
+                yield from admin.iter_model_admins()
+
     @lru_cache()
     def get_model_admin(self, table_name: str) -> Optional[ModelAdmin]:
         """
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Streaming Export for Admin Models.
+
+``iterRowBatches`` runs a select with a server-side cursor and yields the rows in batches of ``yield_per``,
+``iterExport`` encodes the batches as CSV, NDJSON or Parquet (one row group per batch) while they arrive, so
+the memory of an export does not grow with the size of the table.
+"""
+import csv
+import datetime
+import decimal
+import io
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+import orjson
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql import Select
+from starlette.concurrency import iterate_in_threadpool
+
+if __name__ == "__main__":
+    pass
+
+EXPORT_FORMATS: Tuple[str, ...] = ("csv", "ndjson", "parquet")
+"""Supported export formats."""
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+"""Media types of the export formats, the response adds ``charset=utf-8`` to ``text/*`` types."""
+
+
+async def iterRowBatches(
+    engine: Union[Engine, AsyncEngine], stmt: Select, batch_size: int = 1000
+) -> AsyncIterator[Sequence[Any]]:
+    """Execute a select with a server-side cursor and yield the rows batch by batch.
+
+    Args:
+        engine: Sync or async SQLAlchemy engine
+        stmt: The select
+        batch_size: Rows fetched per round trip (``yield_per``), Default 1000
+
+    Returns:
+        batches: Async iterator of row lists
+    """
+    stmt = stmt.execution_options(yield_per=batch_size)
+    if isinstance(engine, AsyncEngine):
+        async with engine.connect() as conn:
+            result = await conn.stream(stmt)
+            async for batch in result.partitions(batch_size):  # type: ignore
+                yield batch
+        return
+
+    def batches():
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(stmt)
+            for batch in result.partitions(batch_size):
+                yield batch
+
+    async for batch in iterate_in_threadpool(batches()):
+        yield batch
+
+
+def _csvValue(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+async def _iterCSV(
+    columns: List[str], batches: AsyncIterator[Sequence[Any]]
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows([_csvValue(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _iterNDJSON(
+    columns: List[str], batches: AsyncIterator[Sequence[Any]]
+) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(
+            orjson.dumps(dict(zip(columns, row)), default=str) + b"\n" for row in batch
+        )
+
+
+class _Drain(io.RawIOBase):
+    # file object for the ParquetWriter, the written bytes are handed on after every row group
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrowType(column, pa):
+    try:
+        python_type = column.type.python_type
+    except (NotImplementedError, AttributeError):
+        return None
+    # bool before int, it is a subclass
+    for types, arrow_type in (
+        (bool, pa.bool_()),
+        (int, pa.int64()),
+        (float, pa.float64()),
+        (decimal.Decimal, pa.float64()),
+        (datetime.datetime, pa.timestamp("us")),
+        (datetime.date, pa.date32()),
+        (datetime.time, pa.time64("us")),
+        (bytes, pa.binary()),
+        (str, pa.string()),
+    ):
+        if issubclass(python_type, types):
+            return arrow_type
+    return None
+
+
+async def _iterParquet(
+    stmt: Select, columns: List[str], batches: AsyncIterator[Sequence[Any]], pa, pq
+) -> AsyncIterator[bytes]:
+    types = [_arrowType(column, pa) for column in stmt.selected_columns]
+    # other types (enums, json) are exported as text
+    schema = pa.schema(
+        [(name, arrow_type or pa.string()) for name, arrow_type in zip(columns, types)]
+    )
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in batches:
+            data = {}
+            for index, (name, arrow_type) in enumerate(zip(columns, types)):
+                values = [row[index] for row in batch]
+                if arrow_type is None:
+                    values = [None if value is None else str(value) for value in values]
+                data[name] = values
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iterExport(
+    engine: Union[Engine, AsyncEngine],
+    stmt: Select,
+    format: str = "csv",
+    batch_size: int = 1000,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[bytes]:
+    """Stream the result of a select encoded as export file.
+
+    Args:
+        engine: Sync or async SQLAlchemy engine
+        stmt: The select, with filters and ordering applied
+        format: One of ``EXPORT_FORMATS``, Default csv
+        batch_size: Rows per fetch and per encoded chunk, Default 1000
+        columns: Column names of the file, Default the names of the selected columns
+
+    Returns:
+        chunks: Async iterator of the encoded bytes, for a ``StreamingResponse``
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError("Unsupported export format: " + str(format))
+    columns = columns or list(stmt.selected_columns.keys())
+    batches = iterRowBatches(engine, stmt, batch_size)
+    if format == "csv":
+        return _iterCSV(columns, batches)
+    if format == "ndjson":
+        return _iterNDJSON(columns, batches)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("Parquet export needs the pyarrow package") from e
+    return _iterParquet(stmt, columns, batches, pa, pq)
@@ -400,6 +400,10 @@ class ActionType:
         messages: Optional[Dict] = None
         """ success: ajax operation success prompt, can not be specified, not specified when the api return prevail. failed: ajax operation failure prompt."""
 
+    class Download(Ajax):
+        actionType: str = "download"
+        """ Send the api request and save the response as file"""
+
     class Dialog(Action):
         actionType: str = "dialog"
         """ Show a popup box when clicked."""
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""Streaming Bulk Import for Admin Models.
+
+``iterImportRows`` reads the rows of an uploaded CSV, XLSX or NDJSON file one by one. ``MSAModelImporter``
+validates them against the ``schema_create`` of a ModelAdmin and inserts them chunk by chunk with
+``executemany``, each chunk in its own transaction. A failing chunk is retried row by row, so a bad row is
+reported with its row number and does not discard the rest of the chunk.
+"""
+import codecs
+import csv
+import os
+from typing import IO, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from msaUtils.base_model import MSABaseModel
+
+if __name__ == "__main__":
+    pass
+
+IMPORT_FORMATS: Tuple[str, ...] = ("csv", "xlsx", "ndjson")
+"""Supported upload formats."""
+
+
+class MSAImportRowError(MSABaseModel):
+    """Import Error of one Row"""
+
+    row: int
+    """Row number in the file, the first data row is 1."""
+    errors: List[Dict[str, Any]] = []
+    """Validation errors like ``ValidationError.errors()``, or one ``{"msg": ...}`` for database errors."""
+
+
+class MSAImportResult(MSABaseModel):
+    """Import Progress and Result"""
+
+    rows: int = 0
+    """Rows read so far."""
+    inserted: int = 0
+    """Rows inserted so far."""
+    failed: int = 0
+    """Rows rejected so far."""
+    errors: List[MSAImportRowError] = []
+    """Errors of the rejected rows, at most ``max_errors``."""
+    done: bool = False
+    """True once the whole file is processed."""
+
+
+class MSAImportFileError(ValueError):
+    """Raised if the import file can't be read further, the rows before ``row`` are imported and reported.
+
+    Args:
+        row: Row number the reader failed at
+        error: The error of the reader
+    """
+
+    def __init__(self, row: int, error: Exception) -> None:
+        super().__init__("Row {}: {}".format(row, error))
+        self.row = row
+
+
+class _InvalidRow:
+    # a line the reader could not parse into a row, reported as error of that row
+    def __init__(self, msg: str) -> None:
+        self.msg = msg
+
+
+def getImportFormat(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """Detect the upload format by the file suffix, else by the content type.
+
+    Args:
+        filename: Name of the uploaded file
+        content_type: MIME type of the upload
+
+    Returns:
+        format: One of ``IMPORT_FORMATS``
+
+    Raises:
+        ValueError: For an unsupported file
+    """
+    suffix = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if suffix in ("jsonl", "json"):
+        suffix = "ndjson"
+    if suffix in IMPORT_FORMATS:
+        return suffix
+    content_type = content_type or ""
+    if "csv" in content_type:
+        return "csv"
+    if "spreadsheetml" in content_type:
+        return "xlsx"
+    if "json" in content_type:
+        return "ndjson"
+    raise ValueError(
+        "Unsupported import file, use one of: " + ", ".join(IMPORT_FORMATS)
+    )
+
+
+def _iterCSV(file: IO[bytes], encoding: str) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(codecs.iterdecode(file, encoding))
+    for row in reader:
+        # empty cells are missing values, the field defaults apply
+        yield {key: value for key, value in row.items() if key and value != ""}
+
+
+def _iterXLSX(file: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ValueError("XLSX import needs the openpyxl package") from e
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name) if name is not None else None for name in next(rows, ())]
+        for values in rows:
+            row = {
+                key: value
+                for key, value in zip(header, values)
+                if key and value is not None and value != ""
+            }
+            if row:
+                yield row
+    finally:
+        workbook.close()
+
+
+def _iterNDJSON(file: IO[bytes]) -> Iterator[Any]:
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            row = _InvalidRow("Invalid JSON: " + str(e))
+        yield row
+
+
+def iterImportRows(
+    file: IO[bytes], format: str, encoding: str = "utf-8-sig"
+) -> Iterator[Dict[str, Any]]:
+    """Read the rows of an import file incrementally.
+
+    Args:
+        file: Binary file object, like ``UploadFile.file``
+        format: One of ``IMPORT_FORMATS``
+        encoding: Text encoding of CSV files, Default utf-8 with optional BOM
+
+    Returns:
+        rows: Iterator of ``{column: value}``, CSV values are strings, unparsable NDJSON lines are reported
+            by ``MSAModelImporter`` as row errors
+    """
+    if format == "csv":
+        return _iterCSV(file, encoding)
+    if format == "xlsx":
+        return _iterXLSX(file)
+    if format == "ndjson":
+        return _iterNDJSON(file)
+    raise ValueError("Unsupported import format: " + str(format))
+
+
+class MSAModelImporter:
+    """Validates and inserts the rows of an import file for a ModelAdmin.
+
+    The columns may be named by field name, alias or title (the column labels of the list and the bulk create form).
+
+    Args:
+        admin: The BaseModelAdmin
+        chunk_size: Rows per ``executemany`` and transaction, Default 1000
+        max_errors: Maximum number of row errors kept in the result, Default 100
+
+    Examples:
+    ```python
+    importer = MSAModelImporter(admin)
+    async for progress in importer.run(request, iterImportRows(upload.file, "csv")):
+        print(progress.inserted, progress.failed)
+    ```
+    """
+
+    def __init__(self, admin, chunk_size: int = 1000, max_errors: int = 100) -> None:
+        self.admin = admin
+        self.chunk_size = max(1, chunk_size)
+        self.max_errors = max_errors
+        self.columns: Dict[str, str] = {}
+        for field in admin.schema_create.__fields__.values():
+            for key in (field.field_info.title, field.name, field.alias):
+                if key:
+                    self.columns[key] = field.alias
+
+    def _readChunk(
+        self, rows: Iterator[Any], start: int
+    ) -> Tuple[
+        List[Tuple[int, Any]],
+        List[MSAImportRowError],
+        int,
+        Optional[MSAImportFileError],
+    ]:
+        # runs in a worker thread, reading and validating are blocking
+        valid: List[Tuple[int, Any]] = []
+        errors: List[MSAImportRowError] = []
+        count = 0
+        while count < self.chunk_size:
+            try:
+                row = next(rows, None)
+            except Exception as e:
+                # the file can't be read further, the rows read so far are still imported
+                return valid, errors, count, MSAImportFileError(start + count + 1, e)
+            if row is None:
+                break
+            count += 1
+            rowno = start + count
+            if isinstance(row, _InvalidRow):
+                errors.append(MSAImportRowError(row=rowno, errors=[{"msg": row.msg}]))
+                continue
+            if not isinstance(row, dict):
+                errors.append(
+                    MSAImportRowError(
+                        row=rowno, errors=[{"msg": "Row is not an object"}]
+                    )
+                )
+                continue
+            data = {self.columns.get(key, key): value for key, value in row.items()}
+            try:
+                valid.append((rowno, self.admin.schema_create.parse_obj(data)))
+            except ValidationError as e:
+                errors.append(MSAImportRowError(row=rowno, errors=e.errors()))
+        return valid, errors, count, None
+
+    def _insertGroups(self, session, values: List[Dict[str, Any]]) -> None:
+        # executemany needs the same keys in every row, a row may leave out an optional primary key
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for value in values:
+            groups.setdefault(tuple(value), []).append(value)
+        for group in groups.values():
+            session.execute(insert(self.admin.model), group)
+
+    async def _insert(self, values: List[Dict[str, Any]]) -> None:
+        # all groups in one transaction, a failing group rolls back the whole chunk
+        await self.admin.db.async_run_sync(self._insertGroups, values)
+
+    async def _insertChunk(
+        self, request: Request, valid: List[Tuple[int, Any]]
+    ) -> Tuple[int, List[MSAImportRowError]]:
+        values = [await self.admin.on_create_pre(request, obj) for _, obj in valid]
+        if not values:
+            return 0, []
+        try:
+            await self._insert(values)
+            return len(values), []
+        except Exception:
+            # the chunk is rolled back, find the failing rows one by one
+            pass
+        inserted = 0
+        errors: List[MSAImportRowError] = []
+        for (rowno, _), value in zip(valid, values):
+            try:
+                await self.admin.db.async_execute(insert(self.admin.model), [value])
+                inserted += 1
+            except Exception as e:
+                errors.append(
+                    MSAImportRowError(
+                        row=rowno, errors=[{"msg": str(getattr(e, "orig", e))}]
+                    )
+                )
+        return inserted, errors
+
+    async def run(
+        self, request: Request, rows: Iterator[Any]
+    ) -> AsyncIterator[MSAImportResult]:
+        """Import the rows, yields the progress after every chunk, the last result has ``done`` set.
+
+        Args:
+            request: The request, passed to ``on_create_pre``
+            rows: The rows, see ``iterImportRows``
+
+        Returns:
+            progress: Async iterator of MSAImportResult
+
+        Raises:
+            MSAImportFileError: If the file can't be read further, after the rows before were imported
+        """
+        result = MSAImportResult()
+        while True:
+            valid, errors, count, fatal = await run_in_threadpool(
+                self._readChunk, rows, result.rows
+            )
+            if not count:
+                if fatal is not None:
+                    raise fatal
+                break
+            result.rows += count
+            inserted, insert_errors = await self._insertChunk(request, valid)
+            errors.extend(insert_errors)
+            errors.sort(key=lambda error: error.row)
+            result.inserted += inserted
+            if inserted:
+                self.admin.on_write()
+            result.failed += len(errors)
+            result.errors.extend(errors[: max(0, self.max_errors - len(result.errors))])
+            yield result
+            if fatal is not None:
+                raise fatal
+        result.done = True
+        yield result
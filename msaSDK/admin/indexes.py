@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Index Advisor for the Filter Columns of Admin Models.
+
+``MSAIndexAdvisor`` collects the columns the list pages of ModelAdmins filter on: the ``list_filter`` fields
+(equality), their date and time fields (``[-]`` range), the ``search_fields`` (``[~]`` LIKE) and the foreign keys
+(picker and inline filters). It reports the columns without an index that leads with them, creates the
+missing indexes when opted in and checks with ``EXPLAIN QUERY PLAN`` (SQLite) that the filter query uses one.
+"""
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql.schema import Column
+
+from msaUtils.base_model import MSABaseModel
+
+if __name__ == "__main__":
+    pass
+
+INDEX_REASONS: Tuple[str, ...] = ("list_filter", "date_range", "foreign_key", "search")
+"""Why a column is a candidate, ``search`` (``LIKE '%term%'``) alone can not use a b-tree index."""
+
+
+class MSAIndexAdvice(MSABaseModel):
+    """Index Advice for one Column"""
+
+    table: str
+    """Table name."""
+    column: str
+    """Column name."""
+    reasons: List[str] = []
+    """Filters using the column, see ``INDEX_REASONS``."""
+    admins: List[str] = []
+    """Class names of the ModelAdmins using the column."""
+    status: str = "missing"
+    """``indexed``, ``missing``, ``created``, ``fts`` (searched through the FTS5 table), ``unindexable`` or ``error``."""
+    index: Optional[str] = None
+    """Name of the index leading with the column, if any."""
+    plan: Optional[str] = None
+    """``EXPLAIN QUERY PLAN`` of the filter query, SQLite only."""
+    uses_index: Optional[bool] = None
+    """True if the plan searches an index, None if not verified."""
+    error: Optional[str] = None
+    """Database error of the check, like a missing table."""
+
+    @property
+    def message(self) -> str:
+        line = "{}.{} ({}): {}".format(
+            self.table, self.column, ", ".join(self.reasons), self.status
+        )
+        if self.index:
+            line += " " + self.index
+        elif self.status == "unindexable":
+            line += ", LIKE '%term%' scans the table, see search_fts"
+        if self.plan is not None:
+            line += " | " + self.plan
+        if self.error:
+            line += " | " + self.error
+        return line
+
+
+def _isDateColumn(column: Column) -> bool:
+    try:
+        return issubclass(
+            column.type.python_type, (datetime.datetime, datetime.date, datetime.time)
+        )
+    except NotImplementedError:
+        return False
+
+
+def _leadingIndexes(sync_conn, table_name: str) -> Dict[str, str]:
+    # first column of every index, primary key and unique constraint -> its name
+    insp = inspect(sync_conn)
+    leading: Dict[str, str] = {}
+    pk = insp.get_pk_constraint(table_name)
+    if pk.get("constrained_columns"):
+        leading[pk["constrained_columns"][0]] = pk.get("name") or "PRIMARY KEY"
+    for constraint in insp.get_unique_constraints(table_name):
+        if constraint.get("column_names"):
+            leading.setdefault(
+                constraint["column_names"][0], constraint.get("name") or "UNIQUE"
+            )
+    for index in insp.get_indexes(table_name):
+        if index.get("column_names") and index["column_names"][0]:
+            leading.setdefault(index["column_names"][0], index["name"])
+    return leading
+
+
+class MSAIndexAdvisor:
+    """Analyses the filter columns of ModelAdmins and creates missing indexes.
+
+    Args:
+        admins: The BaseModelAdmins, like ``AdminApp.iter_model_admins()``
+
+    Examples:
+    ```python
+    advisor = MSAIndexAdvisor(site.iter_model_admins())
+    for advice in await advisor.run(create=False):
+        print(advice.message)
+    ```
+    """
+
+    def __init__(self, admins: Iterable[Any]) -> None:
+        self.admins = list(admins)
+
+    def collect(self) -> Dict[Tuple[AsyncEngine, str, str], MSAIndexAdvice]:
+        """Candidate columns of all admins, by engine, table and column.
+
+        Returns:
+            candidates: MSAIndexAdvice without status per column
+        """
+        candidates: Dict[Tuple[AsyncEngine, str, str], MSAIndexAdvice] = {}
+
+        def add(admin, column: Column, reason: str) -> None:
+            if (
+                column is None
+                or column.table is None
+                or not hasattr(column.table, "name")
+            ):
+                return
+            key = (admin.engine, column.table.name, column.name)
+            advice = candidates.setdefault(
+                key, MSAIndexAdvice(table=column.table.name, column=column.name)
+            )
+            if reason not in advice.reasons:
+                advice.reasons.append(reason)
+            if admin.__class__.__name__ not in advice.admins:
+                advice.admins.append(admin.__class__.__name__)
+
+        for admin in self.admins:
+            for insfield in admin.parser.filter_insfield(admin.list_filter):
+                column = insfield.class_.__table__.columns.get(insfield.key)
+                if column is not None:
+                    add(
+                        admin,
+                        column,
+                        "date_range" if _isDateColumn(column) else "list_filter",
+                    )
+            for insfield in admin.parser.filter_insfield(admin.search_fields):
+                add(
+                    admin, insfield.class_.__table__.columns.get(insfield.key), "search"
+                )
+            for column in admin.model.__table__.columns:
+                if column.foreign_keys:
+                    add(admin, column, "foreign_key")
+        return candidates
+
+    @staticmethod
+    def _filterSQL(quote, advice: MSAIndexAdvice, pk: str) -> str:
+        column = quote(advice.column)
+        if advice.reasons == ["search"]:
+            where = f"{column} LIKE :a"
+        elif "date_range" in advice.reasons:
+            where = f"{column} >= :a AND {column} <= :b"
+        else:
+            where = f"{column} = :a"
+        return f"SELECT {quote(pk)} FROM {quote(advice.table)} WHERE {where}"
+
+    async def explain(self, engine: AsyncEngine, advice: MSAIndexAdvice) -> None:
+        """Set ``plan`` and ``uses_index`` of an advice from ``EXPLAIN QUERY PLAN`` of its filter query.
+
+        Only SQLite has a plan which does not depend on the table statistics, other databases stay unverified.
+
+        Args:
+            engine: The async engine of the table
+            advice: The advice to verify
+        """
+        if engine.dialect.name != "sqlite":
+            return
+        quote = engine.dialect.identifier_preparer.quote
+        async with engine.connect() as conn:
+            pk = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_pk_constraint(advice.table)
+            )
+            sql = self._filterSQL(
+                quote, advice, (pk.get("constrained_columns") or ["rowid"])[0]
+            )
+            rows = (
+                await conn.execute(
+                    text("EXPLAIN QUERY PLAN " + sql), {"a": None, "b": None}
+                )
+            ).all()
+        advice.plan = "; ".join(str(row[-1]) for row in rows)
+        advice.uses_index = any(
+            str(row[-1]).startswith("SEARCH") and " USING " in str(row[-1])
+            for row in rows
+        )
+
+    async def run(self, create: bool = False) -> List[MSAIndexAdvice]:
+        """Check every candidate column, optionally create the missing indexes.
+
+        Args:
+            create: Create the missing indexes of all admins, else only of admins with ``index_create``
+
+        Returns:
+            advices: One MSAIndexAdvice per column
+        """
+        create_admins = {
+            admin.__class__.__name__
+            for admin in self.admins
+            if getattr(admin, "index_create", False)
+        }
+        fts_columns = {
+            (admin.model.__tablename__, field)
+            for admin in self.admins
+            if getattr(admin, "fts_index", None) is not None
+            for field in admin.fts_index.fields
+        }
+        advices: List[MSAIndexAdvice] = []
+        leading: Dict[Tuple[AsyncEngine, str], Dict[str, str]] = {}
+        for (engine, table_name, column_name), advice in self.collect().items():
+            try:
+                await self._check(
+                    engine, advice, leading, create, create_admins, fts_columns
+                )
+            except SQLAlchemyError as e:
+                # e.g. the table is not created yet, the other columns are still checked
+                advice.status = "error"
+                advice.error = str(getattr(e, "orig", None) or e)
+            advices.append(advice)
+        return advices
+
+    async def _check(
+        self,
+        engine: AsyncEngine,
+        advice: MSAIndexAdvice,
+        leading: Dict[Tuple[AsyncEngine, str], Dict[str, str]],
+        create: bool,
+        create_admins: set,
+        fts_columns: set,
+    ) -> None:
+        table_name, column_name = advice.table, advice.column
+        if (engine, table_name) not in leading:
+            async with engine.connect() as conn:
+                leading[engine, table_name] = await conn.run_sync(
+                    _leadingIndexes, table_name
+                )
+        advice.index = leading[engine, table_name].get(column_name)
+        if advice.index:
+            advice.status = "indexed"
+        elif advice.reasons == ["search"]:
+            # a leading wildcard LIKE scans the table with or without a b-tree index
+            advice.status = (
+                "fts" if (table_name, column_name) in fts_columns else "unindexable"
+            )
+        elif create or create_admins.intersection(advice.admins):
+            quote = engine.dialect.identifier_preparer.quote
+            name = "ix_{}_{}".format(table_name, column_name)
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(
+                        f"CREATE INDEX {quote(name)} ON {quote(table_name)} ({quote(column_name)})"
+                    )
+                )
+            leading[engine, table_name][column_name] = name
+            advice.index = name
+            advice.status = "created"
+        if advice.status != "fts":
+            await self.explain(engine, advice)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""SQLite FTS5 Full-Text Search for Admin search_fields.
+
+``MSAFTSIndex`` maintains an external content FTS5 table ``<table>_fts`` over the search columns of a model. Triggers
+on the model table keep it in sync with every write, also writes outside of the admin. With the trigram
+tokenizer (SQLite 3.34+) a search term matches like ``LIKE '%term%'`` for terms of three or more characters and
+the matches are ranked by bm25, with older SQLite versions the unicode61 tokenizer matches word prefixes.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import column, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import Select
+
+if __name__ == "__main__":
+    pass
+
+FTS_TOKENIZERS: Tuple[str, ...] = ("trigram", "unicode61")
+"""Tokenizers in order of preference."""
+
+
+class MSAFTSIndex:
+    """FTS5 shadow table of the search columns of a model.
+
+    Args:
+        model: The SQLModel table model, needs an integer primary key
+        fields: Columns of the model to index
+
+    Examples:
+    ```python
+    index = MSAFTSIndex(Article, [Article.title, Article.body])
+    await index.create(engine)
+    stmt, ranking = index.search(select(Article), {"title": "fast api"})
+    ```
+    """
+
+    def __init__(self, model, fields: List[InstrumentedAttribute]) -> None:
+        self.model = model
+        self.pk = model.__table__.primary_key.columns.values()[0]
+        self.fields = [field.key for field in fields]
+        self.name = model.__tablename__ + "_fts"
+        self.tokenizer: Optional[str] = None
+        self.table = table(
+            self.name, column("rowid"), column("rank"), column(self.name)
+        )
+
+    @classmethod
+    def supported(cls, model, engine: AsyncEngine) -> bool:
+        """True for SQLite databases and models with an integer primary key."""
+        if engine.dialect.name != "sqlite":
+            return False
+        pk = model.__table__.primary_key.columns.values()
+        try:
+            return len(pk) == 1 and pk[0].type.python_type is int
+        except NotImplementedError:
+            return False
+
+    def _ddl(self, quote, tokenizer: str) -> List[str]:
+        source = quote(self.model.__tablename__)
+        name = quote(self.name)
+        pk = quote(self.pk.name)
+        columns = ", ".join(quote(field) for field in self.fields)
+        new = ", ".join("new." + quote(field) for field in self.fields)
+        old = ", ".join("old." + quote(field) for field in self.fields)
+        delete = f"INSERT INTO {name}({name}, rowid, {columns}) VALUES ('delete', old.{pk}, {old});"
+        insert = f"INSERT INTO {name}(rowid, {columns}) VALUES (new.{pk}, {new});"
+        return [
+            f"CREATE VIRTUAL TABLE {name} USING fts5({columns}, content={source}, "
+            f"content_rowid={pk}, tokenize='{tokenizer}')",
+            f"CREATE TRIGGER {quote(self.name + '_ai')} AFTER INSERT ON {source} BEGIN {insert} END",
+            f"CREATE TRIGGER {quote(self.name + '_ad')} AFTER DELETE ON {source} BEGIN {delete} END",
+            f"CREATE TRIGGER {quote(self.name + '_au')} AFTER UPDATE ON {source} BEGIN {delete} {insert} END",
+            f"INSERT INTO {name}({name}) VALUES ('rebuild')",
+        ]
+
+    def _drop(self, quote) -> List[str]:
+        return [
+            f"DROP TRIGGER IF EXISTS {quote(self.name + suffix)}"
+            for suffix in ("_ai", "_ad", "_au")
+        ] + [f"DROP TABLE IF EXISTS {quote(self.name)}"]
+
+    async def create(self, engine: AsyncEngine) -> bool:
+        """Create the FTS5 table and the triggers and index the existing rows, if not done yet.
+
+        An index over other columns (``search_fields`` changed) is rebuilt.
+
+        Args:
+            engine: The async SQLite engine
+
+        Returns:
+            created: True if the index was (re)built
+        """
+        quote = engine.dialect.identifier_preparer.quote
+        async with engine.begin() as conn:
+            sql = (
+                await conn.execute(
+                    text(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+                    ),
+                    {"name": self.name},
+                )
+            ).scalar()
+            if sql:
+                for tokenizer in FTS_TOKENIZERS:
+                    if self._ddl(quote, tokenizer)[0] == sql:
+                        self.tokenizer = tokenizer
+                        return False
+                for statement in self._drop(quote):
+                    await conn.execute(text(statement))
+        for tokenizer in FTS_TOKENIZERS:
+            try:
+                async with engine.begin() as conn:
+                    for statement in self._ddl(quote, tokenizer):
+                        await conn.execute(text(statement))
+                self.tokenizer = tokenizer
+                return True
+            except OperationalError:
+                # no trigram tokenizer before SQLite 3.34, or no FTS5 at all
+                continue
+        return False
+
+    def matchable(self, term: str) -> bool:
+        """True if the FTS table answers a ``LIKE '%term%'`` search for the term."""
+        if not self.tokenizer or "%" in term or "_" in term:
+            return False
+        return len(term) >= 3 if self.tokenizer == "trigram" else bool(term.strip())
+
+    def match_query(self, terms: Dict[str, str]) -> str:
+        """FTS5 query of ``{column: term}``, all terms have to match."""
+        parts = []
+        for field, term in terms.items():
+            phrase = '"' + term.replace('"', '""') + '"'
+            if self.tokenizer != "trigram":
+                phrase += "*"
+            parts.append(f'"{field}" : {phrase}')
+        return " AND ".join(parts)
+
+    def search(self, stmt: Select, terms: Dict[str, str]) -> Tuple[Select, List[Any]]:
+        """Restrict a select of the model to the rows matching the terms.
+
+        Args:
+            stmt: Select of the model
+            terms: Search term per column
+
+        Returns:
+            stmt, ranking: The joined select and the ORDER BY clauses by relevance
+        """
+        stmt = stmt.join(self.table, self.table.c.rowid == self.pk).where(
+            self.table.c[self.name].op("MATCH")(self.match_query(terms))
+        )
+        return stmt, [self.table.c.rank, self.pk]
@@ -0,0 +1,516 @@
+# -*- coding: utf-8 -*-
+"""Keyset Pagination and Count Cache for the SQLModel CRUD Routers.
+
+``MSAKeysetSQLModelCrud`` is a ``MSASQLModelCrud`` whose ``POST /list`` pages by key instead of ``OFFSET``: the
+query continues after the sort value and primary key of the last row of the previous page, so deep pages cost
+the same as the first one.
+
+- API clients pass the opaque ``next_cursor`` of a page as ``cursor`` to get the next page.
+- Page numbers (the admin tables) keep working, the boundary of every served page is remembered, so the next
+  page of the same query is read by key too. Unknown pages fall back to ``OFFSET``.
+- Sorting by a nullable column, a column of another model or the custom ``ordering`` falls back to ``OFFSET``,
+  keyset needs a total order without NULLs.
+
+The ``total`` of a list comes from the ``MSACountCache``, keyed by the database, the table and the normalised
+filter SQL and invalidated by the writes through any CRUD router of the table. With ``count_approximate``
+unfiltered totals of big tables are estimated from the database statistics instead of a full ``COUNT(*)``.
+
+Used by the CRUD routers of MSAApp and the ModelAdmins.
+"""
+import base64
+import binascii
+import functools
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import orjson
+from fastapi import Body, Depends, HTTPException, Query
+from msaCRUD import MSASQLModelCrud
+from msaCRUD.parser import get_python_type_parse
+from msaCRUD.schema import MSACRUDListSchema, MSACRUDOut
+from pydantic import BaseModel
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.future import select
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import Select
+from starlette import status
+from starlette.requests import Request
+
+if __name__ == "__main__":
+    pass
+
+
+class MSAKeyset:
+    """Sort key of a keyset paginated query: an optional sort column and the primary key as tie breaker.
+
+    Args:
+        pk: Primary key attribute
+        column: Sort column attribute, None to sort by the primary key only
+        desc: Descending order
+        name: Name of the ordering in the cursor, ``orderBy`` of the request
+    """
+
+    def __init__(
+        self,
+        pk: InstrumentedAttribute,
+        column: Optional[InstrumentedAttribute] = None,
+        desc: bool = False,
+        name: Optional[str] = None,
+    ) -> None:
+        self.pk = pk
+        self.column = column
+        self.desc = desc
+        self.name = name
+        self.attributes: List[InstrumentedAttribute] = (
+            [pk] if column is None else [column, pk]
+        )
+
+    def order_by(self) -> list:
+        """ORDER BY clauses."""
+        return [attr.desc() if self.desc else attr.asc() for attr in self.attributes]
+
+    def after(self, values: List[Any]):
+        """WHERE clause selecting the rows after the key ``values``."""
+        clause = None
+        # (a, b) > (x, y) as  a >= x AND (a > x OR b > y), without row values and with a range on a for the index
+        for attr, value in reversed(list(zip(self.attributes, values))):
+            if clause is None:
+                clause = attr < value if self.desc else attr > value
+            elif self.desc:
+                clause = and_(attr <= value, or_(attr < value, clause))
+            else:
+                clause = and_(attr >= value, or_(attr > value, clause))
+        return clause
+
+    def encode(self, values: List[Any]) -> str:
+        """Opaque cursor of a key."""
+        data = orjson.dumps([self.name, self.desc, values], default=str)
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        """Key of a cursor.
+
+        Raises:
+            ValueError: Malformed cursor or a cursor of another ordering
+        """
+        try:
+            name, desc, values = orjson.loads(
+                base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            )
+        except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError) as e:
+            raise ValueError("Malformed cursor") from e
+        if (
+            name != self.name
+            or desc != self.desc
+            or len(values) != len(self.attributes)
+        ):
+            raise ValueError("Cursor does not match the ordering")
+        return [
+            get_python_type_parse(attr)(value)
+            for attr, value in zip(self.attributes, values)
+        ]
+
+
+class MSACountCacheStats(BaseModel):
+    """
+    **MSACountCacheStats** Pydantic Response Class, metrics of the MSACountCache
+    """
+
+    entries: int = 0
+    """Number of cached counts."""
+    hits: int = 0
+    """Counts answered from the cache."""
+    misses: int = 0
+    """Counts queried from the database."""
+    invalidations: int = 0
+    """Writes which outdated the counts of a table."""
+    approximations: int = 0
+    """Totals estimated from the database statistics."""
+
+
+class MSACountCache:
+    """LRU cache of list counts, keyed by ``(table, normalised filter)``.
+
+    Every table has a write version, ``invalidate`` increments it and outdates all counts of the table. Entries
+    also expire after ``ttl`` seconds, for writes outside of the CRUD routers. The CRUD routers key the tables by
+    their ``count_table``, the database URL and the table name.
+
+    Args:
+        max_entries: Maximum number of cached counts, Default 4096
+        ttl: Seconds a count stays valid, Default 60
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 60.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self.invalidations: int = 0
+        self.approximations: int = 0
+        self._versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, float, int]]" = (
+            OrderedDict()
+        )
+
+    def version(self, table: str) -> int:
+        """Write version of a table."""
+        return self._versions.get(table, 0)
+
+    def get(self, table: str, key: Hashable) -> Optional[int]:
+        """Cached count, None if missing, expired or outdated by a write."""
+        entry = self._entries.get((table, key))
+        if entry is not None:
+            version, expires, count = entry
+            if version == self.version(table) and expires >= time.monotonic():
+                self._entries.move_to_end((table, key))
+                self.hits += 1
+                return count
+            del self._entries[(table, key)]
+        self.misses += 1
+        return None
+
+    def set(
+        self, table: str, key: Hashable, count: int, version: Optional[int] = None
+    ) -> None:
+        """Store a count.
+
+        Args:
+            table: Table name
+            key: Normalised filter
+            count: The count
+            version: Write version of the table before the count query started, Default the current one,
+                a write during the query outdates the count
+        """
+        if version is None:
+            version = self.version(table)
+        self._entries[(table, key)] = (version, time.monotonic() + self.ttl, count)
+        self._entries.move_to_end((table, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, table: str) -> None:
+        """Outdate the counts of a table, called after every write."""
+        self._versions[table] = self.version(table) + 1
+        self.invalidations += 1
+
+    def stats(self) -> MSACountCacheStats:
+        """Get the hit metrics of the cache."""
+        return MSACountCacheStats(
+            entries=len(self._entries),
+            hits=self.hits,
+            misses=self.misses,
+            invalidations=self.invalidations,
+            approximations=self.approximations,
+        )
+
+
+@lru_cache()
+def getCountCache() -> MSACountCache:
+    """
+    This function returns a cached instance of the MSACountCache object, shared by all CRUD routers.
+    """
+    return MSACountCache()
+
+
+def _statementKey(stmt: Select) -> Hashable:
+    # SQL and parameters identify the filter, independent of the order the filters were given in the body
+    compiled = stmt.compile()
+    return str(compiled), repr(sorted(compiled.params.items()))
+
+
+class MSAKeysetSQLModelCrud(MSASQLModelCrud):
+    """SQLModel CRUD router with keyset pagination of ``POST /list``, see the module description."""
+
+    keyset_page_cache_size: int = 1024
+    """Remembered page boundaries, for the page number navigation."""
+    keyset_page_ttl: float = 300.0
+    """Seconds a page boundary stays valid."""
+    count_cache: bool = True
+    """Cache the list totals in the MSACountCache."""
+    count_approximate: bool = False
+    """Estimate the totals of unfiltered lists from the database statistics."""
+    count_approximate_min: int = 100000
+    """Estimates below this are replaced by the exact count."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._keyset_pages: "OrderedDict[Hashable, Tuple[float, List[Any]]]" = (
+            OrderedDict()
+        )
+        self.count_cache_instance: MSACountCache = getCountCache()
+
+    @property
+    def count_table(self) -> str:
+        """Table key of the MSACountCache, the database URL and the table name.
+
+        Sub-apps may use other engines, a table of the same name in another database has its own counts.
+        """
+        return str(self.engine.url) + "#" + self.model.__tablename__
+
+    def get_keyset(
+        self, orderBy: Optional[str], orderDir: Optional[str]
+    ) -> Optional[MSAKeyset]:
+        """Keyset of a requested ordering, None if it needs ``OFFSET``.
+
+        Args:
+            orderBy: Name of the sort field
+            orderDir: ``asc`` or ``desc``
+
+        Returns:
+            keyset: The MSAKeyset or None
+        """
+        desc = orderDir == "desc"
+        if self.pk_name not in self._list_fields_ins:
+            return None
+        insfield = self._list_fields_ins.get(orderBy) if orderBy else None
+        if insfield is None:
+            # the custom default ordering is kept as it is
+            return None if self.ordering else MSAKeyset(self.pk, desc=desc)
+        if insfield is self.pk or insfield.key == self.pk_name:
+            return MSAKeyset(self.pk, desc=desc, name=orderBy)
+        column = self.parser.get_column(insfield)
+        if (
+            column is None
+            or column.table is not self.model.__table__
+            or column.nullable
+        ):
+            return None
+        return MSAKeyset(self.pk, insfield, desc=desc, name=orderBy)
+
+    def _pageKey(
+        self, stmt: Select, keyset: MSAKeyset, perPage: int, page: int
+    ) -> Hashable:
+        # the write version outdates the boundaries after writes through any router of the table
+        return (
+            _statementKey(stmt),
+            keyset.name,
+            keyset.desc,
+            perPage,
+            page,
+            self.count_cache_instance.version(self.count_table),
+        )
+
+    def _getPageBoundary(self, key: Hashable) -> Optional[List[Any]]:
+        entry = self._keyset_pages.get(key)
+        if entry is None:
+            return None
+        expires, values = entry
+        if expires < time.monotonic():
+            del self._keyset_pages[key]
+            return None
+        self._keyset_pages.move_to_end(key)
+        return values
+
+    def _setPageBoundary(self, key: Hashable, values: List[Any]) -> None:
+        self._keyset_pages[key] = (time.monotonic() + self.keyset_page_ttl, values)
+        self._keyset_pages.move_to_end(key)
+        while len(self._keyset_pages) > self.keyset_page_cache_size:
+            self._keyset_pages.popitem(last=False)
+
+    def on_write(self) -> None:
+        """Called after every create, update and delete, outdates the cached counts and page boundaries."""
+        self.count_cache_instance.invalidate(self.count_table)
+        self._keyset_pages.clear()
+
+    async def filter_list(
+        self, request: Request, stmt: Select, filters_data: Optional[Dict[str, Any]]
+    ) -> Tuple[Select, Optional[List[Any]]]:
+        """Apply the filters of ``POST /list`` to the select.
+
+        Args:
+            request: The request
+            stmt: The list select
+            filters_data: Filters from ``on_filter_pre``
+
+        Returns:
+            stmt, ranking: The filtered select and ORDER BY clauses by relevance if the filters rank the rows
+                (used without an explicit ``orderBy``), else None
+        """
+        if filters_data:
+            stmt = stmt.filter(*self.calc_filter_clause(filters_data))
+        return stmt, None
+
+    async def on_list_after(
+        self, request: Request, items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Called with the items of a ``POST /list`` page before they are validated by ``schema_list``.
+
+        Args:
+            request: The request
+            items: The page items as ``{alias: value}``
+
+        Returns:
+            items: The items to return
+        """
+        return items
+
+    def _estimateCount(self, session) -> Optional[int]:
+        # runs sync in the session, None if the database has no cheap estimate
+        table = self.model.__table__
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            estimate = session.execute(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"
+                ),
+                {"table": table.fullname},
+            ).scalar()
+            # -1 for a table never analysed
+            return estimate if estimate is not None and estimate >= 0 else None
+        if dialect in ("mysql", "mariadb"):
+            return session.execute(
+                text(
+                    "SELECT table_rows FROM information_schema.tables"
+                    " WHERE table_schema = DATABASE() AND table_name = :table"
+                ),
+                {"table": table.name},
+            ).scalar()
+        pk_column = table.columns.get(self.pk_name)
+        if (
+            pk_column is not None
+            and pk_column.autoincrement
+            and get_python_type_parse(self.pk) is int
+        ):
+            # the highest auto increment id, counts deleted rows too
+            return session.execute(select(func.max(self.pk))).scalar() or 0
+        return None
+
+    async def estimate_count(self, request: Request) -> Optional[int]:
+        """Estimated number of rows of the table from the database statistics.
+
+        Returns:
+            count: The estimate, None if not available
+        """
+        return await self.db.async_run_sync(self._estimateCount, commit=False)
+
+    async def count_list(self, request: Request, stmt: Select) -> Tuple[int, bool]:
+        """Number of rows of the filtered list select, from the count cache if possible.
+
+        Returns:
+            count: The number of rows and True if it is an estimate
+        """
+        table = self.count_table
+        key = _statementKey(stmt) if self.count_cache else None
+        if key is not None:
+            cached = self.count_cache_instance.get(table, key)
+            if cached is not None:
+                return cached, False
+        if (
+            self.count_approximate
+            and stmt.whereclause is None
+            and len(stmt.get_final_froms()) == 1
+        ):
+            estimate = await self.estimate_count(request)
+            if estimate is not None and estimate >= self.count_approximate_min:
+                self.count_cache_instance.approximations += 1
+                return estimate, True
+        version = self.count_cache_instance.version(table)
+        count: int = await self.db.async_execute(
+            select(func.count("*")).select_from(stmt.subquery()),
+            on_close_pre=lambda r: r.scalar() or 0,
+        )
+        if key is not None:
+            self.count_cache_instance.set(table, key, count, version)
+        return count, False
+
+    @property
+    def route_list(self) -> Callable:
+        async def route(
+            request: Request,
+            paginator: self.paginator = Depends(self.paginator),  # type: ignore
+            filters: self.schema_filter = Body(None),  # type: ignore
+            stmt: Select = Depends(self._select_maker),
+            cursor: Optional[str] = Query(
+                None, description="next_cursor of the previous page, replaces page"
+            ),
+        ):
+            if not await self.has_list_permission(request, paginator, filters):
+                return self.error_no_router_permission(request)
+            data = MSACRUDListSchema(items=[])
+            page, perPage = int(paginator.page), int(paginator.perPage)
+            filters_data = await self.on_filter_pre(request, filters)
+            stmt, ranking = await self.filter_list(request, stmt, filters_data)
+            if paginator.orderBy:
+                ranking = None
+            if paginator.show_total:
+                data.total, approximate = await self.count_list(request, stmt)
+                if approximate:
+                    data.total_approximate = True
+            keyset = (
+                None
+                if ranking
+                else self.get_keyset(paginator.orderBy, paginator.orderDir)
+            )
+            after = None
+            if keyset is None:
+                if cursor:
+                    raise HTTPException(
+                        status.HTTP_400_BAD_REQUEST,
+                        "Cursor paging is not supported for this ordering",
+                    )
+                orderBy = ranking or self._calc_ordering(
+                    paginator.orderBy, paginator.orderDir
+                )
+                if orderBy:
+                    stmt = stmt.order_by(*orderBy)
+                page_stmt = stmt.offset((page - 1) * perPage)
+            else:
+                if cursor:
+                    try:
+                        after = keyset.decode(cursor)
+                    except ValueError as e:
+                        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e)) from e
+                elif page > 1:
+                    after = self._getPageBoundary(
+                        self._pageKey(stmt, keyset, perPage, page - 1)
+                    )
+                page_stmt = stmt.order_by(*keyset.order_by())
+                if after is not None:
+                    page_stmt = page_stmt.where(keyset.after(after))
+                elif page > 1:
+                    page_stmt = page_stmt.offset((page - 1) * perPage)
+            items = await self.db.async_execute(
+                page_stmt.limit(perPage), on_close_pre=lambda r: r.all()
+            )
+            items = self.parser.conv_row_to_dict(items) or []
+            if keyset is not None and len(items) == perPage:
+                last = items[-1]
+                values = [
+                    last[self.parser.get_alias(attr)] for attr in keyset.attributes
+                ]
+                data.next_cursor = keyset.encode(values)
+                if not cursor:
+                    self._setPageBoundary(
+                        self._pageKey(stmt, keyset, perPage, page), values
+                    )
+            items = await self.on_list_after(request, items)
+            data.items = [self.schema_list.parse_obj(item) for item in items]
+            data.query = request.query_params
+            data.filters = filters_data
+            return MSACRUDOut(data=data)
+
+        return route
+
+    @property
+    def route_create(self) -> Callable:
+        return self._notifyWrite(super().route_create)
+
+    @property
+    def route_update(self) -> Callable:
+        return self._notifyWrite(super().route_update)
+
+    @property
+    def route_delete(self) -> Callable:
+        return self._notifyWrite(super().route_delete)
+
+    def _notifyWrite(self, route: Callable) -> Callable:
+        @functools.wraps(route)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await route(*args, **kwargs)
+            finally:
+                self.on_write()
+
+        return wrapper
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Async facade for the TinyDB JSON DB.
+
+TinyDB is synchronous and not thread safe. ``MSAJSONDBAsync`` runs every call on one dedicated worker thread,
+so callers on the event loop never block and the calls stay serialized.
+"""
+import asyncio
+import concurrent.futures
+import functools
+from typing import Any, Callable, List, Optional
+
+from tinydb import TinyDB
+from tinydb.table import Document, Table
+
+if __name__ == "__main__":
+    pass
+
+
+class MSAJSONTableAsync:
+    """Async version of a TinyDB Table, created by ``MSAJSONDBAsync.table``.
+
+    All methods take the same arguments as the TinyDB ``Table`` methods of the same name.
+
+    Args:
+        db: The MSAJSONDBAsync instance
+        table: The wrapped TinyDB Table
+    """
+
+    def __init__(self, db: "MSAJSONDBAsync", table: Table) -> None:
+        self.db = db
+        self.table = table
+
+    @property
+    def name(self) -> str:
+        """Name of the table."""
+        return self.table.name
+
+    async def insert(self, document: dict) -> int:
+        return await self.db.run(self.table.insert, document)
+
+    async def insert_multiple(self, documents: List[dict]) -> List[int]:
+        return await self.db.run(self.table.insert_multiple, documents)
+
+    async def all(self) -> List[Document]:
+        return await self.db.run(self.table.all)
+
+    async def search(self, cond) -> List[Document]:
+        return await self.db.run(self.table.search, cond)
+
+    async def get(self, cond=None, doc_id: Optional[int] = None) -> Optional[Document]:
+        return await self.db.run(self.table.get, cond, doc_id)
+
+    async def contains(self, cond=None, doc_id: Optional[int] = None) -> bool:
+        return await self.db.run(self.table.contains, cond, doc_id)
+
+    async def count(self, cond) -> int:
+        return await self.db.run(self.table.count, cond)
+
+    async def update(self, fields, cond=None, doc_ids=None) -> List[int]:
+        return await self.db.run(self.table.update, fields, cond, doc_ids)
+
+    async def upsert(self, document: dict, cond=None) -> List[int]:
+        return await self.db.run(self.table.upsert, document, cond)
+
+    async def remove(self, cond=None, doc_ids=None) -> List[int]:
+        return await self.db.run(self.table.remove, cond, doc_ids)
+
+    async def truncate(self) -> None:
+        return await self.db.run(self.table.truncate)
+
+    async def length(self) -> int:
+        return await self.db.run(len, self.table)
+
+
+class MSAJSONDBAsync:
+    """Async facade for a TinyDB instance.
+
+    Args:
+        db: The TinyDB instance, like ``MSAApp.json_db_engine``
+
+    Examples:
+    ```python
+    users = app.json_db_async.table("users")
+    doc_id = await users.insert({"name": "Anna", "age": 42})
+    adults = await users.search(Query().age >= 18)
+    ```
+    """
+
+    def __init__(self, db: TinyDB) -> None:
+        self.db = db
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="MSA_JSONDB"
+        )
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a synchronous TinyDB call on the JSON DB worker thread.
+
+        Args:
+            func: The callable, like ``db.tables``
+            *args: positional arguments of ``func``
+            **kwargs: keyword arguments of ``func``
+
+        Returns:
+            result: The return value of ``func``
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def table(self, name: str, **kwargs) -> MSAJSONTableAsync:
+        """Get the async version of a table, see ``TinyDB.table``."""
+        return MSAJSONTableAsync(self, self.db.table(name, **kwargs))
+
+    async def tables(self) -> set:
+        return await self.run(self.db.tables)
+
+    async def drop_table(self, name: str) -> None:
+        return await self.run(self.db.drop_table, name)
+
+    async def close(self) -> None:
+        """Close the TinyDB instance on the worker thread (flushes write-behind storages) and stop the thread."""
+        await self.run(self.db.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""Secondary Indexes and Query Planner for the TinyDB JSON DB.
+
+TinyDB evaluates every query against every document. ``MSAJSONIndexedDB`` adds declarative secondary indexes
+per table, a ``hash`` index for equality (``==``, ``one_of``) and a ``sorted`` index for ranges
+(``<``, ``<=``, ``>``, ``>=``, ``==``). The indexes are maintained by the table on every write.
+
+A small planner inspects the query, resolves the indexed parts (``&`` intersects, ``|`` unions) to a set of
+candidate documents and evaluates the complete query only on those. Queries it can't plan (``~``, ``test``,
+``matches``, unindexed fields, ...) fall back to the TinyDB full scan, so results never differ.
+
+Note:
+    Indexes only see writes done through the same TinyDB instance. Use them with the in-memory or the
+    ``log`` storage, ``JSONStorage`` re-reads the whole file on every query anyway.
+"""
+import bisect
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
+
+from tinydb import TinyDB
+from tinydb.table import Document, Table
+from tinydb.utils import freeze
+
+if __name__ == "__main__":
+    pass
+
+_MISSING = object()
+
+
+def _path(field: Union[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    """Convert a field name (``address.city``) or path tuple to a TinyDB query path."""
+    if isinstance(field, tuple):
+        return field
+    return tuple(field.split("."))
+
+
+def _resolve(doc: Mapping, path: Tuple[str, ...]) -> Any:
+    value = doc
+    try:
+        for part in path:
+            value = value[part]
+    except (KeyError, TypeError, IndexError):
+        return _MISSING
+    return value
+
+
+class MSAHashIndex:
+    """Hash index of one field, maps each value to the ids of the documents with that value.
+
+    Args:
+        path: TinyDB query path of the field
+    """
+
+    kind: str = "hash"
+
+    def __init__(self, path: Tuple[str, ...]) -> None:
+        self.path = path
+        self.values: Dict[Any, Set[int]] = {}
+        self.keys: Dict[int, Any] = {}
+
+    def add(self, doc_id: int, doc: Mapping) -> None:
+        value = _resolve(doc, self.path)
+        if value is _MISSING:
+            return
+        key = freeze(value)
+        self.values.setdefault(key, set()).add(doc_id)
+        self.keys[doc_id] = key
+
+    def remove(self, doc_id: int) -> None:
+        key = self.keys.pop(doc_id, _MISSING)
+        if key is _MISSING:
+            return
+        ids = self.values[key]
+        ids.discard(doc_id)
+        if not ids:
+            del self.values[key]
+
+    def build(self, docs: Iterable[Tuple[int, Mapping]]) -> None:
+        for doc_id, doc in docs:
+            self.add(doc_id, doc)
+
+    def clear(self) -> None:
+        self.values.clear()
+        self.keys.clear()
+
+    def lookup(self, op: str, value: Any) -> Optional[Set[int]]:
+        """Get the candidate ids of a comparison, None if the index can't answer it."""
+        if op == "==":
+            return set(self.values.get(value, ()))
+        if op == "one_of":
+            ids: Set[int] = set()
+            for item in value:
+                ids.update(self.values.get(item, ()))
+            return ids
+        return None
+
+
+class MSASortedIndex:
+    """Sorted index of one field, answers range and equality comparisons by binary search.
+
+    Numbers and strings are kept in separate sorted lists, as they aren't comparable with each other.
+
+    Args:
+        path: TinyDB query path of the field
+    """
+
+    kind: str = "sorted"
+
+    def __init__(self, path: Tuple[str, ...]) -> None:
+        self.path = path
+        self.entries: Dict[str, List[Tuple[Any, int]]] = {"num": [], "str": []}
+        self.keys: Dict[int, Tuple[str, Any]] = {}
+
+    @staticmethod
+    def _family(value: Any) -> Optional[str]:
+        if isinstance(value, (int, float)):
+            return "num"
+        if isinstance(value, str):
+            return "str"
+        return None
+
+    def add(self, doc_id: int, doc: Mapping) -> None:
+        value = _resolve(doc, self.path)
+        family = self._family(value)
+        if family is None:
+            return
+        bisect.insort(self.entries[family], (value, doc_id))
+        self.keys[doc_id] = (family, value)
+
+    def remove(self, doc_id: int) -> None:
+        key = self.keys.pop(doc_id, None)
+        if key is None:
+            return
+        family, value = key
+        entries = self.entries[family]
+        pos = bisect.bisect_left(entries, (value, doc_id))
+        if pos < len(entries) and entries[pos] == (value, doc_id):
+            del entries[pos]
+
+    def build(self, docs: Iterable[Tuple[int, Mapping]]) -> None:
+        # sorting once is much faster than inserting one by one
+        for doc_id, doc in docs:
+            value = _resolve(doc, self.path)
+            family = self._family(value)
+            if family is not None:
+                self.entries[family].append((value, doc_id))
+                self.keys[doc_id] = (family, value)
+        for entries in self.entries.values():
+            entries.sort()
+
+    def clear(self) -> None:
+        for entries in self.entries.values():
+            entries.clear()
+        self.keys.clear()
+
+    def lookup(self, op: str, value: Any) -> Optional[Set[int]]:
+        """Get the candidate ids of a comparison, None if the index can't answer it."""
+        if op not in RANGE_OPS:
+            return None
+        return self.range([(op, value)])
+
+    def range(self, comparisons: List[Tuple[str, Any]]) -> Optional[Set[int]]:
+        """Get the candidate ids of a conjunction of comparisons on this field with one binary search per bound.
+
+        Args:
+            comparisons: List of (operator, value), operators ``==``, ``<``, ``<=``, ``>``, ``>=``
+
+        Returns:
+            ids: Candidate ids, None if the values are not all numbers or all strings
+        """
+        families = {self._family(value) for _, value in comparisons}
+        family = families.pop() if len(families) == 1 else None
+        if family is None:
+            return None
+        entries = self.entries[family]
+        lo, hi = 0, len(entries)
+        for op, value in comparisons:
+            if op in ("==", ">="):
+                lo = max(lo, bisect.bisect_left(entries, (value,)))
+            elif op == ">":
+                lo = max(lo, bisect.bisect_left(entries, (value, float("inf"))))
+            if op in ("==", "<="):
+                hi = min(hi, bisect.bisect_left(entries, (value, float("inf"))))
+            elif op == "<":
+                hi = min(hi, bisect.bisect_left(entries, (value,)))
+        return {doc_id for _, doc_id in entries[lo:hi]}
+
+
+RANGE_OPS = ("==", "<", "<=", ">", ">=")
+
+INDEX_KINDS: Dict[str, Type[Union[MSAHashIndex, MSASortedIndex]]] = {
+    "hash": MSAHashIndex,
+    "sorted": MSASortedIndex,
+}
+
+
+class MSAJSONTable(Table):
+    """TinyDB Table with secondary indexes and a query planner.
+
+    Examples:
+    ```python
+    users = db.table("users")
+    users.create_index("email")
+    users.create_index("age", kind="sorted")
+    users.search((Query().age >= 18) & (Query().email == "anna@u2d.ai"))
+    ```
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.indexes: Dict[Tuple[str, ...], Union[MSAHashIndex, MSASortedIndex]] = {}
+
+    def create_index(
+        self, field: Union[str, Tuple[str, ...]], kind: str = "hash"
+    ) -> None:
+        """Create (or replace) the index of a field and build it from the current documents.
+
+        Args:
+            field: Field name, nested fields separated by ``.`` or as path tuple
+            kind: ``hash`` for equality or ``sorted`` for ranges and equality
+        """
+        if kind not in INDEX_KINDS:
+            raise ValueError("Index kind must be hash or sorted, got: " + str(kind))
+        index = INDEX_KINDS[kind](_path(field))
+        index.build(
+            (self.document_id_class(doc_id), doc)
+            for doc_id, doc in self._read_table().items()
+        )
+        self.indexes[index.path] = index
+
+    def drop_index(self, field: Union[str, Tuple[str, ...]]) -> None:
+        """Remove the index of a field."""
+        self.indexes.pop(_path(field), None)
+
+    def plan(self, cond) -> Optional[Set[int]]:
+        """Resolve the indexed parts of a query to candidate document ids.
+
+        Args:
+            cond: TinyDB Query
+
+        Returns:
+            ids: Superset of the ids of the matching documents, None if a full scan is needed
+        """
+        if not self.indexes or not getattr(cond, "is_cacheable", lambda: False)():
+            return None
+        return self._plan(cond._hash)
+
+    def _plan(self, node: tuple) -> Optional[Set[int]]:
+        op = node[0]
+        if op == "or":
+            ids: Set[int] = set()
+            for child in node[1]:
+                part = self._plan(child)
+                if part is None:
+                    return None
+                ids |= part
+            return ids
+        if op == "and":
+            # comparisons on the same sorted field are merged into one range
+            ranges: Dict[
+                Tuple[str, ...], Tuple[MSASortedIndex, List[Tuple[str, Any]]]
+            ] = {}
+            parts: List[Optional[Set[int]]] = []
+            for child in node[1]:
+                index = self.indexes.get(child[1])
+                if child[0] in RANGE_OPS and isinstance(index, MSASortedIndex):
+                    ranges.setdefault(child[1], (index, []))[1].append(
+                        (child[0], child[2])
+                    )
+                else:
+                    parts.append(self._plan(child))
+            for sorted_index, comparisons in ranges.values():
+                parts.append(sorted_index.range(comparisons))
+            found = sorted((part for part in parts if part is not None), key=len)
+            if not found:
+                return None
+            return found[0].intersection(*found[1:])
+        if op in ("==", "<", "<=", ">", ">=", "one_of"):
+            index = self.indexes.get(node[1])
+            if index is None:
+                return None
+            return index.lookup(op, node[2])
+        return None
+
+    def _matching(self, cond, ids: Iterable[int]) -> List[Document]:
+        table = self._read_table()
+        docs = []
+        for doc_id in sorted(ids):
+            doc = table.get(str(doc_id))
+            if doc is not None and cond(doc):
+                docs.append(self.document_class(doc, doc_id))
+        return docs
+
+    def search(self, cond) -> List[Document]:
+        ids = self.plan(cond)
+        if ids is None:
+            return super().search(cond)
+        cached = self._query_cache.get(cond)
+        if cached is not None:
+            return cached[:]
+        docs = self._matching(cond, ids)
+        if cond.is_cacheable():
+            self._query_cache[cond] = docs[:]
+        return docs
+
+    def get(self, cond=None, doc_id: Optional[int] = None) -> Optional[Document]:
+        ids = self.plan(cond) if cond is not None and doc_id is None else None
+        if ids is None:
+            return super().get(cond, doc_id)
+        docs = self._matching(cond, ids)
+        return docs[0] if docs else None
+
+    def count(self, cond) -> int:
+        if self.plan(cond) is None:
+            return super().count(cond)
+        return len(self.search(cond))
+
+    def _ids(self, cond, doc_ids) -> Optional[List[int]]:
+        # doc ids of a conditional write, planned if possible
+        if cond is None or doc_ids is not None:
+            return doc_ids
+        ids = self.plan(cond)
+        if ids is None:
+            return None
+        return [doc.doc_id for doc in self._matching(cond, ids)]
+
+    def insert(self, document: Mapping) -> int:
+        doc_id = super().insert(document)
+        self._reindex([doc_id])
+        return doc_id
+
+    def insert_multiple(self, documents: Iterable[Mapping]) -> List[int]:
+        doc_ids = super().insert_multiple(documents)
+        self._reindex(doc_ids)
+        return doc_ids
+
+    def update(self, fields, cond=None, doc_ids=None) -> List[int]:
+        planned = self._ids(cond, doc_ids)
+        if planned is not None and doc_ids is None:
+            updated = super().update(fields, doc_ids=planned) if planned else []
+        else:
+            updated = super().update(fields, cond, doc_ids)
+        self._reindex(updated)
+        return updated
+
+    def update_multiple(self, updates) -> List[int]:
+        updated = super().update_multiple(updates)
+        self._reindex(updated)
+        return updated
+
+    def remove(self, cond=None, doc_ids=None) -> List[int]:
+        planned = self._ids(cond, doc_ids)
+        if planned is not None and doc_ids is None:
+            removed = super().remove(doc_ids=planned) if planned else []
+        else:
+            removed = super().remove(cond, doc_ids)
+        for index in self.indexes.values():
+            for doc_id in removed:
+                index.remove(doc_id)
+        return removed
+
+    def truncate(self) -> None:
+        super().truncate()
+        for index in self.indexes.values():
+            index.clear()
+
+    def _reindex(self, doc_ids: Iterable[int]) -> None:
+        if not self.indexes:
+            return
+        table = self._read_table()
+        for doc_id in doc_ids:
+            doc = table.get(str(doc_id))
+            for index in self.indexes.values():
+                index.remove(doc_id)
+                if doc is not None:
+                    index.add(doc_id, doc)
+
+
+class MSAJSONIndexedDB(TinyDB):
+    """TinyDB with declarative secondary indexes, see ``MSAJSONTable``.
+
+    Args:
+        *args: TinyDB arguments, like the path
+        indexes: Indexes per table, ``{"users": {"email": "hash", "age": "sorted"}}``
+        **kwargs: TinyDB arguments, like ``storage``
+
+    Examples:
+    ```python
+    db = MSAJSONIndexedDB("msa_sdk.json", storage=MSAJSONLogStorage, indexes={"users": {"age": "sorted"}})
+    db.table("users").search(Query().age > 30)
+    ```
+    """
+
+    table_class = MSAJSONTable
+
+    def __init__(
+        self, *args, indexes: Optional[Dict[str, Dict[str, str]]] = None, **kwargs
+    ) -> None:
+        self.index_definitions: Dict[str, Dict[str, str]] = indexes or {}
+        super().__init__(*args, **kwargs)
+
+    def table(self, name: str, **kwargs) -> MSAJSONTable:
+        created = name not in self._tables
+        table = cast(MSAJSONTable, super().table(name, **kwargs))
+        if created:
+            for field, kind in self.index_definitions.get(name, {}).items():
+                table.create_index(field, kind)
+        return table
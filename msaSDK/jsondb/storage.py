@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""Write-behind, log-structured TinyDB Storage.
+
+TinyDB's ``JSONStorage`` serialises and rewrites the whole file on every write. ``MSAJSONLogStorage`` keeps the
+database in memory, turns every write into a small change record and appends those records in batches to a
+log file from a background thread. The log is periodically compacted into a snapshot file, which uses the
+plain TinyDB JSON format, so the snapshot stays readable by ``JSONStorage``.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from tinydb.storages import Storage, touch
+
+if __name__ == "__main__":
+    pass
+
+
+class MSAJSONDocument(dict):
+    """TinyDB document which reports its changes to the storage.
+
+    TinyDB updates documents in place, tracking the mutation means a write only has to look at the changed
+    documents instead of comparing every document of the database.
+
+    Note:
+        Only changes of the top level fields are tracked, mutate nested values by assigning the field again.
+    """
+
+    __slots__ = ("_sink", "_loc")
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._sink: Optional[Dict[int, "MSAJSONDocument"]] = None
+        self._loc: Tuple[str, str] = ("", "")
+
+    def _track(
+        self, sink: Dict[int, "MSAJSONDocument"], table: str, doc_id: str
+    ) -> "MSAJSONDocument":
+        self._sink = sink
+        self._loc = (table, doc_id)
+        return self
+
+    def _touch(self) -> None:
+        if self._sink is not None:
+            self._sink[id(self)] = self
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def pop(self, *args):
+        self._touch()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._touch()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._touch()
+        return super().setdefault(key, default)
+
+    def clear(self) -> None:
+        super().clear()
+        self._touch()
+
+
+class MSAJSONLogStorage(Storage):
+    """Write-behind, log-structured TinyDB Storage.
+
+    - reads are served from the in-memory working set
+    - writes only collect the changed documents as one JSON line per table, no file IO on the caller
+    - a background thread appends the collected lines every ``flush_interval`` seconds or once
+      ``batch_size`` lines are waiting, and fsyncs the log
+    - every ``compact_interval`` seconds, if the log has at least ``compact_min_records`` lines, the working set
+      is written as new snapshot to ``path`` and the log is truncated, also done on ``close``
+
+    Change records are idempotent (set document, delete document, drop table), replaying the log
+    on top of any older snapshot gives the latest state. A torn last line after a crash is ignored.
+
+    Args:
+        path: Path of the snapshot file, the log is written next to it as ``<path>.log``
+        create_dirs: Create missing directories of ``path``
+        flush_interval: Seconds between background flushes, Default 1.0
+        batch_size: Number of waiting change records which trigger an early flush, Default 1000
+        compact_interval: Seconds between compaction checks, Default 300
+        compact_min_records: Minimum number of log records to compact, Default 10000
+        fsync: fsync the log after each flush, Default True
+        **kwargs: ``json.dumps`` arguments for the snapshot, like ``indent``
+
+    Examples:
+    ```python
+    from tinydb import TinyDB
+
+    db = TinyDB("msa_sdk.json", storage=MSAJSONLogStorage, flush_interval=0.5)
+    ```
+    """
+
+    def __init__(
+        self,
+        path: str,
+        create_dirs: bool = False,
+        flush_interval: float = 1.0,
+        batch_size: int = 1000,
+        compact_interval: float = 300.0,
+        compact_min_records: int = 10000,
+        fsync: bool = True,
+        **kwargs
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.log_path = path + ".log"
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.compact_min_records = compact_min_records
+        self.fsync = fsync
+        self.kwargs = kwargs
+
+        self.flushed: int = 0
+        self.compactions: int = 0
+        self.log_records: int = 0
+
+        touch(path, create_dirs=create_dirs)
+        self._dirty: Dict[int, MSAJSONDocument] = {}
+        self._data: Dict[str, Dict[str, Any]] = self._load()
+        self._known: Dict[str, Set[str]] = {
+            name: set(table) for name, table in self._data.items()
+        }
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(
+            target=self._run, name="MSA_JSONDB_Writer", daemon=True
+        )
+        self._thread.start()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        data: Dict[str, Dict[str, Any]] = {}
+        with open(self.path, encoding="utf-8") as f:
+            content = f.read()
+        if content:
+            data = json.loads(content)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn write of the last record
+                        break
+                    self._replay(data, record)
+                    self.log_records += 1
+        return {
+            name: {
+                doc_id: MSAJSONDocument(doc)._track(self._dirty, name, doc_id)
+                for doc_id, doc in table.items()
+            }
+            for name, table in data.items()
+        }
+
+    @staticmethod
+    def _replay(data: Dict[str, Dict[str, Any]], record: Dict[str, Any]) -> None:
+        name = record["t"]
+        if record.get("drop"):
+            data.pop(name, None)
+            return
+        table = data.setdefault(name, {})
+        for doc_id in record.get("d", []):
+            table.pop(doc_id, None)
+        table.update(record.get("u", {}))
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        return self._data if self._data else None
+
+    def write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        changed: Dict[str, Dict[str, MSAJSONDocument]] = {}
+        for doc in self._dirty.values():
+            name, doc_id = doc._loc
+            if data.get(name, {}).get(doc_id) is doc:
+                changed.setdefault(name, {})[doc_id] = doc
+        self._dirty.clear()
+
+        records = []
+        for name in [name for name in self._known if name not in data]:
+            records.append(json.dumps({"t": name, "drop": True}))
+            del self._known[name]
+        for name, table in data.items():
+            created = name not in self._known
+            known = self._known.setdefault(name, set())
+            upserts = changed.get(name, {})
+            deletes: List[str] = []
+            if len(table) != len(known):
+                # TinyDB inserts or removes documents, never both in one write
+                for doc_id in table.keys() - known:
+                    upserts[doc_id] = table[doc_id] = MSAJSONDocument(
+                        table[doc_id]
+                    )._track(self._dirty, name, doc_id)
+                deletes = list(known - table.keys())
+            if not (created or upserts or deletes):
+                continue
+            known.difference_update(deletes)
+            known.update(upserts)
+            record: Dict[str, Any] = {"t": name, "u": upserts}
+            if deletes:
+                record["d"] = deletes
+            records.append(json.dumps(record))
+        self._data = data
+        if records:
+            with self._lock:
+                self._pending.extend(records)
+                if len(self._pending) >= self.batch_size:
+                    self._wakeup.set()
+
+    def _run(self) -> None:
+        last_compact = time.monotonic()
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if (
+                    time.monotonic() - last_compact >= self.compact_interval
+                    and self.log_records >= self.compact_min_records
+                ):
+                    self.compact()
+                    last_compact = time.monotonic()
+            except Exception:
+                # retried on the next round, the records stay pending
+                pass
+
+    def flush(self) -> int:
+        """Append the waiting change records to the log.
+
+        Returns:
+            count: Number of appended records
+        """
+        with self._io_lock:
+            return self._write_pending()
+
+    def _write_pending(self) -> int:
+        # caller holds the io lock
+        with self._lock:
+            records, self._pending = self._pending, []
+        if not records:
+            return 0
+        try:
+            self._log.write("\n".join(records) + "\n")
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+        except Exception:
+            with self._lock:
+                self._pending[:0] = records
+            raise
+        self.log_records += len(records)
+        self.flushed += len(records)
+        return len(records)
+
+    def compact(self) -> None:
+        """Write the working set as new snapshot and truncate the log."""
+        with self._io_lock:
+            # everything logged so far becomes part of the snapshot
+            self._write_pending()
+            tables = {name: dict(table) for name, table in list(self._data.items())}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(tables, **self.kwargs))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            # records written meanwhile are still pending and go to the new log
+            self._log.seek(0)
+            self._log.truncate()
+            self.log_records = 0
+            self.compactions += 1
+
+    def close(self) -> None:
+        """Stop the background thread, flush and compact the log."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        if self.log_records or self._pending:
+            self.compact()
+        self._log.close()
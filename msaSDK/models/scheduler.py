@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from msaUtils.models.scheduler import MSASchedulerLog, MSASchedulerStatus
+
+
+class MSASchedulerLogPage(MSASchedulerLog):
+    """
+    **MSASchedulerLogPage** Pydantic Response Class, one cursor paginated page of the Scheduler Log
+    """
+
+    cursor: Optional[int] = None
+    """Cursor the page was requested with."""
+    next_cursor: Optional[int] = None
+    """Cursor for the next page, None if there are no more records."""
+    capacity: Optional[int] = None
+    """Capacity of the Scheduler Log ring buffer."""
+    size: int = 0
+    """Number of records currently kept in the Scheduler Log."""
+
+
+class MSASchedulerPoolStatus(BaseModel):
+    """
+    **MSASchedulerPoolStatus** Pydantic Response Class, utilisation of a Scheduler execution pool
+    """
+
+    kind: str = "thread"
+    """Pool kind, ``thread`` or ``process``."""
+    max_workers: int = 0
+    """Maximum number of parallel runs."""
+    max_queue: int = 0
+    """Maximum number of runs waiting for a free worker."""
+    active: int = 0
+    """Number of runs currently executed by a worker."""
+    queued: int = 0
+    """Number of runs waiting for a free worker."""
+    utilisation: float = 0.0
+    """Share of busy workers, 0.0 to 1.0."""
+    completed: int = 0
+    """Number of successfully completed runs."""
+    failed: int = 0
+    """Number of runs which raised an exception."""
+    timeouts: int = 0
+    """Number of runs which exceeded their timeout."""
+    cancelled: int = 0
+    """Number of runs which got cancelled."""
+    rejected: int = 0
+    """Number of runs rejected because the queue was full."""
+    tasks: List[str] = []
+    """Names of the tasks registered on the pool."""
+
+
+class MSASchedulerLeaseStatus(BaseModel):
+    """
+    **MSASchedulerLeaseStatus** Pydantic Response Class, lease contention of a Scheduler task
+    """
+
+    task: str = ""
+    """Task Name."""
+    holder: Optional[str] = None
+    """Replica which held the lease at the last claim."""
+    claimed: int = 0
+    """Number of runs (and renewals) this replica claimed the lease for."""
+    contended: int = 0
+    """Number of runs skipped because another replica held the lease."""
+    errors: int = 0
+    """Number of runs skipped because the lease store failed."""
+
+
+class MSASchedulerTaskMetrics(BaseModel):
+    """
+    **MSASchedulerTaskMetrics** Pydantic Response Class, runtime metrics of a Scheduler task, times in seconds
+    """
+
+    task: str = ""
+    """Task Name."""
+    runs: int = 0
+    """Number of finished runs, skipped ones included."""
+    succeeded: int = 0
+    """Number of successful runs."""
+    failed: int = 0
+    """Number of failed runs."""
+    terminated: int = 0
+    """Number of terminated runs (timeout, cancel)."""
+    skipped: int = 0
+    """Number of runs skipped, because another replica held the lease."""
+    overlaps: int = 0
+    """Number of times the task came due while its previous run was still active."""
+    failure_rate: float = 0.0
+    """Share of failed runs of all executed runs, 0.0 to 1.0."""
+    last_runtime: Optional[float] = None
+    """Runtime of the last run."""
+    runtime_avg: Optional[float] = None
+    """Average runtime."""
+    runtime_min: Optional[float] = None
+    """Minimum runtime."""
+    runtime_max: Optional[float] = None
+    """Maximum runtime."""
+    runtime_p50: Optional[float] = None
+    """Median runtime, estimated from the histogram."""
+    runtime_p95: Optional[float] = None
+    """95th percentile runtime, estimated from the histogram."""
+    runtime_buckets: Dict[str, int] = {}
+    """Runtime histogram, upper bound of the bucket and cumulative count of runs."""
+    queue_delay_avg: Optional[float] = None
+    """Average time a run was due but didn't execute yet."""
+    queue_delay_max: Optional[float] = None
+    """Maximum time a run was due but didn't execute yet."""
+    queue_delay_p95: Optional[float] = None
+    """95th percentile of the time a run was due but didn't execute yet."""
+
+
+class MSASchedulerServiceStatus(MSASchedulerStatus):
+    """
+    **MSASchedulerServiceStatus** Pydantic Response Class, Scheduler Status with the execution pools, leases and task metrics
+    """
+
+    pools: List[MSASchedulerPoolStatus] = []
+    """Utilisation of the Scheduler execution pools."""
+    replica: Optional[str] = None
+    """Replica id of this instance."""
+    lease_backend: Optional[str] = None
+    """Lease store used to run each task on one replica only, None if every replica runs every task."""
+    leases: List[MSASchedulerLeaseStatus] = []
+    """Lease contention per task."""
+    metrics: List[MSASchedulerTaskMetrics] = []
+    """Runtime metrics per task."""
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import validator, BaseModel
 
@@ -21,6 +21,42 @@ class MSAServiceStatus(BaseModel):
     """Optional Message Text"""
 
 
+class MSAWarmupStep(BaseModel):
+    """
+    **MSAWarmupStep** Pydantic Response Class
+    """
+
+    name: str = ""
+    """Name of the warmed artefact or the route path."""
+    kind: str = "builder"
+    """``builder`` if the artefact was built directly, ``route`` for a synthetic in-process request."""
+    status_code: Optional[int] = None
+    """HTTP status code of the synthetic request, None for builders."""
+    cold_ms: Optional[float] = None
+    """Latency of the first (cold) call in milliseconds."""
+    warm_ms: Optional[float] = None
+    """Latency of the second (warm) call in milliseconds."""
+    error: Optional[str] = None
+    """Error Text if the step failed."""
+
+
+class MSAWarmupReport(BaseModel):
+    """
+    **MSAWarmupReport** Pydantic Response Class
+    """
+
+    name: Optional[str] = "msaSDK Service"
+    """Service Name."""
+    ready: bool = False
+    """True once the warmup phase finished and the service accepts traffic."""
+    duration_ms: Optional[float] = None
+    """Total duration of the warmup phase in milliseconds."""
+    steps: List[MSAWarmupStep] = []
+    """Cold vs. warm latency of each warmup step."""
+    message: Optional[str] = "None"
+    """Optional Message Text"""
+
+
 class MSAServiceDefinition(MSAAppSettings):
     """
     MSAApp Settings (Service Definitions)
@@ -61,6 +97,8 @@ class MSAServiceDefinition(MSAAppSettings):
     """Use UVLoop instead of asyncio loop."""
     sysrouter: bool = True
     """Enable the System Routes defined by router.system module (/sysinfo, /sysgpuinfo, /syserror, ...)."""
+    progressrouter: bool = False
+    """Enable the User Progress Routes defined by router.progress module (/progress/{user}, /progress/{user}/stream SSE, /progress/{user}/ws WebSocket, /progress_stats)."""
     servicerouter: bool = True
     """Enable the Service Routes defined by the MSAApp (/scheduler, /status, /defintion, /settings, /schema, /info, ...)."""
     starception: bool = True
@@ -117,10 +155,34 @@ class MSAServiceDefinition(MSAAppSettings):
     """Enables Timing Middleware, reports timing data at the granularity of individual endpoint calls."""
     limiter: bool = False
     """Enables Rate Limiter (slowapi)."""
+    warmup: bool = False
+    """Enables the Warmup phase at Startup, pre-builds OpenAPI, Templates, i18n and DB connections before the service is ready."""
+    warmup_routes: List[str] = ["/openapi.json", "/docs", "/info"]
+    """List of Routes which get called with synthetic in-process GET requests during the Warmup phase."""
     scheduler: bool = True
     "Enables MSA Scheduler Engine."
     scheduler_debug: bool = False
     "Enables MSA Scheduler debug messages."
+    scheduler_thread_workers: int = 4
+    'Maximum number of parallel runs of Scheduler tasks with ``execution="thread"``.'
+    scheduler_process_workers: int = 2
+    'Maximum number of parallel runs of Scheduler tasks with ``execution="process"``.'
+    scheduler_pool_queue: int = 100
+    "Maximum number of task runs waiting for a free worker per Scheduler pool, further runs fail."
+    scheduler_lease: str = ""
+    "Run each Scheduler task on one replica only, lease store ``sqlite`` or ``file``, empty runs every task on every replica."
+    scheduler_lease_url: str = "./msa_sdk.lease"
+    "SQLite DB file (``sqlite``) or directory (``file``) of the Scheduler leases, must be on a volume shared by the replicas."
+    scheduler_lease_ttl: float = 30.0
+    "Minimum seconds a replica holds a task lease after claiming or renewing it, tasks with a longer period (``every 10 min``, ``daily``) hold it for the period, another replica takes over after it expired."
+    scheduler_jitter: float = 1.0
+    "Maximum random delay in seconds before a task run claims its lease, spreads the claims of the replicas."
+    scheduler_log_capacity: int = 10000
+    "Maximum number of records kept in the Scheduler Log ring buffer, oldest records get dropped first."
+    scheduler_log_to_db: bool = False
+    "Persist the Scheduler Log with batched inserts to the SQLite DB (``sqlite_db_url``), the run history survives restarts."
+    scheduler_log_retention_days: int = 30
+    "Persisted Scheduler Log records older than this get purged in the background, 0 disables the purge."
     abstract_fs: bool = True
     """Enables internal Abstract Filesystem."""
     abstract_fs_url: str = "."
@@ -131,6 +193,14 @@ class MSAServiceDefinition(MSAAppSettings):
     """JSON DB only in memory, don't store to file/db url"""
     json_db_url: str = "./msa_sdk.json"
     """Set's DB URL, compatibility with async and BaseModel/SQLAlchemy is required."""
+    json_db_storage: str = "json"
+    """Storage of the JSON DB, ``json`` rewrites the file on each write (TinyDB Default), ``log`` keeps the data in memory and appends the changes write-behind to a log which is compacted periodically."""
+    json_db_flush_interval: float = 1.0
+    """Seconds between the background flushes of the ``log`` storage."""
+    json_db_compact_interval: float = 300.0
+    """Seconds between the compactions of the ``log`` storage into the ``json_db_url`` snapshot."""
+    json_db_indexes: Dict[str, Dict[str, str]] = {}
+    """Secondary Indexes of the JSON DB per table and field, ``hash`` for equality or ``sorted`` for ranges, like ``{"users": {"email": "hash", "age": "sorted"}}``."""
     sqlite_db: bool = True
     """Enables internal Asynchron SQLite DB."""
     sqlite_db_debug: bool = False
@@ -151,6 +221,10 @@ class MSAServiceDefinition(MSAAppSettings):
     """Enables internal Admin Site Dashboard."""
     site_auth: bool = False
     """Extends internal Admin Dashboard with Auth."""
+    site_index_advisor: bool = False
+    """Reports the ``list_filter``, ``search_fields``, date range and foreign key columns of the Admin Site Models without an index at Startup."""
+    site_index_create: bool = False
+    """Creates the missing indexes found by ``site_index_advisor``, per ModelAdmin also with ``index_create``."""
     site_title: str = "Admin"
     """Set's internal Admin Dashboard Titel."""
     site_copyright: str = "Copyright © 2022 by u2d.ai"
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, WebSocket, WebSocketDisconnect
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from msaSDK.userprogress import MSAUserProgressStats, getMSAUserProgress
+
+progress_router = APIRouter(prefix="", tags=["progress"], include_in_schema=True)
+
+
+@progress_router.get("/progress/{user}")
+async def user_progress(request: Request, user: str, after: int = 0) -> List[dict]:
+    """Get the buffered progress events of a user.
+
+    Args:
+        request: HTTP Request.
+        user: The user.
+        after: Only events with a higher sequence number.
+
+    Returns:
+        events: List of ``{"seq", "data", "msg"}``, oldest first
+
+    """
+    return [
+        dict(seq=seq, **entry)
+        for seq, entry in getMSAUserProgress().getProgress(user, after)
+    ]
+
+
+@progress_router.get("/progress/{user}/stream", response_class=StreamingResponse)
+async def user_progress_stream(
+    request: Request,
+    user: str,
+    last_event_id: Optional[int] = Header(None),
+) -> StreamingResponse:
+    """Push the progress events of a user as Server-Sent Events.
+
+    Sends the buffered events first, reconnecting clients continue after their ``Last-Event-ID``.
+    A slow client gets the latest events, older queued events are dropped.
+
+    Args:
+        request: HTTP Request.
+        user: The user.
+        last_event_id: Sequence number of the last received event, set by the EventSource on reconnect.
+
+    Returns:
+        StreamingResponse: text/event-stream
+
+    """
+    store = getMSAUserProgress()
+
+    async def events():
+        async for item in store.stream(user, last_event_id or 0):
+            if item is None and await request.is_disconnected():
+                break
+            yield store.toSSE(item)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@progress_router.websocket("/progress/{user}/ws")
+async def user_progress_websocket(websocket: WebSocket, user: str, after: int = 0):
+    """Push the progress events of a user over a WebSocket, as JSON ``{"seq", "data", "msg"}`` messages.
+
+    Sends ``{"keepalive": true}`` after 15 seconds without events.
+
+    Args:
+        websocket: The WebSocket.
+        user: The user.
+        after: Skip events up to this sequence number.
+
+    """
+    await websocket.accept()
+    try:
+        async for item in getMSAUserProgress().stream(user, after):
+            if item is None:
+                # detects closed connections of idle users
+                await websocket.send_json({"keepalive": True})
+            else:
+                # the send awaits the client, meanwhile new events queue up in the bounded subscription
+                await websocket.send_json(dict(seq=item[0], **item[1]))
+    except WebSocketDisconnect:
+        pass
+
+
+@progress_router.get("/progress_stats", response_model=MSAUserProgressStats)
+async def user_progress_stats(request: Request) -> MSAUserProgressStats:
+    """Get the metrics of the user progress store.
+
+    Args:
+        request: HTTP Request.
+
+    Returns:
+        stats: MSAUserProgressStats Pydantic Model
+
+    """
+    return getMSAUserProgress().stats()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Distributed Leases for the MSAScheduler.
+
+If several replicas of the same MSAApp run, each of them schedules every task. A lease stored in a place
+all replicas can reach (a SQLite DB or a directory on a shared volume) decides which replica runs a task,
+the others skip the run.
+
+Other stores (Redis, a SQL server, ...) can be plugged in by subclassing ``MSASchedulerLease``.
+"""
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+if __name__ == "__main__":
+    pass
+
+
+def get_replica_id() -> str:
+    """Get an id unique for this replica, build from host name, process id and a random part."""
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class MSASchedulerLease(ABC):
+    """Interface of a lease store.
+
+    A lease is held by one owner for ``ttl`` seconds, the owner can renew it by acquiring it again.
+    Once expired any owner can acquire it. Implementations must make ``acquire`` atomic across replicas.
+    """
+
+    backend: str = "base"
+    """Name of the store, reported in the Scheduler Status."""
+
+    @abstractmethod
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """Acquire or renew the lease.
+
+        Args:
+            key: Lease Key
+            owner: Replica id of the caller
+            ttl: Seconds the lease is valid from now
+
+        Returns:
+            acquired: True if ``owner`` holds the lease now
+        """
+
+    @abstractmethod
+    def release(self, key: str, owner: str) -> None:
+        """Release the lease if it is held by ``owner``.
+
+        Args:
+            key: Lease Key
+            owner: Replica id of the caller
+        """
+
+    @abstractmethod
+    def holder(self, key: str) -> Optional[str]:
+        """Get the current holder of the lease.
+
+        Args:
+            key: Lease Key
+
+        Returns:
+            owner: Replica id of the holder, None if the lease is free or expired
+        """
+
+    def close(self) -> None:
+        """Close the connection to the store."""
+
+
+class MSASchedulerSQLiteLease(MSASchedulerLease):
+    """Lease store on a SQLite DB file shared by the replicas.
+
+    Acquiring is a single atomic upsert, which only overwrites an expired lease or one of the same owner.
+    The DB uses the default rollback journal, as WAL doesn't work on network filesystems.
+
+    Args:
+        db_path: Path of the SQLite DB file
+        table: Name of the lease table, Default ``msa_scheduler_lease``
+    """
+
+    backend: str = "sqlite"
+
+    def __init__(self, db_path: str, table: str = "msa_scheduler_lease") -> None:
+        self.db_path = db_path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, timeout=10, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS {} ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)".format(
+                self.table
+            )
+        )
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO {0} (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner=excluded.owner, expires=excluded.expires "
+                "WHERE {0}.owner=excluded.owner OR {0}.expires < ?".format(self.table),
+                (key, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM {} WHERE key=? AND owner=?".format(self.table),
+                (key, owner),
+            )
+
+    def holder(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT owner FROM {} WHERE key=? AND expires >= ?".format(self.table),
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MSASchedulerFileLease(MSASchedulerLease):
+    """Lease store as lock files in a directory shared by the replicas.
+
+    Each lease is one file containing owner and expiry, read and written while holding an exclusive ``flock``.
+
+    Note:
+        Needs a filesystem with working ``flock`` across hosts (local disks, NFSv4, most container volumes),
+        only available on POSIX systems.
+
+    Args:
+        directory: Directory of the lock files, created if missing
+    """
+
+    backend: str = "file"
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(
+            self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".lease"
+        )
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        import fcntl
+
+        now = time.time()
+        with open(self._path(key), "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read().split()
+                if (
+                    len(content) == 2
+                    and content[0] != owner
+                    and float(content[1]) >= now
+                ):
+                    return False
+                f.seek(0)
+                f.truncate()
+                f.write("{} {}".format(owner, now + ttl))
+                f.flush()
+                os.fsync(f.fileno())
+                return True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def release(self, key: str, owner: str) -> None:
+        import fcntl
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return
+        with open(path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read().split()
+                if content and content[0] == owner:
+                    f.seek(0)
+                    f.truncate()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def holder(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key)) as f:
+                content = f.read().split()
+        except FileNotFoundError:
+            return None
+        if len(content) == 2 and float(content[1]) >= time.time():
+            return content[0]
+        return None
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""Runtime Metrics for the MSAScheduler.
+
+Collects per task runtime histograms, queue delays, overlaps and failure rates through rocketry hooks,
+reported by ``/scheduler`` and exported to Prometheus.
+"""
+import asyncio
+import bisect
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from msaSDK.models.scheduler import MSASchedulerTaskMetrics
+
+if __name__ == "__main__":
+    pass
+
+DEFAULT_BUCKETS: Sequence[float] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+    1800.0,
+    3600.0,
+)
+"""Upper bounds in seconds of the histogram buckets, a last ``+Inf`` bucket is added."""
+
+
+class MSAHistogram:
+    """Fixed bucket histogram, compatible with the Prometheus histogram layout.
+
+    Args:
+        buckets: Sorted upper bounds of the buckets in seconds
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets: List[float] = list(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def cumulative(self) -> Iterator[tuple]:
+        """Iterate ``(upper bound, cumulative count)`` pairs, the last upper bound is ``+Inf``."""
+        total = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside its bucket, like Prometheus ``histogram_quantile``.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            value: Estimated value in seconds, None without observations
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, previous = 0.0, 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float("inf"):
+                    return self.max
+                inside = total - previous
+                share = (rank - previous) / inside if inside else 1.0
+                return min(lower + (bound - lower) * share, self.max)
+            lower, previous = bound, total
+        return self.max
+
+    @property
+    def avg(self) -> Optional[float]:
+        """Average of the observations, None without observations."""
+        return self.sum / self.count if self.count else None
+
+
+class MSASchedulerTaskStats:
+    """Mutable metrics of one task.
+
+    Args:
+        task: Task Name
+        buckets: Histogram buckets in seconds
+    """
+
+    def __init__(self, task: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.task = task
+        self.runtime = MSAHistogram(buckets)
+        self.queue_delay = MSAHistogram(buckets)
+        self.succeeded: int = 0
+        self.failed: int = 0
+        self.terminated: int = 0
+        self.skipped: int = 0
+        self.overlaps: int = 0
+        self.last_runtime: Optional[float] = None
+        self.due_since: Optional[float] = None
+        self.trigger_delay: float = 0.0
+        self.launched: Optional[float] = None
+        self.started: Optional[float] = None
+        self.running: bool = False
+
+    @property
+    def runs(self) -> int:
+        """Number of finished runs, skipped ones included."""
+        return self.succeeded + self.failed + self.terminated + self.skipped
+
+    def to_model(self) -> MSASchedulerTaskMetrics:
+        """Convert to the MSASchedulerTaskMetrics response model."""
+        executed = self.succeeded + self.failed + self.terminated
+        return MSASchedulerTaskMetrics(
+            task=self.task,
+            runs=self.runs,
+            succeeded=self.succeeded,
+            failed=self.failed,
+            terminated=self.terminated,
+            skipped=self.skipped,
+            overlaps=self.overlaps,
+            failure_rate=self.failed / executed if executed else 0.0,
+            last_runtime=self.last_runtime,
+            runtime_avg=self.runtime.avg,
+            runtime_min=self.runtime.min,
+            runtime_max=self.runtime.max,
+            runtime_p50=self.runtime.quantile(0.5),
+            runtime_p95=self.runtime.quantile(0.95),
+            runtime_buckets={
+                str(bound): total for bound, total in self.runtime.cumulative()
+            },
+            queue_delay_avg=self.queue_delay.avg,
+            queue_delay_max=self.queue_delay.max,
+            queue_delay_p95=self.queue_delay.quantile(0.95),
+        )
+
+
+class MSASchedulerMetrics:
+    """Collects the runtime metrics of all tasks of a rocketry session.
+
+    - ``runtime``: time from the actual start of the function to the end of the run
+    - ``queue delay``: time the run was due but didn't execute yet, includes waiting for the previous run
+      (overlap), the lease jitter and the time in the pool queue
+    - ``overlaps``: number of times a task came due while its previous run was still active,
+      rocketry delays the new run until the previous one finished
+    - ``skipped``: runs which didn't execute, because another replica held the lease
+
+    Args:
+        session: The rocketry session of the scheduler
+        buckets: Histogram buckets in seconds
+    """
+
+    def __init__(self, session, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.session = session
+        self.buckets = buckets
+        self.tasks: Dict[str, MSASchedulerTaskStats] = {}
+        session.hooks.scheduler_cycle.append(self.on_cycle)
+        session.hooks.task_execute.append(self.on_execute)
+
+    def get(self, task_name: str) -> MSASchedulerTaskStats:
+        """Get the metrics of a task, created on first access."""
+        stats = self.tasks.get(task_name)
+        if stats is None:
+            stats = self.tasks[task_name] = MSASchedulerTaskStats(
+                task_name, self.buckets
+            )
+        return stats
+
+    def mark_started(self, task_name: str, started: Optional[float] = None) -> None:
+        """Record the actual start of a run, called by runners which delay the function (lease, pools).
+
+        Args:
+            task_name: Task Name
+            started: Start timestamp (``time.time()``), Default now
+        """
+        self.get(task_name).started = started if started is not None else time.time()
+
+    def on_cycle(self, scheduler) -> None:
+        """rocketry ``scheduler_cycle`` hook, detects tasks that came due while their run is still active."""
+        now = time.time()
+        for task in self.session.tasks:
+            stats = self.tasks.get(task.name)
+            # only runs which passed the execute hook, a just launched run still looks due
+            if stats is None or not stats.running or stats.due_since is not None:
+                continue
+            if not task.is_alive():
+                continue
+            try:
+                due = task.is_runnable()
+            except Exception:
+                continue
+            if due:
+                stats.due_since = now
+                stats.overlaps += 1
+
+    def on_execute(self, task):
+        """rocketry ``task_execute`` hook, times each run and records its outcome."""
+        from rocketry.exc import TaskInactionException, TaskTerminationException
+
+        stats = self.get(task.name)
+        stats.launched = time.time()
+        stats.started = None
+        stats.trigger_delay = 0.0
+        if stats.due_since is not None:
+            # the run came due while the previous one was still active
+            stats.trigger_delay = stats.launched - stats.due_since
+            stats.due_since = None
+        stats.running = True
+        exc_type, _, _ = yield
+        stats.running = False
+        end = time.time()
+        started = stats.started or stats.launched
+        queue_delay = stats.trigger_delay + started - stats.launched
+
+        if exc_type is not None and issubclass(exc_type, TaskInactionException):
+            stats.skipped += 1
+            return
+        if exc_type is None:
+            stats.succeeded += 1
+        elif issubclass(exc_type, (TaskTerminationException, asyncio.CancelledError)):
+            stats.terminated += 1
+        else:
+            stats.failed += 1
+        stats.last_runtime = end - started
+        stats.runtime.observe(stats.last_runtime)
+        stats.queue_delay.observe(queue_delay)
+
+    def status(self) -> List[MSASchedulerTaskMetrics]:
+        """Get the metrics of all tasks.
+
+        Returns:
+            metrics: List of MSASchedulerTaskMetrics
+        """
+        return [stats.to_model() for stats in self.tasks.values()]
+
+    def collect(self) -> Iterator:
+        """Yield the metrics as Prometheus metric families, see ``register_prometheus``."""
+        from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+        runtime = HistogramMetricFamily(
+            "msa_scheduler_task_runtime_seconds",
+            "Runtime of the Scheduler task runs",
+            labels=["task"],
+        )
+        queue_delay = HistogramMetricFamily(
+            "msa_scheduler_task_queue_delay_seconds",
+            "Time Scheduler task runs were due but didn't execute yet",
+            labels=["task"],
+        )
+        runs = CounterMetricFamily(
+            "msa_scheduler_task_runs",
+            "Finished Scheduler task runs by outcome",
+            labels=["task", "outcome"],
+        )
+        overlaps = CounterMetricFamily(
+            "msa_scheduler_task_overlaps",
+            "Times a Scheduler task came due while its previous run was still active",
+            labels=["task"],
+        )
+        for name, stats in list(self.tasks.items()):
+            for family, histogram in (
+                (runtime, stats.runtime),
+                (queue_delay, stats.queue_delay),
+            ):
+                family.add_metric(
+                    [name],
+                    [
+                        ("+Inf" if bound == float("inf") else str(bound), total)
+                        for bound, total in histogram.cumulative()
+                    ],
+                    histogram.sum,
+                )
+            for outcome in ("succeeded", "failed", "terminated", "skipped"):
+                runs.add_metric([name, outcome], getattr(stats, outcome))
+            overlaps.add_metric([name], stats.overlaps)
+        yield runtime
+        yield queue_delay
+        yield runs
+        yield overlaps
+
+    def register_prometheus(self, registry=None) -> None:
+        """Register the metrics with a Prometheus registry, exposed by the ``/metrics`` route.
+
+        Args:
+            registry: prometheus_client CollectorRegistry, Default the global ``REGISTRY``
+        """
+        if registry is None:
+            from prometheus_client import REGISTRY
+
+            registry = REGISTRY
+        registry.register(self)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Bounded Executor Pools for the MSAScheduler.
+
+Rocketry starts a new thread or process for every run of a ``thread`` or ``process`` task, so a burst of
+runs can create any number of them. ``MSASchedulerPool`` runs those tasks on a fixed number of workers
+with a bounded queue instead, and counts what happens to each submitted run.
+"""
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from msaSDK.models.scheduler import MSASchedulerPoolStatus
+
+if __name__ == "__main__":
+    pass
+
+
+def _call_timed(func: Callable[..., Any], kwargs: dict) -> Tuple[float, Any]:
+    # module level, so it can be pickled for process pools
+    started = time.time()
+    return started, func(**kwargs)
+
+
+class MSASchedulerPoolFull(RuntimeError):
+    """Raised if a run is submitted to a pool whose queue is full."""
+
+
+class MSASchedulerPool:
+    """Bounded thread or process pool used by the MSAServiceScheduler.
+
+    The underlying executor is created lazily on the first submit, so unused pools cost nothing.
+
+    Args:
+        kind: ``thread`` or ``process``
+        max_workers: Maximum number of workers running in parallel
+        max_queue: Maximum number of runs waiting for a free worker, further submits raise MSASchedulerPoolFull
+
+    Attributes:
+        tasks: Names of the tasks registered on this pool
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int = 100) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError("Pool kind must be thread or process, got: " + str(kind))
+        self.kind: str = kind
+        self.max_workers: int = max(1, max_workers)
+        self.max_queue: int = max(0, max_queue)
+        self.tasks: List[str] = []
+        self.completed: int = 0
+        self.failed: int = 0
+        self.timeouts: int = 0
+        self.cancelled: int = 0
+        self.rejected: int = 0
+        self._pending: int = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.Executor] = None
+
+    @property
+    def executor(self) -> concurrent.futures.Executor:
+        """The underlying executor, created on first access."""
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="MSA_Scheduler"
+                )
+        return self._executor
+
+    @property
+    def active(self) -> int:
+        """Number of runs currently executed by a worker."""
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queued(self) -> int:
+        """Number of runs waiting for a free worker."""
+        return max(0, self._pending - self.max_workers)
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        timeout: Optional[float] = None,
+        on_start: Optional[Callable[[float], None]] = None,
+        **kwargs
+    ) -> Any:
+        """Run ``func(**kwargs)`` on the pool and wait for the result.
+
+        If the waiting coroutine gets cancelled (task termination, scheduler shutdown) or the timeout expires,
+        the run is removed from the queue if it didn't start yet. A run already executed by a worker
+        can't be interrupted, its result is discarded.
+
+        Args:
+            func: The function to run, must be picklable for process pools
+            timeout: Seconds the run may take including the time in the queue, None waits forever
+            on_start: Called with the timestamp the worker started the run, once it finished
+            **kwargs: Keyword arguments passed to ``func``
+
+        Returns:
+            result: The return value of ``func``
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise MSASchedulerPoolFull(
+                    "Scheduler {} pool is full ({} running, {} queued)".format(
+                        self.kind, self.active, self.queued
+                    )
+                )
+            self._pending += 1
+        future = self.executor.submit(_call_timed, func, kwargs)
+        future.add_done_callback(self._done)
+        try:
+            started, result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            future.cancel()
+            with self._lock:
+                self.cancelled += 1
+            raise
+        if on_start is not None:
+            on_start(started)
+        return result
+
+    def _done(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def status(self) -> MSASchedulerPoolStatus:
+        """Get the current utilisation of the pool.
+
+        Returns:
+            status: MSASchedulerPoolStatus
+        """
+        with self._lock:
+            return MSASchedulerPoolStatus(
+                kind=self.kind,
+                max_workers=self.max_workers,
+                max_queue=self.max_queue,
+                active=self.active,
+                queued=self.queued,
+                utilisation=self.active / self.max_workers,
+                completed=self.completed,
+                failed=self.failed,
+                timeouts=self.timeouts,
+                cancelled=self.cancelled,
+                rejected=self.rejected,
+                tasks=list(self.tasks),
+            )
+
+    def shutdown(self) -> None:
+        """Shutdown the executor, queued runs are cancelled, running ones are not waited for."""
+        if self._executor is not None:
+            if sys.version_info >= (3, 9):
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+"""Log Repositories for the MSAScheduler.
+
+The rocketry ``MemoryRepo`` used by default keeps every run record until someone clears it,
+``MSASchedulerRingRepo`` keeps a fixed number of records instead and indexes them per task.
+``MSASchedulerSQLiteRepo`` additionally persists the records to SQLite, so the run history survives restarts.
+"""
+import datetime
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from pydantic import PrivateAttr
+from redbird.oper import (
+    Between,
+    GreaterEqual,
+    GreaterThan,
+    In,
+    LessEqual,
+    LessThan,
+    NotEqual,
+    _Skip,
+)
+from redbird.repos import MemoryRepo
+from redbird.utils.query import QueryMatcher
+
+if __name__ == "__main__":
+    pass
+
+
+def _to_timestamp(value: Union[datetime.datetime, float, None]) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class MSASchedulerRingRepo(MemoryRepo):
+    """Fixed-capacity in-memory log repository for the MSAScheduler.
+
+    Works as a ring buffer, if ``capacity`` is reached the oldest record is dropped for each new one.
+    Every record gets an increasing sequence number, which is used as cursor for the pagination.
+    Records are additionally indexed per task name, queries on a single task only touch the records of that task.
+
+    Note:
+        Rocketry conditions like ``has succeeded past 2 hours`` are evaluated against this repo,
+        so ``capacity`` should be large enough to hold the history those conditions need.
+
+    Args:
+        capacity: Maximum number of records kept, Default 10000
+        **kwargs: further redbird ``MemoryRepo`` arguments like ``model``
+
+    Examples:
+    ```python
+    from rocketry.log import LogRecord
+
+    repo = MSASchedulerRingRepo(model=LogRecord, capacity=5000)
+    records, next_cursor = repo.query_page(task_name="test_timer_min", action="fail", limit=50)
+    ```
+    """
+
+    capacity: int = 10000
+
+    _seqs: Deque[int] = PrivateAttr()
+    _index: Dict[str, Deque[Tuple[int, Any]]] = PrivateAttr()
+    _next_seq: int = PrivateAttr()
+    _lock: Any = PrivateAttr()
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.collection: Deque[Any] = deque(maxlen=self.capacity)
+        self._seqs = deque(maxlen=self.capacity)
+        self._index = {}
+        self._next_seq = 1
+        self._lock = threading.RLock()
+
+    def insert(self, item) -> None:
+        data = self.item_to_data(item)
+        with self._lock:
+            if len(self.collection) == self.capacity:
+                evicted = self.collection[0]
+                task_index = self._index.get(self.get_field_value(evicted, "task_name"))
+                if task_index:
+                    task_index.popleft()
+            seq = self._next_seq
+            self._next_seq += 1
+            self.collection.append(data)
+            self._seqs.append(seq)
+            self._index.setdefault(
+                self.get_field_value(data, "task_name"), deque()
+            ).append((seq, data))
+
+    def query_data(self, query: dict) -> Iterator[Any]:
+        task_name = query.get("task_name") if isinstance(query, dict) else None
+        matcher = QueryMatcher(query, value_getter=self.get_field_value)
+        with self._lock:
+            if isinstance(task_name, str):
+                candidates = [data for _, data in self._index.get(task_name, ())]
+            else:
+                candidates = list(self.collection)
+        for data in candidates:
+            if data in matcher:
+                yield data
+
+    def query_delete(self, query: dict) -> None:
+        matcher = QueryMatcher(query, value_getter=self.get_field_value)
+        with self._lock:
+            kept = [
+                (seq, data)
+                for seq, data in zip(self._seqs, self.collection)
+                if data not in matcher
+            ]
+            self._rebuild(kept)
+
+    def clear(self) -> None:
+        """Drop all records, the sequence numbers keep increasing so old cursors stay valid."""
+        with self._lock:
+            self._rebuild([])
+
+    def _rebuild(self, records: List[Tuple[int, Any]]) -> None:
+        self.collection = deque((data for _, data in records), maxlen=self.capacity)
+        self._seqs = deque((seq for seq, _ in records), maxlen=self.capacity)
+        self._index = {}
+        for seq, data in records:
+            self._index.setdefault(
+                self.get_field_value(data, "task_name"), deque()
+            ).append((seq, data))
+
+    def size(self) -> int:
+        """Number of records currently kept in the repo."""
+        return len(self.collection)
+
+    def task_names(self) -> List[str]:
+        """List of the task names which have records in the repo."""
+        with self._lock:
+            return [name for name, records in self._index.items() if records]
+
+    def query_page(
+        self,
+        task_name: Optional[str] = None,
+        action: Optional[str] = None,
+        created_from: Optional[datetime.datetime] = None,
+        created_to: Optional[datetime.datetime] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Tuple[int, Any]], Optional[int]]:
+        """Filtered, cursor paginated read of the records, oldest first.
+
+        Args:
+            task_name: Only records of this task
+            action: Only records with this status/action (``run``, ``success``, ``fail``, ``terminate``, ...)
+            created_from: Only records created at or after this time
+            created_to: Only records created at or before this time
+            cursor: Sequence number of the last record of the previous page, None starts at the oldest record
+            limit: Maximum number of records in the page
+
+        Returns:
+            records, next_cursor: List of (sequence number, record) and the cursor for the next page,
+                next_cursor is None if there are no more records.
+        """
+        ts_from = _to_timestamp(created_from)
+        ts_to = _to_timestamp(created_to)
+        source: Iterable[Tuple[int, Any]]
+        with self._lock:
+            if task_name is not None:
+                source = list(self._index.get(task_name, ()))
+            else:
+                source = list(zip(self._seqs, self.collection))
+        if cursor is not None:
+            after = cursor
+            source = itertools.dropwhile(lambda rec: rec[0] <= after, source)
+
+        page: List[Tuple[int, Any]] = []
+        has_more = False
+        for seq, data in source:
+            if action is not None and self.get_field_value(data, "action") != action:
+                continue
+            created = self.get_field_value(data, "created")
+            if ts_from is not None and created < ts_from:
+                continue
+            if ts_to is not None and created > ts_to:
+                continue
+            if len(page) >= limit:
+                has_more = True
+                break
+            page.append((seq, data))
+
+        next_cursor = page[-1][0] if page and has_more else None
+        return page, next_cursor
+
+
+class MSASchedulerSQLiteRepo(MSASchedulerRingRepo):
+    """Persistent SQLite log repository for the MSAScheduler.
+
+    Inserted records are kept in the in-memory ring buffer (which rocketry uses to evaluate its conditions)
+    and buffered for the database. A background thread writes the buffer in batches with ``executemany``
+    either every ``flush_interval`` seconds or as soon as ``batch_size`` records are pending,
+    so a task run never waits for a disk write. The same thread purges records older than ``retention``
+    every ``purge_interval`` seconds.
+
+    At start the latest ``capacity`` records get loaded from the database into the ring buffer,
+    paginated queries (``query_page``) read the complete retained history from the database.
+
+    Args:
+        db_path: Path to the SQLite database file
+        table: Table name, Default ``msa_scheduler_log``
+        batch_size: Number of pending records which trigger a flush, Default 100
+        flush_interval: Seconds between two flushes, Default 2.0
+        retention: Records older than this get purged, Default 30 days, None disables the purge
+        purge_interval: Seconds between two purges, Default 3600
+        **kwargs: further ``MSASchedulerRingRepo`` arguments like ``model`` and ``capacity``
+    """
+
+    db_path: str
+    table: str = "msa_scheduler_log"
+    batch_size: int = 100
+    flush_interval: float = 2.0
+    retention: Optional[datetime.timedelta] = datetime.timedelta(days=30)
+    purge_interval: float = 3600.0
+
+    _conn: Any = PrivateAttr()
+    _db_lock: Any = PrivateAttr()
+    _pending: List[Tuple[str, str, float, str]] = PrivateAttr()
+    _wake: Any = PrivateAttr()
+    _stop: Any = PrivateAttr()
+    _thread: Any = PrivateAttr()
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._db_lock = threading.Lock()
+        self._pending = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._create_table()
+        self._load_recent()
+        self._thread = threading.Thread(
+            target=self._writer, name="MSA_Scheduler_Log_Writer", daemon=True
+        )
+        self._thread.start()
+
+    def _create_table(self) -> None:
+        with self._db_lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "task_name TEXT NOT NULL, action TEXT NOT NULL, "
+                "created REAL NOT NULL, record TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_task_created "
+                f"ON {self.table} (task_name, created)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_created "
+                f"ON {self.table} (created)"
+            )
+            self._conn.commit()
+
+    def _load_recent(self) -> None:
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT record FROM (SELECT id, record FROM {self.table} "
+                "ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (self.capacity,),
+            ).fetchall()
+        for (record,) in rows:
+            super().insert(self.data_to_item(json.loads(record)))
+
+    def insert(self, item) -> None:
+        super().insert(item)
+        row = (
+            self.get_field_value(item, "task_name"),
+            self.get_field_value(item, "action"),
+            float(self.get_field_value(item, "created")),
+            json.dumps(self.item_to_dict(item), default=str),
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self) -> int:
+        """Write all pending records to the database.
+
+        Returns:
+            count: Number of written records
+        """
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if rows:
+            with self._db_lock:
+                self._conn.executemany(
+                    f"INSERT INTO {self.table} (task_name, action, created, record) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+        return len(rows)
+
+    def purge(self) -> int:
+        """Delete the records older than ``retention`` from the database.
+
+        Returns:
+            count: Number of deleted records
+        """
+        if self.retention is None:
+            return 0
+        oldest = time.time() - self.retention.total_seconds()
+        with self._db_lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created < ?", (oldest,)
+            )
+            self._conn.commit()
+        return cur.rowcount
+
+    def _writer(self) -> None:
+        next_purge = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_purge:
+                    self.purge()
+                    next_purge = time.monotonic() + self.purge_interval
+            except sqlite3.Error as e:
+                if self._stop.is_set():
+                    break
+                from loguru import logger
+
+                logger.error("Scheduler Log Writer - " + e.__str__())
+
+    def close(self) -> None:
+        """Stop the writer thread, flush the pending records and close the database."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def query_delete(self, query: dict) -> None:
+        """Delete from the ring buffer and the database.
+
+        Note:
+            The database only has the ``task_name``, ``action`` and ``created`` columns, filters on them
+            (values and the redbird operations like ``greater_than``, ``between`` or ``in_``) are translated to SQL.
+
+        Raises:
+            ValueError: For a filter on another field or an unsupported operation, nothing is deleted
+        """
+        where, params = self._query_where(query or {})
+        super().query_delete(query)
+        self.flush()
+        with self._db_lock:
+            self._conn.execute(f"DELETE FROM {self.table}{where}", params)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        self.query_delete({})
+
+    def size(self) -> int:
+        self.flush()
+        with self._db_lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[
+                0
+            ]
+
+    @staticmethod
+    def _query_where(query: dict) -> Tuple[str, list]:
+        # redbird query -> SQL, never falls back to an unfiltered statement for a filter it can not translate
+        operators = (
+            (GreaterThan, "> ?"),
+            (LessThan, "< ?"),
+            (GreaterEqual, ">= ?"),
+            (LessEqual, "<= ?"),
+            (NotEqual, "!= ?"),
+        )
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in query.items():
+            if column not in ("task_name", "action", "created"):
+                raise ValueError(f"Scheduler log delete can not filter by {column}")
+            convert: Callable[[Any], Any] = (
+                (lambda v: v) if column != "created" else _to_timestamp
+            )
+            if isinstance(value, _Skip):
+                continue
+            if isinstance(value, Between):
+                clauses.append(f"{column} BETWEEN ? AND ?")
+                params.extend((convert(value.start), convert(value.end)))
+            elif isinstance(value, In):
+                values = [convert(v) for v in value.value]
+                clauses.append(
+                    f"{column} IN ({', '.join('?' * len(values))})" if values else "0"
+                )
+                params.extend(values)
+            elif isinstance(value, tuple(operator for operator, _ in operators)):
+                sql = next(
+                    sql for operator, sql in operators if isinstance(value, operator)
+                )
+                clauses.append(f"{column} {sql}")
+                params.append(convert(value.value))
+            elif isinstance(value, (str, int, float, datetime.datetime)):
+                clauses.append(f"{column} = ?")
+                params.append(convert(value))
+            else:
+                raise ValueError(
+                    f"Scheduler log delete can not filter by {column}={value!r}"
+                )
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _where(
+        task_name: Any = None,
+        action: Any = None,
+        ts_from: Optional[float] = None,
+        ts_to: Optional[float] = None,
+        cursor: Optional[int] = None,
+    ) -> Tuple[str, list]:
+        clauses, params = [], []
+        for column, value in (("task_name", task_name), ("action", action)):
+            if isinstance(value, str):
+                clauses.append(column + " = ?")
+                params.append(value)
+        for clause, value in (
+            ("created >= ?", ts_from),
+            ("created <= ?", ts_to),
+            ("id > ?", cursor),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query_page(
+        self,
+        task_name: Optional[str] = None,
+        action: Optional[str] = None,
+        created_from: Optional[datetime.datetime] = None,
+        created_to: Optional[datetime.datetime] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Tuple[int, Any]], Optional[int]]:
+        """Filtered, cursor paginated read of the complete retained history from the database.
+
+        The cursor is the row id of the record, see ``MSASchedulerRingRepo.query_page`` for the arguments.
+        """
+        self.flush()
+        where, params = self._where(
+            task_name,
+            action,
+            _to_timestamp(created_from),
+            _to_timestamp(created_to),
+            cursor,
+        )
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT id, record FROM {self.table}{where} ORDER BY id LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+        page = [
+            (row_id, self.data_to_item(json.loads(record)))
+            for row_id, record in rows[:limit]
+        ]
+        next_cursor = page[-1][0] if len(rows) > limit else None
+        return page, next_cursor
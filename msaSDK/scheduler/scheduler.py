@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""MSAServiceScheduler, the MSAScheduler used by MSAApp.
+
+Adds per task execution modes on bounded pools, timeouts, cancellation, distributed leases
+and runtime metrics to the msaUtils MSAScheduler.
+"""
+import asyncio
+import datetime
+import functools
+import inspect
+import random
+from typing import Any, Callable, Dict, List, Optional
+
+from rocketry.core.time.base import TimeDelta, TimeInterval
+from rocketry.exc import TaskInactionException
+
+from msaSDK.models.scheduler import MSASchedulerLeaseStatus, MSASchedulerPoolStatus
+from msaSDK.scheduler.lease import MSASchedulerLease, get_replica_id
+from msaSDK.scheduler.metrics import MSASchedulerMetrics
+from msaSDK.scheduler.pool import MSASchedulerPool
+from msaUtils.scheduler import MSAScheduler
+
+if __name__ == "__main__":
+    pass
+
+
+class MSAServiceScheduler(MSAScheduler):
+    """MSAScheduler with bounded execution pools.
+
+    Each task declares its execution mode when it's registered:
+
+    - ``async``: runs as coroutine on the event loop of the service (Default)
+    - ``thread``: runs on the bounded thread pool
+    - ``process``: runs on the bounded process pool, the function must be picklable (defined on module level)
+    - ``main``: runs blocking in the scheduler loop, as rocketry does
+
+    ``thread`` and ``process`` tasks are registered as ``async`` tasks with rocketry, which awaits the run
+    on the pool, so the number of parallel threads/processes never exceeds the pool sizes.
+
+    If a ``lease`` store is given, each run first waits a random jitter and then claims the lease of the task,
+    only the replica holding the lease runs it, the others skip the run (it's logged as ``inaction``).
+    The lease is kept for the period of the task, at least ``lease_ttl`` seconds, and renewed while the run takes
+    longer: for ``every 10 min`` ten minutes from the claim, for ``daily`` or ``hourly`` until the day or hour ends.
+    The replicas count intervals from their own start, so a replica with an offset finds the lease of the run in
+    the current period still held. The holder keeps running the task, another replica takes over once the holder
+    stops renewing.
+
+    Runtime, queue delay, overlaps and outcome of every run are collected in ``metrics``.
+
+    Args:
+        thread_workers: Maximum number of parallel ``thread`` task runs, Default 4
+        process_workers: Maximum number of parallel ``process`` task runs, Default 2
+        pool_queue: Maximum number of runs waiting for a free worker per pool, Default 100
+        lease: Lease store shared by the replicas, Default None runs every task on every replica
+        lease_prefix: Prefix of the lease keys, use the service name so services can share a store
+        lease_ttl: Seconds a lease is held after it was claimed or renewed, Default 30
+        jitter: Maximum random delay in seconds before a run claims its lease, Default 1
+        **kwargs: further MSAScheduler arguments
+
+    Examples:
+    ```python
+    @app.scheduler.task("every 10 sec", execution="thread", timeout=5)
+    def blocking_io():
+        ...
+
+    @app.scheduler.task("every 1 min", execution="process", timeout=30)
+    def cpu_bound():
+        ...
+
+    app.scheduler.cancel("cpu_bound")
+
+    # runs on every replica, even if a lease store is used
+    @app.scheduler.task("every 1 hour", lease=False)
+    def clear_local_cache():
+        ...
+    ```
+    """
+
+    def __init__(
+        self,
+        thread_workers: int = 4,
+        process_workers: int = 2,
+        pool_queue: int = 100,
+        lease: Optional[MSASchedulerLease] = None,
+        lease_prefix: str = "",
+        lease_ttl: float = 30.0,
+        jitter: float = 1.0,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.pools: Dict[str, MSASchedulerPool] = {
+            "thread": MSASchedulerPool("thread", thread_workers, pool_queue),
+            "process": MSASchedulerPool("process", process_workers, pool_queue),
+        }
+        self.replica: str = get_replica_id()
+        self.lease: Optional[MSASchedulerLease] = lease
+        self.lease_prefix: str = lease_prefix
+        self.lease_ttl: float = lease_ttl
+        self.jitter: float = jitter
+        self.leases: Dict[str, MSASchedulerLeaseStatus] = {}
+        self._lease_periods: Dict[str, Any] = {}
+        self.metrics: MSASchedulerMetrics = MSASchedulerMetrics(self.session)
+
+    def task(
+        self,
+        start_cond=None,
+        name: Optional[str] = None,
+        execution: Optional[str] = None,
+        timeout: Optional[float] = None,
+        lease: bool = True,
+        **kwargs
+    ):
+        """Create a task, works like ``Rocketry.task`` with an execution mode, timeout and lease.
+
+        Args:
+            start_cond: Rocketry start condition, like ``every 10 sec``
+            name: Task Name, Default the function name
+            execution: ``async``, ``thread``, ``process`` or ``main``, Default the scheduler config ``task_execution``
+            timeout: Seconds a run may take (including the time waiting for a pool worker), None for no timeout,
+                ``async`` tasks need a coroutine function for a timeout, ``main`` tasks can't have one
+            lease: Claim the lease before each run if a lease store is set, False runs the task on every replica
+            **kwargs: further rocketry task arguments
+
+        Returns:
+            decorator or task: Like ``Rocketry.task``, the decorator returns the undecorated function
+        """
+        mode: str = execution or self.session.config.task_execution
+        if mode == "main" and timeout is not None:
+            # main runs block the scheduler loop, nothing could interrupt them
+            raise ValueError(
+                "A task timeout needs execution async, thread or process, not main"
+            )
+        lease = lease and self.lease is not None
+        if not lease and (mode == "main" or (mode == "async" and timeout is None)):
+            return super().task(start_cond, name=name, execution=mode, **kwargs)
+
+        def register(func: Callable[..., Any]):
+            task_name = name or func.__name__
+            runner = self._make_runner(func, task_name, mode, timeout, lease)
+            task = super(MSAServiceScheduler, self).task(
+                start_cond,
+                name=task_name,
+                execution="main" if mode == "main" else "async",
+                func=runner,
+                **kwargs
+            )
+            if lease:
+                self._lease_periods[task_name] = self._period(
+                    getattr(task, "start_cond", None)
+                )
+            return task
+
+        if "func" in kwargs:
+            return register(kwargs.pop("func"))
+
+        def decorator(func: Callable[..., Any]):
+            register(func)
+            return func
+
+        return decorator
+
+    def _make_runner(
+        self,
+        func: Callable[..., Any],
+        task_name: str,
+        execution: str,
+        timeout: Optional[float],
+        lease: bool = False,
+    ) -> Callable[..., Any]:
+        if execution == "main":
+
+            @functools.wraps(func)
+            def main_runner(**kwargs):
+                # no jitter, it would block the scheduler loop
+                if not self._claim(task_name):
+                    raise TaskInactionException("Lease held by another replica")
+                return func(**kwargs)
+
+            return main_runner
+
+        if execution == "async":
+            if timeout is not None and not inspect.iscoroutinefunction(func):
+                # a sync function blocks the event loop, wait_for could not interrupt it
+                raise ValueError(
+                    "Task "
+                    + task_name
+                    + ": a timeout needs execution thread or process for a sync function"
+                )
+
+            async def call(**kwargs):
+                if inspect.iscoroutinefunction(func):
+                    return await asyncio.wait_for(func(**kwargs), timeout)
+                return func(**kwargs)
+
+        elif execution in self.pools:
+            pool = self.pools[execution]
+            pool.tasks.append(task_name)
+
+            def on_start(started: float) -> None:
+                self.metrics.mark_started(task_name, started)
+
+            async def call(**kwargs):
+                return await pool.run(
+                    func, timeout=timeout, on_start=on_start, **kwargs
+                )
+
+        else:
+            raise ValueError(
+                "Task execution must be async, thread, process or main, got: "
+                + str(execution)
+            )
+
+        if not lease:
+            return functools.wraps(func)(call)
+
+        @functools.wraps(func)
+        async def runner(**kwargs):
+            if self.jitter > 0:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, self._claim, task_name):
+                raise TaskInactionException("Lease held by another replica")
+            self.metrics.mark_started(task_name)
+            run = asyncio.ensure_future(call(**kwargs))
+            try:
+                while True:
+                    done, _ = await asyncio.wait({run}, timeout=self.lease_ttl / 3)
+                    if done:
+                        return run.result()
+                    await loop.run_in_executor(None, self._claim, task_name)
+            finally:
+                run.cancel()
+
+        return runner
+
+    @staticmethod
+    def _period(start_cond) -> Any:
+        # the time period of "every 10 min", "daily", "hourly between ..." conditions, None for others
+        period = getattr(start_cond, "period", None)
+        if period is None and isinstance(
+            getattr(start_cond, "_cls_period", None), type
+        ):
+            try:
+                period = start_cond._cls_period()
+            except TypeError:
+                return None
+        return period if isinstance(period, (TimeDelta, TimeInterval)) else None
+
+    def _lease_seconds(self, task_name: str) -> float:
+        """Seconds the lease of a task is held: the task period, at least ``lease_ttl``."""
+        period = self._lease_periods.get(task_name)
+        seconds = 0.0
+        if isinstance(period, TimeDelta):
+            seconds = period.past.total_seconds()
+        elif isinstance(period, TimeInterval):
+            now = datetime.datetime.now()
+            seconds = (period.rollforward(now).right - now).total_seconds()
+        return max(self.lease_ttl, seconds)
+
+    def _claim(self, task_name: str) -> bool:
+        """Claim (or renew) the lease of a task, record the outcome in ``leases``.
+
+        Args:
+            task_name: Task Name
+
+        Returns:
+            claimed: True if this replica holds the lease and runs the task
+        """
+        if self.lease is None:
+            # without a lease store every replica runs the task
+            return True
+        lease = self.lease
+        status = self.leases.setdefault(
+            task_name, MSASchedulerLeaseStatus(task=task_name)
+        )
+        key = self.lease_prefix + ":" + task_name
+        try:
+            claimed = lease.acquire(key, self.replica, self._lease_seconds(task_name))
+            status.holder = self.replica if claimed else lease.holder(key)
+        except Exception as e:
+            # fail closed, a run on two replicas is worse than a missed one
+            status.errors += 1
+            if self.logger:
+                self.logger.error("Scheduler Lease - " + key + " failed: " + str(e))
+            return False
+        if claimed:
+            status.claimed += 1
+        else:
+            status.contended += 1
+        return claimed
+
+    def cancel(self, name: str) -> None:
+        """Cancel the running run of a task, a run still waiting for a pool worker is dropped.
+
+        Args:
+            name: Task Name
+        """
+        self.session[name].terminate()
+
+    def pool_status(self) -> List[MSASchedulerPoolStatus]:
+        """Get the utilisation of the execution pools.
+
+        Returns:
+            pools: List of MSASchedulerPoolStatus
+        """
+        return [pool.status() for pool in self.pools.values()]
+
+    def lease_status(self) -> List[MSASchedulerLeaseStatus]:
+        """Get the lease contention per task.
+
+        Returns:
+            leases: List of MSASchedulerLeaseStatus
+        """
+        return [status.copy() for status in self.leases.values()]
+
+    def shutdown_pools(self) -> None:
+        """Shutdown the execution pools and close the lease store."""
+        for pool in self.pools.values():
+            pool.shutdown()
+        if self.lease is not None:
+            self.lease.close()
@@ -5,11 +5,12 @@ Initialize with a MSAServiceDefintion Instance to control the features and funct
 
 """
 import asyncio
+import datetime
 import os
 from asyncio import Task
-from typing import List, Union
+from typing import AsyncIterator, List, Optional, Union
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Query
 from fastapi.encoders import jsonable_encoder
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.exceptions import RequestValidationError
@@ -20,20 +21,21 @@ from sqlmodel import SQLModel
 from starlette import status
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.requests import Request
-from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.responses import (HTMLResponse, JSONResponse, Response,
+                                 StreamingResponse)
 from starlette.staticfiles import StaticFiles
 from starlette.templating import _TemplateResponse
 from starlette_context import plugins
 
 from msaUtils.models.health import MSAHealthMessage, MSAHealthDefinition
 from msaSDK.models.openapi import MSAOpenAPIInfo
-from msaUtils.models.scheduler import (MSASchedulerLog,
-                                     MSASchedulerRepoLogRecord,
-                                     MSASchedulerStatus,
+from msaSDK.models.scheduler import (MSASchedulerLogPage,
+                                     MSASchedulerServiceStatus)
+from msaUtils.models.scheduler import (MSASchedulerRepoLogRecord,
                                      MSASchedulerTaskDetail,
                                      MSASchedulerTaskStatus)
 from msaSDK.models.service import (MSAServiceDefinition,
-                                   MSAServiceStatus)
+                                   MSAServiceStatus, MSAWarmupReport)
 from msaSDK.msaapi import MSAFastAPI
 from msaSDK.security import getMSASecurity
 from msaUtils.errorhandling import getMSABaseExceptionHandler
@@ -118,11 +120,16 @@ class MSAApp(MSAFastAPI):
         healthdefinition: MSAHealthDefinition settings.healthdefinition
         limiter: Limiter = None
         db_engine: AsyncEngine = Db Engine instance
+        json_db_engine: MSAJSONIndexedDB = JSON DB instance (TinyDB with secondary indexes)
+        json_db_async: MSAJSONDBAsync async facade of json_db_engine, runs the TinyDB calls off the event loop
         sql_models: List[SQLModel] = sql_models
         sql_cruds: List[MSASQLModelCrud] = []
-        scheduler: MSAScheduler = None
+        scheduler: MSAServiceScheduler = None
         site: AdminSite Admin/Auth Site instance.
         scheduler_task: The Task instance that runs the Scheduler in the Background
+        ready: bool False until the internal startup event (incl. the Warmup phase) has finished
+        warmup_report: MSAWarmupReport with the cold vs. warm latencies of the Warmup phase
+        index_advice: List[MSAIndexAdvice] of the Admin Site filter columns, see ``site_index_advisor``
         ROOTPATH: str os.path.join(os.path.dirname(__file__))
 
     """
@@ -146,12 +153,16 @@ class MSAApp(MSAFastAPI):
         self.healthdefinition: MSAHealthDefinition = self.settings.healthdefinition
         self.limiter: "Limiter" = None
         self.sqlite_db_engine: "AsyncEngine" = None
-        self.json_db_engine: "TinyDB" = None
+        self.json_db_engine: "MSAJSONIndexedDB" = None
+        self.json_db_async: "MSAJSONDBAsync" = None
         self.sql_models: List[SQLModel] = sql_models
         self.sql_cruds: List["MSASQLModelCrud"] = []
-        self.scheduler: "MSAScheduler" = None
+        self.scheduler: "MSAServiceScheduler" = None
         self.site = None
         self._scheduler_task: Task = None
+        self.ready: bool = False
+        self.warmup_report: MSAWarmupReport = MSAWarmupReport(name=settings.name)
+        self.index_advice: List["MSAIndexAdvice"] = []
         self.ROOTPATH = os.path.join(os.path.dirname(__file__))
         self.abstract_fs: "MSAFilesystem" = None
         self.fs: "FS" = None
@@ -212,18 +223,37 @@ class MSAApp(MSAFastAPI):
             self.logger.info("Excluded Admin Auth Site")
 
         if self.settings.json_db:
-            self.logger.info("JSON DB - Init: " + self.settings.sqlite_db_url)
+            self.logger.info("JSON DB - Init: " + self.settings.json_db_url)
             from tinydb import TinyDB
             from tinydb.storages import MemoryStorage
 
+            from msaSDK.jsondb.asyncdb import MSAJSONDBAsync
+            from msaSDK.jsondb.index import MSAJSONIndexedDB
+
             if self.settings.json_db_memory_only:
-                self.json_db_engine = TinyDB(
-                    self.settings.json_db_url, storage=MemoryStorage
+                self.json_db_engine = MSAJSONIndexedDB(
+                    self.settings.json_db_url,
+                    indexes=self.settings.json_db_indexes,
+                    storage=MemoryStorage,
+                )
+            elif self.settings.json_db_storage == "log":
+                from msaSDK.jsondb.storage import MSAJSONLogStorage
+
+                self.logger.info("JSON DB - Write-behind Log Storage")
+                self.json_db_engine = MSAJSONIndexedDB(
+                    self.settings.json_db_url,
+                    indexes=self.settings.json_db_indexes,
+                    storage=MSAJSONLogStorage,
+                    flush_interval=self.settings.json_db_flush_interval,
+                    compact_interval=self.settings.json_db_compact_interval,
                 )
             else:
-                self.json_db_engine = TinyDB(
-                    self.settings.json_db_url, storage=TinyDB.default_storage_class
+                self.json_db_engine = MSAJSONIndexedDB(
+                    self.settings.json_db_url,
+                    indexes=self.settings.json_db_indexes,
+                    storage=TinyDB.default_storage_class,
                 )
+            self.json_db_async = MSAJSONDBAsync(self.json_db_engine)
         else:
             self.logger.info("JSON Excluded DB")
 
@@ -246,10 +276,10 @@ class MSAApp(MSAFastAPI):
                     "SQLite DB - Register/CRUD SQL Models: " + str(self.sql_models)
                 )
                 # register all Models and the crud for them
-                from msaCRUD import MSASQLModelCrud
+                from msaSDK.crud import MSAKeysetSQLModelCrud
 
                 for model in self.sql_models:
-                    new_crud: MSASQLModelCrud = MSASQLModelCrud(
+                    new_crud: MSAKeysetSQLModelCrud = MSAKeysetSQLModelCrud(
                         model=model, engine=self.sqlite_db_engine
                     ).register_crud()
                     if self.settings.sqlite_db_crud:
@@ -296,6 +326,14 @@ class MSAApp(MSAFastAPI):
         else:
             self.logger.info("Excluded Sysrouter")
 
+        if self.settings.progressrouter:
+            self.logger.info("Include Progressrouter")
+            from msaSDK.router.progress import progress_router
+
+            self.include_router(progress_router)
+        else:
+            self.logger.info("Excluded Progressrouter")
+
         if self.settings.cors:
             self.logger.info("Add Middleware CORS")
             from starlette.middleware.cors import CORSMiddleware
@@ -407,14 +445,26 @@ class MSAApp(MSAFastAPI):
                     "/scheduler",
                     self.get_scheduler_status,
                     tags=["service"],
-                    response_model=MSASchedulerStatus,
+                    response_model=MSASchedulerServiceStatus,
                 )
                 self.add_api_route(
                     "/scheduler_log",
                     self.get_scheduler_log,
                     tags=["service"],
-                    response_model=MSASchedulerLog,
+                    response_model=MSASchedulerLogPage,
+                )
+                self.add_api_route(
+                    "/scheduler_log/stream",
+                    self.get_scheduler_log_stream,
+                    tags=["service"],
+                    response_class=StreamingResponse,
                 )
+            self.add_api_route(
+                "/ready",
+                self.get_services_ready,
+                tags=["service"],
+                response_model=MSAWarmupReport,
+            )
             self.add_api_route(
                 "/status",
                 self.get_services_status,
@@ -508,6 +558,13 @@ class MSAApp(MSAFastAPI):
                 tags=["service"],
                 response_class=HTMLResponse,
             )
+            try:
+                from msaSDK.session import backend as session_backend
+
+                session_backend.register_prometheus()
+            except ValueError as e:
+                # another MSAApp in this process registered the session metrics already
+                self.logger.warning("Session Metrics - Prometheus: " + str(e))
         else:
             self.logger.info("Excluded Prometheus Instrument and Expose")
 
@@ -517,11 +574,65 @@ class MSAApp(MSAFastAPI):
 
         if self.settings.scheduler:
             self.logger.info("Add Scheduler")
-            from msaUtils.scheduler import MSAScheduler
+            from rocketry.log import LogRecord
 
-            self.scheduler = MSAScheduler(
-                msa_logger=logger_gruru, config={"task_execution": "async"}
+            from msaSDK.scheduler.repo import (MSASchedulerRingRepo,
+                                               MSASchedulerSQLiteRepo)
+            from msaSDK.scheduler.scheduler import MSAServiceScheduler
+
+            if self.settings.scheduler_log_to_db:
+                from sqlalchemy.engine import make_url
+
+                self.logger.info(
+                    "Scheduler Log - SQLite: " + self.settings.sqlite_db_url
+                )
+                retention_days = self.settings.scheduler_log_retention_days
+                log_repo = MSASchedulerSQLiteRepo(
+                    model=LogRecord,
+                    capacity=self.settings.scheduler_log_capacity,
+                    db_path=make_url(self.settings.sqlite_db_url).database,
+                    retention=datetime.timedelta(days=retention_days)
+                    if retention_days > 0
+                    else None,
+                )
+            else:
+                log_repo = MSASchedulerRingRepo(
+                    model=LogRecord, capacity=self.settings.scheduler_log_capacity
+                )
+            lease = None
+            if self.settings.scheduler_lease == "sqlite":
+                from msaSDK.scheduler.lease import MSASchedulerSQLiteLease
+
+                lease = MSASchedulerSQLiteLease(self.settings.scheduler_lease_url)
+            elif self.settings.scheduler_lease == "file":
+                from msaSDK.scheduler.lease import MSASchedulerFileLease
+
+                lease = MSASchedulerFileLease(self.settings.scheduler_lease_url)
+            if lease:
+                self.logger.info(
+                    "Scheduler Lease - "
+                    + lease.backend
+                    + ": "
+                    + self.settings.scheduler_lease_url
+                )
+            self.scheduler = MSAServiceScheduler(
+                thread_workers=self.settings.scheduler_thread_workers,
+                process_workers=self.settings.scheduler_process_workers,
+                pool_queue=self.settings.scheduler_pool_queue,
+                lease=lease,
+                lease_prefix=self.settings.name,
+                lease_ttl=self.settings.scheduler_lease_ttl,
+                jitter=self.settings.scheduler_jitter,
+                msa_logger=logger_gruru,
+                logger_repo=log_repo,
+                config={"task_execution": "async"},
             )
+            if self.settings.instrument:
+                try:
+                    self.scheduler.metrics.register_prometheus()
+                except ValueError as e:
+                    # another MSAApp in this process registered its scheduler metrics already
+                    self.logger.warning("Scheduler Metrics - Prometheus: " + str(e))
 
         elif not self.settings.scheduler:
             self.logger.info("Excluded Scheduler, Disabled")
@@ -615,6 +726,12 @@ class MSAApp(MSAFastAPI):
             if self.site and self.auto_mount_site:
                 self.site.settings.language="en_US"
                 self.mount_site()
+                await self.site.on_startup()
+                if self.settings.site_index_advisor:
+                    try:
+                        await self.advise_site_indexes()
+                    except Exception as e:
+                        self.logger.error("Index Advisor - " + e.__str__())
 
         if self.settings.scheduler:
             self.logger.info("Scheduler - Start")
@@ -623,6 +740,32 @@ class MSAApp(MSAFastAPI):
                 name="MSA_Scheduler",
             )
 
+        if self.settings.warmup:
+            self.logger.info("Warmup - Start")
+            from msaSDK.warmup import MSAWarmup
+
+            self.warmup_report = await MSAWarmup(msa_app=self).run()
+            self.logger.info("Warmup - " + self.warmup_report.message)
+        else:
+            self.logger.info("Excluded Warmup")
+        self.ready = True
+        self.warmup_report.ready = True
+
+    async def advise_site_indexes(self) -> None:
+        """Run the MSAIndexAdvisor over the ModelAdmins of the site and log the filter columns without an index."""
+        from msaSDK.admin.indexes import MSAIndexAdvisor
+
+        self.index_advice = await MSAIndexAdvisor(self.site.iter_model_admins()).run(
+            create=self.settings.site_index_create
+        )
+        for advice in self.index_advice:
+            if advice.status == "error":
+                self.logger.error("Index Advisor - " + advice.message)
+            elif advice.status in ("missing", "unindexable") or advice.uses_index is False:
+                self.logger.warning("Index Advisor - " + advice.message)
+            elif advice.status == "created":
+                self.logger.info("Index Advisor - " + advice.message)
+
     def mount_site(self) -> None:
         if self.site:
             self.logger.info("Mount Admin Site")
@@ -633,6 +776,7 @@ class MSAApp(MSAFastAPI):
     async def shutdown_event(self) -> None:
         """Internal Shutdown event handler"""
         self.logger.info("msaSDK Internal Shutdown MSAUIEvent")
+        self.ready = False
         if self.settings.scheduler:
             self.logger.info("Stop Schedulers")
 
@@ -649,6 +793,14 @@ class MSAApp(MSAFastAPI):
             self._scheduler_task = None
             del self._scheduler_task
 
+            self.logger.info("Shutdown Scheduler Pools and Lease")
+            self.scheduler.shutdown_pools()
+
+            repo = self.scheduler.session.get_repo()
+            if hasattr(repo, "close"):
+                self.logger.info("Scheduler Log - Flush and Close")
+                repo.close()
+
         if self.site:
             self.logger.info("Stopping Site")
             self.site = None
@@ -668,8 +820,8 @@ class MSAApp(MSAFastAPI):
                 )
 
         if self.settings.json_db:
-            self.logger.info("JSON DB - Close: " + self.settings.sqlite_db_url)
-            self.json_db_engine.close()
+            self.logger.info("JSON DB - Close: " + self.settings.json_db_url)
+            await self.json_db_async.close()
 
         if self.settings.sqlite_db:
             self.logger.info(
@@ -704,19 +856,21 @@ class MSAApp(MSAFastAPI):
 
         return ORJSONResponse(content=jsonable_encoder(msg))
 
-    async def get_scheduler_status(self, request: Request) -> MSASchedulerStatus:
+    async def get_scheduler_status(
+        self, request: Request
+    ) -> MSASchedulerServiceStatus:
         """
-        Get Service Scheduler Status, with the registered Task's
+        Get Service Scheduler Status, with the registered Task's, the utilisation of the execution pools, the lease contention and the runtime metrics per task
 
         Args:
             request: The input http request object
 
         Returns:
-            sst: MSASchedulerStatus Pydantic Response Model
+            sst: MSASchedulerServiceStatus Pydantic Response Model
 
         """
         self.logger.info("Called - get_scheduler_status :" + str(request.url))
-        sst: MSASchedulerStatus = MSASchedulerStatus()
+        sst: MSASchedulerServiceStatus = MSASchedulerServiceStatus()
         if not self.settings.scheduler:
             sst.name = self.settings.name
             sst.message = "Scheduler is disabled!"
@@ -728,6 +882,12 @@ class MSAApp(MSAFastAPI):
                 nt.name = task.name
                 nt.detail = MSASchedulerTaskDetail.parse_obj(task)
                 sst.tasks.append(nt)
+            sst.pools = self.scheduler.pool_status()
+            sst.replica = self.scheduler.replica
+            sst.metrics = self.scheduler.metrics.status()
+            if self.scheduler.lease:
+                sst.lease_backend = self.scheduler.lease.backend
+                sst.leases = self.scheduler.lease_status()
             sst.message = "Scheduler is enabled!"
 
         return sst
@@ -735,47 +895,172 @@ class MSAApp(MSAFastAPI):
     async def get_scheduler_log(
         self,
         request: Request,
+        task: Optional[str] = None,
+        task_status: Optional[str] = None,
+        created_from: Optional[datetime.datetime] = None,
+        created_to: Optional[datetime.datetime] = None,
+        cursor: Optional[int] = None,
+        limit: int = Query(100, ge=1, le=1000),
         optionClearLog: bool = False,
         optionFORCEClearLog: bool = False,
-    ) -> MSASchedulerLog:
+    ) -> MSASchedulerLogPage:
         """
-        Get Service Scheduler Log
+        Get Service Scheduler Log, filtered and cursor paginated (oldest records first)
 
         Args:
             request: The input http request object
+            task: Only records of this task name
+            task_status: Only records with this action (run, success, fail, terminate, inaction, crash)
+            created_from: Only records created at or after this time
+            created_to: Only records created at or before this time
+            cursor: The ``next_cursor`` of the previous page, empty for the first page
+            limit: Maximum number of records in the page, 1 to 1000
             optionClearLog: If True the Log gets cleared after the response was build
             optionFORCEClearLog: Forcing the clearing of the log before the response gets created
 
         Returns:
-            sst: MSASchedulerLog Pydantic Response Model
+            sst: MSASchedulerLogPage Pydantic Response Model
 
         """
         self.logger.info("Called - get_scheduler_log :" + str(request.url))
-        sst: MSASchedulerLog = MSASchedulerLog()
+        sst: MSASchedulerLogPage = MSASchedulerLogPage(cursor=cursor)
+        sst.name = self.settings.name
         if not self.settings.scheduler:
-            sst.name = self.settings.name
             sst.message = "Scheduler is disabled!"
 
         else:
-            from redbird.repos import MemoryRepo
-
-            sst.name = self.settings.name
-            repo: MemoryRepo = self.scheduler.session.get_repo()
+            repo = self.scheduler.session.get_repo()
             if optionFORCEClearLog:
-                repo.collection.clear()
-            for log_entry in repo.filter_by().all():
-                le: MSASchedulerRepoLogRecord = MSASchedulerRepoLogRecord.parse_obj(
-                    log_entry
-                )
-                sst.log.append(le)
+                repo.filter_by().delete()
+            records, sst.next_cursor = self._query_scheduler_log(
+                repo, task, task_status, created_from, created_to, cursor, limit
+            )
+            sst.log = [
+                MSASchedulerRepoLogRecord.parse_obj(log_entry)
+                for _, log_entry in records
+            ]
+            sst.capacity = getattr(repo, "capacity", None)
+            sst.size = (
+                repo.size() if hasattr(repo, "size") else len(repo.collection)
+            )
             if optionClearLog:
-                repo.collection.clear()
+                repo.filter_by().delete()
                 sst.message = "Scheduler is enabled! Scheduler Log cleared!"
             else:
                 sst.message = "Scheduler is enabled!"
 
         return sst
 
+    async def get_scheduler_log_stream(
+        self,
+        request: Request,
+        task: Optional[str] = None,
+        task_status: Optional[str] = None,
+        created_from: Optional[datetime.datetime] = None,
+        created_to: Optional[datetime.datetime] = None,
+        cursor: Optional[int] = None,
+    ) -> StreamingResponse:
+        """
+        Stream the Service Scheduler Log as NDJSON, one MSASchedulerRepoLogRecord per line
+
+        Args:
+            request: The input http request object
+            task: Only records of this task name
+            task_status: Only records with this action (run, success, fail, terminate, inaction, crash)
+            created_from: Only records created at or after this time
+            created_to: Only records created at or before this time
+            cursor: Only records after this cursor
+
+        Returns:
+            StreamingResponse: application/x-ndjson
+
+        """
+        self.logger.info("Called - get_scheduler_log_stream :" + str(request.url))
+        if not self.settings.scheduler:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Scheduler is disabled!"
+            )
+        repo = self.scheduler.session.get_repo()
+
+        async def ndjson_lines() -> AsyncIterator[str]:
+            page_cursor = cursor
+            while True:
+                records, page_cursor = self._query_scheduler_log(
+                    repo, task, task_status, created_from, created_to, page_cursor, 500
+                )
+                for _, log_entry in records:
+                    yield MSASchedulerRepoLogRecord.parse_obj(log_entry).json() + "\n"
+                if page_cursor is None:
+                    break
+                await asyncio.sleep(0)
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    @staticmethod
+    def _query_scheduler_log(
+        repo,
+        task: Optional[str],
+        task_status: Optional[str],
+        created_from: Optional[datetime.datetime],
+        created_to: Optional[datetime.datetime],
+        cursor: Optional[int],
+        limit: int,
+    ) -> tuple:
+        """Query one page of the Scheduler Log, also for log repos which are not a MSASchedulerRingRepo.
+
+        Other repos are filtered and paginated in memory, the cursor is the position of the record in the log.
+        """
+        from msaSDK.scheduler.repo import MSASchedulerRingRepo, _to_timestamp
+
+        if isinstance(repo, MSASchedulerRingRepo):
+            return repo.query_page(
+                task_name=task,
+                action=task_status,
+                created_from=created_from,
+                created_to=created_to,
+                cursor=cursor,
+                limit=limit,
+            )
+        query = {}
+        if task:
+            query["task_name"] = task
+        if task_status:
+            query["action"] = task_status
+        ts_from = _to_timestamp(created_from)
+        ts_to = _to_timestamp(created_to)
+        records = []
+        for seq, data in enumerate(repo.filter_by(**query).all(), start=1):
+            if cursor is not None and seq <= cursor:
+                continue
+            created = _to_timestamp(repo.get_field_value(data, "created"))
+            if ts_from is not None and (created is None or created < ts_from):
+                continue
+            if ts_to is not None and (created is None or created > ts_to):
+                continue
+            if len(records) >= limit:
+                return records, records[-1][0]
+            records.append((seq, data))
+        return records, None
+
+    async def get_services_ready(self, request: Request) -> ORJSONResponse:
+        """
+        Get Service Readiness and the Warmup Report
+
+        Args:
+            request: The input http request object
+
+        Returns:
+            report: MSAWarmupReport as ORJSONResponse, status 503 until the service is ready
+
+        """
+        self.logger.info("Called - get_services_ready :" + str(request.url))
+        return ORJSONResponse(
+            content=jsonable_encoder(self.warmup_report),
+            status_code=status.HTTP_200_OK
+            if self.ready
+            else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
     async def get_services_status(self, request: Request) -> MSAServiceStatus:
         """
         Get Service Status Info
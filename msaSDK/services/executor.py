@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Process Pool for the WDC Document Processing.
+
+Building the paragraphs and sentences of a WDCDocument is CPU bound. ``WDCDocumentExecutor`` converts the
+pages of a document in parallel on ``aiomultiprocess`` worker processes, so the event loop of the service stays
+free. Each page is converted with its own offset 0 and shifted to its place in the document afterwards.
+
+The number of documents in progress is capped, further documents wait in a bounded queue, a full queue
+answers 429 and a closed or broken pool 503.
+"""
+import asyncio
+import os
+import time
+from functools import lru_cache
+from typing import Iterator, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from starlette import status
+
+from msaSDK.models.sdu import SDUPage
+from msaSDK.models.wdc import WDCDocument, WDCPage
+from msaSDK.services.wdc import createNewParagraphs, shiftWDCPage
+
+if __name__ == "__main__":
+    pass
+
+
+class WDCExecutorStatus(BaseModel):
+    """
+    **WDCExecutorStatus** Pydantic Response Class, metrics of the WDCDocumentExecutor
+    """
+
+    running: bool = False
+    """True if the worker processes are started."""
+    processes: int = 0
+    """Number of worker processes."""
+    documents_active: int = 0
+    """Documents currently converted."""
+    documents_queued: int = 0
+    """Documents waiting for a free slot, the queue depth."""
+    max_documents: int = 0
+    """Maximum number of documents converted at the same time."""
+    max_queue: int = 0
+    """Maximum number of waiting documents, further documents get rejected with 429."""
+    pages_pending: int = 0
+    """Pages submitted to the workers and not finished yet."""
+    utilisation: float = 0.0
+    """Share of the worker time spent converting pages since the start, 0.0 to 1.0."""
+    completed: int = 0
+    """Converted documents."""
+    failed: int = 0
+    """Documents which failed."""
+    rejected: int = 0
+    """Documents rejected because the queue was full or the pool unavailable."""
+
+
+class WDCExecutorFull(HTTPException):
+    """Raised if the document queue is full, answered with 429 Too Many Requests."""
+
+    def __init__(self, retry_after: int = 1) -> None:
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Document processing is saturated, retry later!",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class WDCExecutorUnavailable(HTTPException):
+    """Raised if the pool is closed or its workers died, answered with 503 Service Unavailable."""
+
+    def __init__(self, detail: str = "Document processing is unavailable!") -> None:
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
+
+
+async def _processPage(
+    pageid: int, sdu_page: SDUPage, optionSentiment: bool, langcode: str
+) -> Tuple[WDCPage, int, float]:
+    # runs in the worker process, module level so it can be pickled
+    started = time.perf_counter()
+    page = WDCPage()
+    page.id = pageid
+    length = await createNewParagraphs(page, sdu_page, 0, optionSentiment, langcode)
+    return page, length, time.perf_counter() - started
+
+
+class WDCDocumentExecutor:
+    """Converts documents page by page on a pool of worker processes.
+
+    The pool is started on the first document.
+
+    Args:
+        processes: Number of worker processes, Default number of CPUs
+        max_documents: Maximum number of documents converted at the same time, Default 4
+        max_queue: Maximum number of documents waiting for a slot, Default 16
+
+    Examples:
+    ```python
+    executor = getWDCDocumentExecutor()
+    doc = await executor.process(sdu_pages, langcode="de")
+    ```
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        max_documents: int = 4,
+        max_queue: int = 16,
+    ) -> None:
+        self.processes = max(1, processes or os.cpu_count() or 2)
+        self.max_documents = max(1, max_documents)
+        self.max_queue = max(0, max_queue)
+        self.completed: int = 0
+        self.failed: int = 0
+        self.rejected: int = 0
+        self.busy: float = 0.0
+        self.pages_pending: int = 0
+        self._active: int = 0
+        self._queued: int = 0
+        self._closed = False
+        self._started: Optional[float] = None
+        self._pool = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _getPool(self):
+        if self._closed:
+            raise WDCExecutorUnavailable("Document processing is shut down!")
+        if self._pool is None:
+            from aiomultiprocess import Pool
+
+            # one page at a time per worker, the conversion is CPU bound
+            self._pool = Pool(processes=self.processes, childconcurrency=1)
+            self._slots = asyncio.Semaphore(self.max_documents)
+            self._started = time.perf_counter()
+        return self._pool
+
+    async def process(
+        self,
+        sdu_pages: Sequence[SDUPage],
+        optionSentiment: bool = False,
+        langcode: str = "en",
+        doc: Optional[WDCDocument] = None,
+    ) -> WDCDocument:
+        """Convert the pages of a document on the worker processes.
+
+        Args:
+            sdu_pages: The SDU pages, page ids are their positions
+            optionSentiment: Passed to ``createNewParagraphs``
+            langcode: Language code
+            doc: Document to add the pages to, Default a new WDCDocument
+
+        Returns:
+            doc: The WDCDocument with the converted pages
+
+        Raises:
+            WDCExecutorFull: 429 if ``max_queue`` documents are already waiting
+            WDCExecutorUnavailable: 503 if the pool is shut down or a worker died
+        """
+        try:
+            pool = self._getPool()
+        except WDCExecutorUnavailable:
+            self.rejected += 1
+            raise
+        slots = self._slots
+        assert slots is not None, "slots is None"
+        if self._active >= self.max_documents and self._queued >= self.max_queue:
+            self.rejected += 1
+            raise WDCExecutorFull()
+
+        self._queued += 1
+        try:
+            await slots.acquire()
+        finally:
+            self._queued -= 1
+        self._active += 1
+        self.pages_pending += len(sdu_pages)
+        try:
+            results = await asyncio.gather(
+                *[
+                    pool.apply(
+                        _processPage, (pageid, sdu_page, optionSentiment, langcode)
+                    )
+                    for pageid, sdu_page in enumerate(sdu_pages)
+                ]
+            )
+        except Exception as e:
+            self.failed += 1
+            if not pool.running:
+                raise WDCExecutorUnavailable() from e
+            raise
+        finally:
+            self.pages_pending -= len(sdu_pages)
+            self._active -= 1
+            slots.release()
+
+        if doc is None:
+            doc = WDCDocument()
+        parmove = 0
+        for page, length, busy in results:
+            shiftWDCPage(page, parmove)
+            parmove += length
+            self.busy += busy
+            doc.addPage(page)
+        self.completed += 1
+        return doc
+
+    def status(self) -> WDCExecutorStatus:
+        """Get the queue depth and worker utilisation."""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return WDCExecutorStatus(
+            running=self._pool is not None and not self._closed,
+            processes=self.processes,
+            documents_active=self._active,
+            documents_queued=self._queued,
+            max_documents=self.max_documents,
+            max_queue=self.max_queue,
+            pages_pending=self.pages_pending,
+            utilisation=min(1.0, self.busy / (elapsed * self.processes))
+            if elapsed
+            else 0.0,
+            completed=self.completed,
+            failed=self.failed,
+            rejected=self.rejected,
+        )
+
+    def collect(self) -> Iterator:
+        """Yield the metrics as Prometheus metric families, see ``register_prometheus``."""
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        stats = self.status()
+        queue = GaugeMetricFamily(
+            "msa_wdc_executor_documents", "WDC documents by state", labels=["state"]
+        )
+        queue.add_metric(["active"], stats.documents_active)
+        queue.add_metric(["queued"], stats.documents_queued)
+        yield queue
+        yield GaugeMetricFamily(
+            "msa_wdc_executor_pages_pending",
+            "WDC pages submitted to the workers and not finished yet",
+            value=stats.pages_pending,
+        )
+        yield GaugeMetricFamily(
+            "msa_wdc_executor_utilisation",
+            "Share of the worker time spent converting pages",
+            value=stats.utilisation,
+        )
+        documents = CounterMetricFamily(
+            "msa_wdc_executor_results", "WDC documents by outcome", labels=["outcome"]
+        )
+        for outcome in ("completed", "failed", "rejected"):
+            documents.add_metric([outcome], getattr(stats, outcome))
+        yield documents
+
+    def register_prometheus(self, registry=None) -> None:
+        """Register the metrics with a Prometheus registry, exposed by the ``/metrics`` route.
+
+        Args:
+            registry: prometheus_client CollectorRegistry, Default the global ``REGISTRY``
+        """
+        if registry is None:
+            from prometheus_client import REGISTRY
+
+            registry = REGISTRY
+        registry.register(self)
+
+    async def close(self) -> None:
+        """Stop the worker processes, running documents get cancelled."""
+        self._closed = True
+        if self._pool is not None:
+            self._pool.terminate()
+            await self._pool.join()
+
+
+@lru_cache()
+def getWDCDocumentExecutor() -> WDCDocumentExecutor:
+    """
+    This function returns a cached instance of the WDCDocumentExecutor object.
+    Note:
+        Configured by the environment: ``WDC_PROCESSES`` (Default number of CPUs), ``WDC_MAX_DOCUMENTS``
+        (Default 4) and ``WDC_MAX_QUEUE`` (Default 16).
+    """
+    return WDCDocumentExecutor(
+        processes=int(os.getenv("WDC_PROCESSES", "0")) or None,
+        max_documents=int(os.getenv("WDC_MAX_DOCUMENTS", "4")),
+        max_queue=int(os.getenv("WDC_MAX_QUEUE", "16")),
+    )
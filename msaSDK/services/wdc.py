@@ -1,126 +1,316 @@
 # -*- coding: utf-8 -*-
 
-import html
+import asyncio
 import json
-from typing import Dict, List
+from array import array
+from itertools import groupby
+from typing import (Any, AsyncIterator, Dict, Iterable, List, Optional,
+                    Tuple)
 
-import pandas as pd
+from starlette.responses import StreamingResponse
 
 from msaSDK.models.sdu import SDUPage, SDUSentence
-from msaSDK.models.wdc import (WDCDocument, WDCMLDocument, WDCPage,
-                               WDCParagraph, WDCPosition, WDCSentence, WDCSpan,
-                               WDCToken, WDCTriple, WDCWord)
+from msaSDK.models.wdc import (WDCDocument, WDCPage, WDCParagraph,
+                               WDCPosition, WDCSentence, WDCSpan, WDCToken,
+                               WDCTriple, WDCWord)
+from msaSDK.services.wdcml import loadMLDoc
 from msaUtils.errorhandling import getMSABaseExceptionHandler
 
 if __name__ == "__main__":
     pass
 
 
-async def getResultSentences(doc: WDCDocument):
+class WDCDocumentIndex:
+    """Flattened, array backed view over the results of a WDCDocument.
+
+    Walks the document once and keeps flat lists of the paragraphs, sentences, tokens, words and triples,
+    plus offset arrays: the children of the n-th element of a level are ``children[off[n]:off[n + 1]]``.
+    Pages, paragraphs and sentences are addressed by their position in the flat lists, the ``*_key`` dicts map
+    ids to those positions. Entities are sorted and grouped by type once.
+
+    The index is a snapshot of the document, build it once and pass it to the ``getResult*`` helpers to share it,
+    build a new one after the document changed.
+
+    Args:
+        doc: The WDCDocument
+    """
+
+    def __init__(self, doc: WDCDocument) -> None:
+        self.doc = doc
+        self.pages: List[WDCPage] = list(doc.pages)
+        self.paragraphs: List[WDCParagraph] = []
+        self.sentences: List[WDCSentence] = []
+        self.tokens: List[WDCToken] = []
+        self.words: List[WDCWord] = []
+        self.triples: List[WDCTriple] = []
+        # page -> paragraphs, paragraph -> sentences, sentence -> tokens / triples, token -> words
+        self.page_off = array("q", [0])
+        self.para_off = array("q", [0])
+        self.sen_tok_off = array("q", [0])
+        self.sen_triple_off = array("q", [0])
+        self.tok_off = array("q", [0])
+        # owner of each paragraph and sentence, as position in the flat lists
+        self.para_page = array("q")
+        self.sen_para = array("q")
+        # ids -> positions
+        self.page_key: Dict[int, int] = {}
+        self.para_key: Dict[Tuple[int, int], int] = {}
+        self.sen_key: Dict[Tuple[int, int, int], int] = {}
+
+        for pi, page in enumerate(self.pages):
+            self.page_key.setdefault(page.id, pi)
+            for para in page.paragraphs:
+                self.para_key.setdefault((page.id, para.id), len(self.paragraphs))
+                self.para_page.append(pi)
+                self.paragraphs.append(para)
+                for sen in para.sentences:
+                    self.sen_key.setdefault(
+                        (page.id, para.id, sen.id), len(self.sentences)
+                    )
+                    self.sen_para.append(len(self.paragraphs) - 1)
+                    self.sentences.append(sen)
+                    for tok in sen.tokens:
+                        self.tokens.append(tok)
+                        self.words.extend(tok.words)
+                        self.tok_off.append(len(self.words))
+                    self.triples.extend(sen.triples)
+                    self.sen_tok_off.append(len(self.tokens))
+                    self.sen_triple_off.append(len(self.triples))
+                self.para_off.append(len(self.sentences))
+            self.page_off.append(len(self.paragraphs))
+
+        self.entities: List[WDCSpan] = list(doc.entities)
+        ordered = sorted(self.entities, key=lambda x: (x.type, x.text.lower(), x.text))
+        self.entity_groups: Dict[str, List[WDCSpan]] = {
+            type_: list(group) for type_, group in groupby(ordered, key=lambda x: x.type)
+        }
+        self.sentence_entities: Dict[Tuple[int, int, int], List[WDCSpan]] = {}
+        for ent in self.entities:
+            for pos in ent.positions[:1]:
+                self.sentence_entities.setdefault(
+                    (pos.pageid, pos.paraid, pos.senid), []
+                ).append(ent)
+
+    def pageParagraphs(self, page: int) -> List[WDCParagraph]:
+        """Paragraphs of the page at position ``page``."""
+        return self.paragraphs[self.page_off[page] : self.page_off[page + 1]]
+
+    def paragraphSentences(self, para: int) -> List[WDCSentence]:
+        """Sentences of the paragraph at position ``para``."""
+        return self.sentences[self.para_off[para] : self.para_off[para + 1]]
+
+    def pageSentences(self, page: int) -> List[WDCSentence]:
+        """Sentences of the page at position ``page``."""
+        return self.sentences[
+            self.para_off[self.page_off[page]] : self.para_off[self.page_off[page + 1]]
+        ]
+
+    def sentenceTokens(self, sen: int) -> List[WDCToken]:
+        """Tokens of the sentence at position ``sen``."""
+        return self.tokens[self.sen_tok_off[sen] : self.sen_tok_off[sen + 1]]
+
+    def sentenceWords(self, sen: int) -> List[WDCWord]:
+        """Words of the sentence at position ``sen``."""
+        return self.words[
+            self.tok_off[self.sen_tok_off[sen]] : self.tok_off[self.sen_tok_off[sen + 1]]
+        ]
+
+    def sentenceTriples(self, sen: int) -> List[WDCTriple]:
+        """Triples of the sentence at position ``sen``."""
+        return self.triples[self.sen_triple_off[sen] : self.sen_triple_off[sen + 1]]
+
+    def pageTokens(self, page: int) -> List[WDCToken]:
+        """Tokens of the page at position ``page``."""
+        first = self.para_off[self.page_off[page]]
+        last = self.para_off[self.page_off[page + 1]]
+        return self.tokens[self.sen_tok_off[first] : self.sen_tok_off[last]]
+
+    def sentenceEntities(self, pageid: int, paraid: int, senid: int) -> List[WDCSpan]:
+        """Entities starting in the sentence with the given page, paragraph and sentence ids."""
+        return self.sentence_entities.get((pageid, paraid, senid), [])
+
+    def sentenceIds(self, sen: int) -> Tuple[int, int, int]:
+        """Page, paragraph and sentence id of the sentence at position ``sen``."""
+        para = self.sen_para[sen]
+        return (
+            self.pages[self.para_page[para]].id,
+            self.paragraphs[para].id,
+            self.sentences[sen].id,
+        )
+
+
+def _getIndex(doc: WDCDocument, index: Optional[WDCDocumentIndex]) -> WDCDocumentIndex:
+    # the result helpers build an index of their own unless the caller shares one
+    return WDCDocumentIndex(doc) if index is None else index
+
+
+async def getResultSentences(
+    doc: WDCDocument, index: Optional[WDCDocumentIndex] = None
+):
+    return list(_getIndex(doc, index).sentences)
+
+
+async def getResultDependencies(
+    doc: WDCDocument, index: Optional[WDCDocumentIndex] = None
+):
+    index = _getIndex(doc, index)
     ret = []
-    pages = doc.pages
-    for page in pages:
-        for para in page.paragraphs:
-            ret += para.sentences
-            # for sen in para.sentences:
-            # sen = seno.copy(exclude={'tokens', 'words', 'positions', 'entities'})
-            # ret.append(sen)
+    for sen, seno in enumerate(index.sentences):
+        pageid, paraid, senid = index.sentenceIds(sen)
+        ret.append(
+            {
+                "pageid": pageid,
+                "paraid": paraid,
+                "senid": senid,
+                "sentence": seno.text,
+                "deps": list(seno.dependencies),
+            }
+        )
     return ret
 
 
-async def getResultDependencies(doc: WDCDocument):
+async def getResultTriples(doc: WDCDocument, index: Optional[WDCDocumentIndex] = None):
+    return list(_getIndex(doc, index).triples)
+
+
+async def getResultEntities(doc: WDCDocument):
+    return doc.entities
+
+
+async def getResultEntitiesGroups(
+    doc: WDCDocument, index: Optional[WDCDocumentIndex] = None
+):
+    return {
+        type_: list(group)
+        for type_, group in _getIndex(doc, index).entity_groups.items()
+    }
+
+
+async def getResultTokens(doc: WDCDocument, index: Optional[WDCDocumentIndex] = None):
+    return list(_getIndex(doc, index).tokens)
+
+
+async def getResultWords(doc: WDCDocument, index: Optional[WDCDocumentIndex] = None):
+    return list(_getIndex(doc, index).words)
+
+
+async def getResultParagraphs(
+    doc: WDCDocument, index: Optional[WDCDocumentIndex] = None
+):
+    return list(_getIndex(doc, index).paragraphs)
+
+
+async def getResultPages(doc: WDCDocument):
     ret = []
     pages = doc.pages
-    for page in pages:
+    for pageo in pages:
+        ret.append(
+            {"id": pageo.id, "nparagraphs": pageo.nparagraphs, "content": pageo.content}
+        )
+    return ret
+
 
+def _iterPages(doc) -> Iterable[WDCPage]:
+    # a WDCLazyDocument (msaSDK.services.wdccache) decodes each page when reached
+    iter_pages = getattr(doc, "iterPages", None)
+    return iter_pages() if iter_pages is not None else doc.pages
+
+
+async def iterResultSentences(doc: WDCDocument) -> AsyncIterator[WDCSentence]:
+    """Yield the sentences page by page, the streaming variant of ``getResultSentences``."""
+    for page in _iterPages(doc):
+        for para in page.paragraphs:
+            for sen in para.sentences:
+                yield sen
+        await asyncio.sleep(0)
+
+
+async def iterResultDependencies(doc: WDCDocument) -> AsyncIterator[Dict]:
+    """Yield the dependencies of each sentence page by page, the streaming variant of ``getResultDependencies``."""
+    for page in _iterPages(doc):
         for para in page.paragraphs:
             for seno in para.sentences:
-                deps: List = [dep for dep in seno.dependencies]
-                res: Dict = {
+                yield {
                     "pageid": page.id,
                     "paraid": para.id,
                     "senid": seno.id,
                     "sentence": seno.text,
-                    "deps": deps,
+                    "deps": list(seno.dependencies),
                 }
-                ret.append(res)
-    return ret
+        await asyncio.sleep(0)
 
 
-async def getResultTriples(doc: WDCDocument):
-    ret = []
-    pages = doc.pages
-    for page in pages:
+async def iterResultTokens(doc: WDCDocument) -> AsyncIterator[WDCToken]:
+    """Yield the tokens page by page, the streaming variant of ``getResultTokens``."""
+    for page in _iterPages(doc):
         for para in page.paragraphs:
-            for seno in para.sentences:
-                ret += seno.triples
-    return ret
+            for sen in para.sentences:
+                for tok in sen.tokens:
+                    yield tok
+        await asyncio.sleep(0)
 
 
-async def getResultEntities(doc: WDCDocument):
-    ret = []
+async def iterResultWords(doc: WDCDocument) -> AsyncIterator[WDCWord]:
+    """Yield the words page by page, the streaming variant of ``getResultWords``."""
+    for page in _iterPages(doc):
+        for para in page.paragraphs:
+            for sen in para.sentences:
+                for tok in sen.tokens:
+                    for wrd in tok.words:
+                        yield wrd
+        await asyncio.sleep(0)
 
-    # for ent in doc.entities:
-    # ent = ento.copy(exclude={'tokens', 'words', 'positions'})
-    # ret.append(ent)
-    return doc.entities
 
+STREAM_MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/x-msgpack",
+}
+"""Media types of the ``streamResult`` formats."""
 
-async def getResultEntitiesGroups(doc: WDCDocument):
-    ret = {}
-    lst: List[WDCSpan] = doc.entities.copy()
-    lst.sort(key=lambda x: (x.type, x.text.lower(), x.text))
 
-    for ent in lst:
-        # ent = ento.copy(exclude={'tokens', 'words'})
-        if ent.type in ret.keys():
-            ret[ent.type] = list(ret[ent.type]) + [ent]
-        else:
-            ret[ent.type] = [ent]
-    return ret
+def streamResult(
+    items: AsyncIterator[Any], format: str = "ndjson", batch_size: int = 500
+) -> StreamingResponse:
+    """Stream the items of an ``iterResult*`` generator as response, without building the complete list.
 
+    Items are encoded one by one and sent in chunks of ``batch_size`` items.
 
-async def getResultTokens(doc: WDCDocument):
-    ret = []
-    pages = doc.pages
-    for page in pages:
-        for para in page.paragraphs:
-            for sen in para.sentences:
-                ret += sen.tokens
+    Args:
+        items: Async iterator of pydantic models or dicts, like ``iterResultTokens(doc)``
+        format: ``ndjson`` one JSON document per line, or ``msgpack`` a sequence of msgpack objects
+        batch_size: Items per chunk, Default 500
 
-    return ret
+    Returns:
+        StreamingResponse: application/x-ndjson or application/x-msgpack
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise ValueError("Stream format must be ndjson or msgpack, got: " + str(format))
+    if format == "msgpack":
+        import msgpack
 
+        packer = msgpack.Packer(use_bin_type=True, default=str)
 
-async def getResultWords(doc: WDCDocument):
-    ret = []
-    pages = doc.pages
-    for page in pages:
-        for para in page.paragraphs:
-            for sen in para.sentences:
-                for tok in sen.tokens:
-                    ret += tok.words
-    return ret
+        def encode(item: Any) -> bytes:
+            return packer.pack(item.dict() if hasattr(item, "dict") else item)
 
+    else:
 
-async def getResultParagraphs(doc: WDCDocument):
-    ret = []
-    pages = doc.pages
-    for page in pages:
-        ret += page.paragraphs
-        # for para in page.paragraphs:
-        # para = parao.copy(exclude={'sentences', 'entities'})
-        # ret.append(para)
-    return ret
+        def encode(item: Any) -> bytes:
+            if hasattr(item, "json"):
+                return item.json().encode("utf-8") + b"\n"
+            return json.dumps(item, default=str).encode("utf-8") + b"\n"
 
+    async def chunks() -> AsyncIterator[bytes]:
+        batch: List[bytes] = []
+        async for item in items:
+            batch.append(encode(item))
+            if len(batch) >= batch_size:
+                yield b"".join(batch)
+                batch = []
+        if batch:
+            yield b"".join(batch)
 
-async def getResultPages(doc: WDCDocument):
-    ret = []
-    pages = doc.pages
-    for pageo in pages:
-        ret.append(
-            {"id": pageo.id, "nparagraphs": pageo.nparagraphs, "content": pageo.content}
-        )
-    return ret
+    return StreamingResponse(chunks(), media_type=STREAM_MEDIA_TYPES[format])
 
 
 async def createEntityOnly(
@@ -210,19 +400,19 @@ async def createEntity(
         nent.addPosition(npos)
         nent.ntokens = len(ent.tokens)
 
-        for ti, tok in enumerate(ent.tokens):
-            ntok = await createToken(
-                tok,
-                optionDensity=optionDensity,
-                optionNatural=optionNatural,
-                langcode=langcode,
-            )
+        ntoks = convertTokens(
+            ent.tokens,
+            optionDensity=optionDensity,
+            optionNatural=optionNatural,
+            langcode=langcode,
+        )
+        nwrds = convertWords(ent.words[: len(ntoks)])
+        for ti, ntok in enumerate(ntoks):
             ntok.position.senid = ent.sent.index
             ntok.position.paraid = paragraph.id
             ntok.position.pageid = paragraph.position.pageid
-            if len(ent.words) > ti:
-                nwrd = await createWord(ent.words[ti])
-                ntok.words.append(nwrd)
+            if len(nwrds) > ti:
+                ntok.words.append(nwrds[ti])
 
             nent.tokens.append(ntok)
 
@@ -232,103 +422,116 @@ async def createEntity(
     return nent
 
 
+DEP_ROLES: Dict[str, str] = {
+    "nsubj": "agent",
+    "iobj": "recipient",
+    "dobj": "undergoer",
+    "mod": "oblique",
+    "nmod": "oblique",
+    "nmod_prep": "oblique",
+    "nsubjpass": "undergoer",
+    "advcl": "oblique",
+    "nmod:agent": "agent",
+    "ccomp": "eventuality",
+    "xcomp": "eventuality",
+    "acl_prep": "eventuality",
+    "advcl_prep": "eventuality",
+    "acl": "eventuality",
+    "parataxis": "eventuality",
+    "tmod": "oblique",
+    "nmod:tmod": "oblique",
+    "agent": "agent",
+    "vmod": "undergoer",
+}
+"""Semantic role of a dependency relation, unknown relations have no role."""
+
+
+def convertWords(wrds) -> List[WDCWord]:
+    """Convert the (stanza) words of a token, sentence or page to WDCWords in one pass.
+
+    The words come from the NLP pipeline and are trusted, so the WDCWords are built without validation.
+
+    Args:
+        wrds: Iterable of words
+
+    Returns:
+        nwrds: List of WDCWord, empty words are skipped
+    """
+    construct = WDCWord.construct
+    roles = DEP_ROLES
+    nwrds = []
+    for wrd in wrds:
+        if not wrd:
+            continue
+        fields = {
+            "id": wrd.id,
+            "text": wrd.text,
+            "misc": wrd.misc,
+            "lemma": wrd.lemma,
+            "pos": wrd.upos,
+            "type": wrd.xpos,
+            "morph": wrd.feats if wrd.feats is not None else "",
+        }
+        if wrd.head:
+            fields["head"] = wrd.head
+        if wrd.deprel:
+            fields["label"] = wrd.deprel
+        if wrd.deps:
+            fields["deps"] = wrd.deps
+            fields["role"] = roles.get(wrd.deps, "")
+        nwrds.append(construct(**fields))
+    return nwrds
+
+
+def convertTokens(
+    toks, optionDensity: bool = False, optionNatural: bool = False, langcode: str = "en"
+) -> List[WDCToken]:
+    """Convert the (stanza) tokens of a sentence or page, including their words, to WDCTokens in one pass.
+
+    Args:
+        toks: Iterable of tokens, like ``sentence.tokens``
+        optionDensity: Reserved, like ``createToken``
+        optionNatural: Reserved, like ``createToken``
+        langcode: Language code
+
+    Returns:
+        ntoks: List of WDCToken, empty tokens are skipped
+    """
+    construct = WDCToken.construct
+    construct_pos = WDCPosition.construct
+    ntoks = []
+    for tok in toks:
+        if not tok:
+            continue
+        fields = {
+            "id": tok.id[0],
+            "text": tok.text,
+            "misc": {"nlp": tok.misc},
+            "position": construct_pos(s=tok.start_char, e=tok.end_char),
+            "words": convertWords(tok.words),
+        }
+        if tok.ner:
+            fields["ner"] = tok.ner
+        ntoks.append(construct(**fields))
+    return ntoks
+
+
 async def createToken(tok, optionDensity: bool, optionNatural: bool, langcode: str):
     if not tok:
         return None
-
-    ntok = WDCToken()
-    ntok.id = tok.id[0]
-    ntok.text = tok.text
-    ntok.misc["nlp"] = tok.misc
-    ntok.position.s = tok.start_char
-    ntok.position.e = tok.end_char
-    if tok.ner:
-        ntok.ner = tok.ner
-    for wrd in tok.words:
-        nwrd = await createWord(wrd)
-        ntok.words.append(nwrd)
-
-    return ntok
+    return convertTokens(
+        [tok], optionDensity=optionDensity, optionNatural=optionNatural, langcode=langcode
+    )[0]
 
 
 async def createWord(wrd):
     if not wrd:
         return None
-
-    nwrd = WDCWord()
-    nwrd.id = wrd.id
-    nwrd.text = wrd.text
-    nwrd.misc = wrd.misc
-
-    nwrd.lemma = wrd.lemma
-    nwrd.pos = wrd.upos
-    nwrd.type = wrd.xpos
-    nwrd.morph = wrd.feats
-    if nwrd.morph is None:
-        nwrd.morph = ""
-    if wrd.head:
-        nwrd.head = wrd.head
-    if wrd.deprel:
-        nwrd.label = wrd.deprel
-    if wrd.deps:
-        nwrd.deps = wrd.deps
-        nwrd.role = await getCompleteRoleFromDep(nwrd.deps)
-
-    return nwrd
+    return convertWords([wrd])[0]
 
 
 async def getCompleteRoleFromDep(dep) -> str:
-    if dep == "nsubj":
-        return "agent"
-    if dep == "iobj":
-        return "recipient"
-    if dep == "dobj":
-        return "undergoer"
-    if dep == "mod":
-        return "oblique"
-    if dep == "nmod":
-        return "oblique"
-    if dep == "nmod_prep":
-        return "oblique"
-    if dep == "nsubjpass":
-        return "undergoer"
-    if dep == "advcl":
-        return "oblique"
-    if dep == "nmod:agent":
-        return "agent"
-    if dep == "ccomp":
-        return "eventuality"
-    if dep == "xcomp":
-        return "eventuality"
-    if dep == "acl_prep":
-        return "eventuality"
-    if dep == "advcl_prep":
-        return "eventuality"
-    if dep == "advcl":
-        return "eventuality"
-    if dep == "acl":
-        return "eventuality"
-    if dep == "acl_prep":
-        return "eventuality"
-    if dep == "parataxis":
-        return "eventuality"
-    if dep == "tmod":
-        return "oblique"
-    if dep == "nmod:tmod":
-        return "oblique"
-    if dep == "agent":
-        return "agent"
-    if dep == "vmod":
-        return "undergoer"
-    if dep == "nsubj":
-        return "not(undergoer),not(recipient),not(oblique)"
-    if dep == "iobj":
-        return "not(undergoer),not(agent),not(oblique)"
-    if dep == "dobj":
-        return "not(agent),not(recipient),not(oblique)"
-    if dep == "nmod_prep":
-        return "not(undergoer),not(recipient),not(agent)"
-    return ""
+    return DEP_ROLES.get(dep, "")
 
 
 async def createTriple(triple: Dict, x):
@@ -373,34 +576,73 @@ async def createNewMLDoc(
     optionTargetFields: str = "IMPULSKATEGORIE, IMPULSART",
     optionTrainFields: str = "SACHVERHALT",
 ):
-    newdoc = WDCMLDocument()
-    sheet_value: str
-    sheet_key: str
-    value: dict
-    key: str
-    targetsList = optionTargetFields.split(",")
-    trainList = optionTrainFields.split(",")
-
-    newdoc.targetsList = [entry.strip() for entry in targetsList]
-    newdoc.trainList = [entry.strip() for entry in trainList]
-
-    for sheet_key, sheet_value in data.items():
-        data = json.loads(sheet_value)
-        newdoc.raw_json.append(data)
-        sheet_df: pd.DataFrame
-        final_df: pd.DataFrame = pd.DataFrame()
-
-        sheet_df = pd.read_json(sheet_value)
-        final_df.index = sheet_df.index
-
-        col_list: List = newdoc.targetsList + newdoc.trainList
-        final_df[col_list] = sheet_df[col_list]
-
-        newdoc.df_data.append(final_df.to_dict())
-        newdoc.content += html.escape(final_df.to_html(notebook=True))
-
-    newdoc.content = newdoc.content.replace("\n ", "").replace("\n", "")
-    return newdoc
+    # each sheet is parsed once and only the target and train columns are kept
+    return loadMLDoc(data, optionTargetFields, optionTrainFields).toMLDocument()
+
+
+async def createNewParagraph(
+    page: WDCPage, parT, xp: int, parmove: int, langcode: str
+) -> Tuple[WDCParagraph, int]:
+    """Convert one SDU paragraph, starting at the character offset ``parmove``.
+
+    Args:
+        page: The WDCPage the paragraph belongs to, not changed
+        parT: The SDU paragraph
+        xp: Paragraph id, its position on the page
+        parmove: Character offset of the paragraph in the document
+        langcode: Language code
+
+    Returns:
+        result: The WDCParagraph and the offset after it
+    """
+    npar = await createParagraph(parT, xp)
+    npar.semantic = parT.semantic_type
+    npos = WDCPosition()
+    npos.s = parmove
+    if langcode == "en":
+        if len(parT.sentences_en) < 1:
+            parT.sentences_en = parT.sentences.copy()
+    for si, sen in enumerate(parT.sentences):
+
+        sen_en: SDUSentence = parT.sentences_en[si]
+        nsen = WDCSentence()
+        nsenpos = WDCPosition()
+        nsenpos.s = parmove
+        nsenpos.pageid = page.id
+        nsenpos.paraid = xp
+        nsenpos.senid = sen.id
+        nsen.text = sen.text
+        if len(nsen.text_en) < 1 and len(sen_en.text) > 0:
+            nsen.text_en = sen_en.text
+        if len(nsen.en_tokens) < 1 and len(sen_en.tokens) > 0:
+            nsen.en_tokens = sen_en.tokens.copy()
+
+        if len(nsen.en_upos) < 1 and len(sen_en.upos) > 0:
+            nsen.en_upos = sen_en.upos.copy()
+        if len(nsen.en_xpos) < 1 and len(sen_en.xpos) > 0:
+            nsen.en_xpos = sen_en.xpos.copy()
+
+        if len(nsen.lng_tokens) < 1 and len(sen.tokens) > 0:
+            nsen.lng_tokens = sen.tokens.copy()
+
+        if len(nsen.lng_upos) < 1 and len(sen.upos) > 0:
+            nsen.lng_upos = sen.upos.copy()
+        if len(nsen.lng_xpos) < 1 and len(sen.xpos) > 0:
+            nsen.lng_xpos = sen.xpos.copy()
+
+        nsen.id = sen.id
+        npar.nsentences += 1
+        parmove += len(sen.text) + 1
+        nsenpos.e = parmove
+        nsen.addPosition(nsenpos)
+        npar.addSentence(nsen)
+
+    npos.e = parmove
+    npos.pageid = page.id
+    npos.paraid = xp
+    npos.senid = -1
+    npar.addPosition(npos)
+    return npar, parmove
 
 
 async def createNewParagraphs(
@@ -409,54 +651,79 @@ async def createNewParagraphs(
     try:
 
         for xp, parT in enumerate(sdu_page.text.paragraphs):
-            npar = await createParagraph(parT, xp)
-            npar.semantic = parT.semantic_type
-            npos = WDCPosition()
-            npos.s = parmove
-            if langcode == "en":
-                if len(parT.sentences_en) < 1:
-                    parT.sentences_en = parT.sentences.copy()
-            for si, sen in enumerate(parT.sentences):
-
-                sen_en: SDUSentence = parT.sentences_en[si]
-                nsen = WDCSentence()
-                nsenpos = WDCPosition()
-                nsenpos.s = parmove
-                nsenpos.pageid = page.id
-                nsenpos.senid = sen.id
-                nsen.text = sen.text
-                if len(nsen.text_en) < 1 and len(sen_en.text) > 0:
-                    nsen.text_en = sen_en.text
-                if len(nsen.en_tokens) < 1 and len(sen_en.tokens) > 0:
-                    nsen.en_tokens = sen_en.tokens.copy()
-
-                if len(nsen.en_upos) < 1 and len(sen_en.upos) > 0:
-                    nsen.en_upos = sen_en.upos.copy()
-                if len(nsen.en_xpos) < 1 and len(sen_en.xpos) > 0:
-                    nsen.en_xpos = sen_en.xpos.copy()
-
-                if len(nsen.lng_tokens) < 1 and len(sen.tokens) > 0:
-                    nsen.lng_tokens = sen.tokens.copy()
-
-                if len(nsen.lng_upos) < 1 and len(sen.upos) > 0:
-                    nsen.lng_upos = sen.upos.copy()
-                if len(nsen.lng_xpos) < 1 and len(sen.xpos) > 0:
-                    nsen.lng_xpos = sen.xpos.copy()
-
-                nsen.id = sen.id
-                npar.nsentences += 1
-                parmove += len(sen.text) + 1
-                nsenpos.e = parmove
-                nsen.addPosition(nsenpos)
-                npar.addSentence(nsen)
-
-            npos.e = parmove
-            npos.pageid = page.id
-            npos.senid = -1
-            npar.addPosition(npos)
+            npar, parmove = await createNewParagraph(page, parT, xp, parmove, langcode)
             page.addParagraph(npar)
 
     except Exception as e:
         getMSABaseExceptionHandler().handle(e, "Error: createNewParagraphs:")
 
     return parmove
+
+
+def _shiftPositions(
+    obj, delta: int, pageid: Optional[int], paraid: Optional[int], seen: set
+) -> None:
+    # paragraphs and sentences keep their positions as ``position`` and/or ``positions``
+    positions = list(getattr(obj, "positions", None) or [])
+    position = getattr(obj, "position", None)
+    if position is not None:
+        positions.append(position)
+    for pos in positions:
+        if id(pos) not in seen:
+            seen.add(id(pos))
+            pos.s += delta
+            pos.e += delta
+            if pageid is not None:
+                pos.pageid = pageid
+            if paraid is not None:
+                pos.paraid = paraid
+
+
+def shiftWDCParagraph(
+    para: WDCParagraph,
+    delta: int,
+    pageid: Optional[int] = None,
+    paraid: Optional[int] = None,
+    seen: Optional[set] = None,
+) -> WDCParagraph:
+    """Move the character offsets (``WDCPosition.s/e``) of a paragraph and its sentences.
+
+    Args:
+        para: The WDCParagraph, changed in place
+        delta: Characters to add to the offsets
+        pageid: New page id of the positions, Default None keeps it
+        paraid: New paragraph id of the paragraph and its positions, Default None keeps it
+        seen: Ids of the positions already moved, positions shared by several objects move once
+
+    Returns:
+        para: The same WDCParagraph
+    """
+    if paraid is not None:
+        para.id = paraid
+    if not delta and pageid is None and paraid is None:
+        return para
+    seen = set() if seen is None else seen
+    _shiftPositions(para, delta, pageid, paraid, seen)
+    for sen in para.sentences:
+        _shiftPositions(sen, delta, pageid, paraid, seen)
+    return para
+
+
+def shiftWDCPage(page: WDCPage, delta: int) -> WDCPage:
+    """Move the character offsets (``WDCPosition.s/e``) of the paragraphs and sentences of a page.
+
+    Used to place a page converted on its own (``parmove`` 0) at its offset in the document.
+
+    Args:
+        page: The WDCPage, changed in place
+        delta: Characters to add to the offsets
+
+    Returns:
+        page: The same WDCPage
+    """
+    if not delta:
+        return page
+    seen: set = set()
+    for para in page.paragraphs:
+        shiftWDCParagraph(para, delta, seen=seen)
+    return page
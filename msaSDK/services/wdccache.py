@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""Binary Serialization and Content-Hash Cache for WDC Documents.
+
+``packWDCDocument`` encodes a WDCDocument as msgpack blocks with an offset table: the document fields,
+the entities and every page are separate blocks, so a reader decodes only the blocks it touches.
+``WDCDocumentCache`` stores the encoded documents on disk under the hash of their source text and
+conversion options, reads memory-map the file and return a ``WDCLazyDocument``, so a repeated request for
+the same text skips the NLP conversion and decodes pages only when used.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import msgpack
+from pydantic import BaseModel
+
+from msaSDK.models.wdc import WDCDocument, WDCPage, WDCSpan
+
+if __name__ == "__main__":
+    pass
+
+WDC_MAGIC = b"WDC1"
+"""File signature and format version of the encoded documents."""
+_HEADER = struct.Struct("<4sI")
+
+
+def _pack(obj: Any) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True, default=str)
+
+
+def packWDCDocument(doc: WDCDocument) -> bytes:
+    """Encode a WDCDocument into the binary block format.
+
+    Layout: ``WDC1``, length of the header, msgpack header with the ``(offset, length)`` of every block,
+    then the blocks. Offsets are relative to the end of the header.
+
+    Args:
+        doc: The WDCDocument
+
+    Returns:
+        data: The encoded document
+    """
+    blocks: List[bytes] = [
+        _pack(doc.dict(exclude={"pages", "entities"})),
+        _pack([ent.dict() for ent in doc.entities]),
+    ]
+    blocks.extend(_pack(page.dict()) for page in doc.pages)
+    table: List[Tuple[int, int]] = []
+    offset = 0
+    for block in blocks:
+        table.append((offset, len(block)))
+        offset += len(block)
+    header = _pack({"doc": table[0], "entities": table[1], "pages": table[2:]})
+    return b"".join([_HEADER.pack(WDC_MAGIC, len(header)), header] + blocks)
+
+
+class WDCLazyDocument:
+    """Read-only view of an encoded WDCDocument, decoding the blocks on first access.
+
+    Args:
+        data: The encoded document, bytes or a memory map
+
+    Raises:
+        ValueError: If ``data`` is not an encoded WDCDocument or truncated
+    """
+
+    def __init__(self, data) -> None:
+        if len(data) < _HEADER.size:
+            raise ValueError("Not an encoded WDCDocument")
+        magic, size = _HEADER.unpack_from(data, 0)
+        if magic != WDC_MAGIC:
+            raise ValueError("Not an encoded WDCDocument")
+        self._data = data
+        self._view = memoryview(data)
+        start = _HEADER.size
+        self._base = start + size
+        try:
+            header = msgpack.unpackb(self._view[start : start + size], use_list=False)
+            self._doc_block: Tuple[int, int] = header["doc"]
+            self._entities_block: Tuple[int, int] = header["entities"]
+            self._page_blocks: Tuple[Tuple[int, int], ...] = header["pages"]
+            blocks = (self._doc_block, self._entities_block) + tuple(self._page_blocks)
+            end = max(offset + length for offset, length in blocks)
+        except (KeyError, TypeError, ValueError) as e:
+            self._view.release()
+            raise ValueError("Invalid header of an encoded WDCDocument") from e
+        # a truncated file fails here and not on the first access of a page
+        if self._base + end > len(data):
+            self._view.release()
+            raise ValueError("Truncated encoded WDCDocument")
+        self._pages: Dict[int, WDCPage] = {}
+        self._entities: Optional[List[WDCSpan]] = None
+
+    def _block(self, block: Tuple[int, int]) -> Any:
+        offset, length = block
+        start = self._base + offset
+        return msgpack.unpackb(self._view[start : start + length], raw=False)
+
+    def __len__(self) -> int:
+        return len(self._page_blocks)
+
+    def page(self, index: int) -> WDCPage:
+        """Decode the page at position ``index``."""
+        page = self._pages.get(index)
+        if page is None:
+            page = self._pages[index] = WDCPage.parse_obj(
+                self._block(self._page_blocks[index])
+            )
+        return page
+
+    def iterPages(self) -> Iterator[WDCPage]:
+        """Iterate the pages, each decoded when reached and not kept, so streaming a document needs one page of memory."""
+        for index in range(len(self)):
+            page = self._pages.get(index)
+            if page is None:
+                page = WDCPage.parse_obj(self._block(self._page_blocks[index]))
+            yield page
+
+    @property
+    def entities(self) -> List[WDCSpan]:
+        """The decoded entities of the document."""
+        if self._entities is None:
+            self._entities = [
+                WDCSpan.parse_obj(ent) for ent in self._block(self._entities_block)
+            ]
+        return self._entities
+
+    def toDocument(self) -> WDCDocument:
+        """Decode the complete WDCDocument."""
+        doc = WDCDocument.parse_obj(self._block(self._doc_block))
+        doc.pages = list(self.iterPages())
+        doc.entities = list(self.entities)
+        return doc
+
+    def close(self) -> None:
+        """Release the memory map, decoded pages stay usable."""
+        self._view.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class WDCCacheStatus(BaseModel):
+    """
+    **WDCCacheStatus** Pydantic Response Class, metrics of the WDCDocumentCache
+    """
+
+    entries: int = 0
+    """Number of cached documents."""
+    size: int = 0
+    """Bytes used by the cached documents."""
+    max_size: int = 0
+    """Maximum bytes, the least recently used documents get removed first."""
+    hits: int = 0
+    """Requests answered from the cache."""
+    misses: int = 0
+    """Requests which converted the document."""
+
+
+class WDCDocumentCache:
+    """On-disk cache of encoded WDC documents, keyed by the hash of the source text and the options.
+
+    Args:
+        directory: Cache directory, created if missing
+        max_size: Maximum bytes of the cache, Default 1 GiB
+
+    Examples:
+    ```python
+    cache = WDCDocumentCache("./wdc_cache")
+    doc = await cache.getOrCreate(text, createDocument, langcode="de")
+    page = doc.page(0)
+    ```
+    """
+
+    def __init__(self, directory: str, max_size: int = 1024**3) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, **options) -> str:
+        """Content hash of a source text and its conversion options."""
+        digest = hashlib.sha256(WDC_MAGIC)
+        digest.update(_pack(sorted(options.items())))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".wdc")
+
+    def get(self, key: str) -> Optional[WDCLazyDocument]:
+        """Get a cached document.
+
+        Args:
+            key: The key, see ``key``
+
+        Returns:
+            doc: The memory mapped WDCLazyDocument, None if not cached or the entry is damaged
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # missing or empty file
+            return None
+        try:
+            doc = WDCLazyDocument(data)
+        except ValueError:
+            # truncated or foreign file, removed so the document gets converted again
+            data.close()
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+            return None
+        try:
+            # the modification time orders the documents for the size limit
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+        return doc
+
+    def put(self, key: str, doc: WDCDocument) -> bytes:
+        """Store a document, replaces an existing entry atomically.
+
+        Returns:
+            data: The encoded document
+        """
+        data = packWDCDocument(doc)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                # durable before the rename, a crash must not leave a partial entry under the key
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.prune()
+        return data
+
+    async def getOrCreate(
+        self,
+        text: str,
+        create: Callable[..., Awaitable[WDCDocument]],
+        **options,
+    ) -> WDCLazyDocument:
+        """Get the cached document of a source text, or convert and cache it.
+
+        Args:
+            text: The source text
+            create: Coroutine function converting ``text`` with ``options`` to a WDCDocument
+            **options: Conversion options, part of the key
+
+        Returns:
+            doc: The WDCLazyDocument
+        """
+        key = self.key(text, **options)
+        doc = self.get(key)
+        if doc is not None:
+            self.hits += 1
+            return doc
+        self.misses += 1
+        data = self.put(key, await create(text, **options))
+        # a document larger than max_size is pruned right away
+        return self.get(key) or WDCLazyDocument(data)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".wdc"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def prune(self) -> int:
+        """Remove the least recently used documents above ``max_size``.
+
+        Returns:
+            count: Number of removed documents
+        """
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        count = 0
+        for _, length, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                # open memory maps keep working on POSIX
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= length
+            count += 1
+        return count
+
+    def status(self) -> WDCCacheStatus:
+        """Get the size and hit metrics of the cache."""
+        entries = self._entries()
+        return WDCCacheStatus(
+            entries=len(entries),
+            size=sum(entry[1] for entry in entries),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+        )
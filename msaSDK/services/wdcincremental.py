@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Incremental WDC Document Conversion.
+
+``WDCIncrementalBuilder`` remembers a content fingerprint of every converted SDU paragraph. When an edited
+version of the document is converted again, paragraphs with a known fingerprint are reused and only moved
+to their new character offset, only new or changed paragraphs run through ``createNewParagraph``.
+"""
+import hashlib
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Sequence, Tuple
+
+from msaSDK.models.sdu import SDUPage
+from msaSDK.models.wdc import WDCDocument, WDCPage, WDCParagraph
+from msaSDK.services.wdc import createNewParagraph, shiftWDCParagraph
+from msaUtils.errorhandling import getMSABaseExceptionHandler
+
+if __name__ == "__main__":
+    pass
+
+
+def fingerprintParagraph(parT, langcode: str) -> str:
+    """Content hash of everything ``createNewParagraph`` reads from an SDU paragraph.
+
+    The sentence ``tokens``, ``upos`` and ``xpos`` are lists of strings.
+
+    Args:
+        parT: The SDU paragraph
+        langcode: Language code
+
+    Returns:
+        fingerprint: Hex digest
+    """
+    sentences_en = parT.sentences_en
+    if langcode == "en" and len(sentences_en) < 1:
+        sentences_en = parT.sentences
+    # unit and record separators keep the joined fields unambiguous
+    parts = [langcode, str(parT.semantic_type)]
+    for sentences in (parT.sentences, sentences_en):
+        for sen in sentences:
+            parts.append(str(sen.id))
+            parts.append(sen.text)
+            for values in (sen.tokens, sen.upos, sen.xpos):
+                parts.append("\x1f".join(values))
+        parts.append("\x1d")
+    return hashlib.blake2b(
+        "\x1e".join(parts).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class WDCIncrementalBuilder:
+    """Converts SDU pages to a WDCDocument and reconverts edited versions paragraph by paragraph.
+
+    One builder belongs to one document, it keeps the fingerprints of the last converted version.
+
+    Args:
+        langcode: Language code
+        optionSentiment: Reserved, like ``createNewParagraphs``
+
+    Attributes:
+        converted: Paragraphs converted by the last ``build``/``update``
+        reused: Paragraphs reused by the last ``update``
+
+    Examples:
+    ```python
+    builder = WDCIncrementalBuilder(langcode="de")
+    doc = await builder.build(sdu_pages)
+    # ... the user edits one paragraph
+    doc = await builder.update(doc, edited_sdu_pages)
+    ```
+    """
+
+    def __init__(self, langcode: str = "en", optionSentiment: bool = False) -> None:
+        self.langcode = langcode
+        self.optionSentiment = optionSentiment
+        self.converted: int = 0
+        self.reused: int = 0
+        # fingerprints of the paragraphs of each page of the last version
+        self._fingerprints: List[List[str]] = []
+
+    async def build(self, sdu_pages: Sequence[SDUPage]) -> WDCDocument:
+        """Convert all pages and remember the paragraph fingerprints.
+
+        Args:
+            sdu_pages: The SDU pages, page ids are their positions
+
+        Returns:
+            doc: The new WDCDocument
+        """
+        self._fingerprints = []
+        return await self.update(WDCDocument(), sdu_pages)
+
+    async def update(
+        self, doc: WDCDocument, sdu_pages: Sequence[SDUPage]
+    ) -> WDCDocument:
+        """Bring a document built by this builder up to date with an edited version of its pages.
+
+        Unchanged paragraphs are reused, also if they moved to another page or position, their offsets
+        (``WDCPosition.s/e``), page and paragraph ids are patched. Pages are reused in place, pages beyond the new
+        page count are removed.
+
+        Args:
+            doc: The document of the last ``build``/``update``, changed in place
+            sdu_pages: The edited SDU pages
+
+        Returns:
+            doc: The updated WDCDocument
+        """
+        # old paragraphs by fingerprint, the first unused match is taken, so repeated paragraphs stay in order
+        known: Dict[str, Deque[WDCParagraph]] = defaultdict(deque)
+        for page, old_fingerprints in zip(doc.pages, self._fingerprints):
+            for para, fingerprint in zip(page.paragraphs, old_fingerprints):
+                known[fingerprint].append(para)
+
+        self.converted = 0
+        self.reused = 0
+        fingerprints: List[List[str]] = []
+        parmove = 0
+        for pi, sdu_page in enumerate(sdu_pages):
+            if pi < len(doc.pages):
+                page = doc.pages[pi]
+                page.paragraphs = []
+                page.nparagraphs = 0
+            else:
+                page = WDCPage()
+                page.id = pi
+                doc.addPage(page)
+            page_fingerprints: List[str] = []
+            try:
+                for xp, parT in enumerate(sdu_page.text.paragraphs):
+                    fingerprint = fingerprintParagraph(parT, self.langcode)
+                    page_fingerprints.append(fingerprint)
+                    candidates = known.get(fingerprint)
+                    if candidates:
+                        npar = candidates.popleft()
+                        start, end = npar.position.s, npar.position.e
+                        moved = npar.position.pageid != page.id
+                        shiftWDCParagraph(
+                            npar,
+                            parmove - start,
+                            pageid=page.id if moved else None,
+                            paraid=xp if npar.id != xp else None,
+                        )
+                        parmove += end - start
+                        self.reused += 1
+                    else:
+                        npar, parmove = await createNewParagraph(
+                            page, parT, xp, parmove, self.langcode
+                        )
+                        self.converted += 1
+                    page.addParagraph(npar)
+            except Exception as e:
+                getMSABaseExceptionHandler().handle(e, "Error: WDCIncrementalBuilder:")
+            fingerprints.append(page_fingerprints)
+        del doc.pages[len(sdu_pages) :]
+        doc.npages = len(doc.pages)
+        self._fingerprints = fingerprints
+        return doc
+
+    def stats(self) -> Tuple[int, int]:
+        """Paragraphs ``(converted, reused)`` by the last ``build``/``update``."""
+        return self.converted, self.reused
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Column-Projected Loader for ML Documents.
+
+``loadMLDoc`` parses each sheet of an Excel derived JSON payload once, keeps only the target and train
+columns as typed numpy arrays and renders HTML previews lazily, page by page. ``createNewMLDoc`` builds
+its WDCMLDocument from it.
+"""
+import html
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from msaSDK.models.wdc import WDCMLDocument
+
+if __name__ == "__main__":
+    pass
+
+
+def _splitFields(fields: str) -> List[str]:
+    return [entry.strip() for entry in fields.split(",")]
+
+
+_DATE_UNITS: Tuple[str, ...] = ("s", "ms", "us", "ns")
+# numbers below one year of seconds are no epoch timestamps, as in pd.read_json
+_MIN_STAMP = 31536000
+
+
+def _isDateColumn(name) -> bool:
+    # the column names pd.read_json converts to dates by default (keep_default_dates)
+    name = str(name).lower()
+    return (
+        name.endswith(("_at", "_time"))
+        or name.startswith("timestamp")
+        or name in ("modified", "date", "datetime")
+    )
+
+
+def _toDates(series: pd.Series) -> pd.Series:
+    if series.dtype.kind not in "iuf":
+        try:
+            return pd.to_datetime(series, errors="raise")
+        except (ValueError, TypeError):
+            return series
+    if not (series.isna() | (series > _MIN_STAMP)).all():
+        return series
+    # the first unit whose dates are representable, like pd.read_json without date_unit
+    for unit in _DATE_UNITS:
+        try:
+            dates = pd.to_datetime(series, errors="raise", unit=unit)
+        except (ValueError, OverflowError, TypeError):
+            continue
+        if (dates.dropna() <= pd.Timestamp.max).all():
+            return dates
+    return series
+
+
+def _convertColumn(name, values: List) -> np.ndarray:
+    """Typed array of a column, numeric strings and date columns are converted like ``pd.read_json`` did."""
+    series = pd.Series(values).infer_objects()
+    # object or string dtype, depending on the pandas version
+    if series.dtype.kind not in "biufcmM":
+        try:
+            series = pd.to_numeric(series)
+        except (ValueError, TypeError):
+            pass
+    if _isDateColumn(name) and len(series):
+        series = _toDates(series)
+    return series.to_numpy()
+
+
+def _project(data, columns: List[str]) -> Tuple[List, Dict[str, List]]:
+    # supports the pandas "columns" ({column: {index: value}}) and "records" ([{column: value}]) layouts
+    if isinstance(data, dict):
+        missing = [column for column in columns if column not in data]
+        if missing:
+            raise KeyError("Columns not found in sheet: " + ", ".join(missing))
+        # union of the row labels in order, the columns of a sheet normally share them
+        keys: List = list(
+            dict.fromkeys(key for column in columns for key in data[column])
+        )
+        values = {column: [data[column].get(key) for key in keys] for column in columns}
+        if all(isinstance(key, str) and key.isdigit() for key in keys):
+            keys = [int(key) for key in keys]
+        return keys, values
+    keys = list(range(len(data)))
+    values = {column: [record.get(column) for record in data] for column in columns}
+    return keys, values
+
+
+class WDCMLSheet:
+    """The selected columns of one sheet as typed arrays.
+
+    Args:
+        name: Name of the sheet
+        index: Row labels
+        columns: Column name to numpy array, in column order
+    """
+
+    def __init__(
+        self, name: str, index: np.ndarray, columns: Dict[str, np.ndarray]
+    ) -> None:
+        self.name = name
+        self.index = index
+        self.columns = columns
+        self._pages: Dict[Tuple[int, int], str] = {}
+
+    @classmethod
+    def parse(cls, name: str, sheet_value: str, columns: List[str]) -> "WDCMLSheet":
+        """Parse the JSON of a sheet once and keep only ``columns``, typed like ``pd.read_json`` does."""
+        keys, values = _project(orjson.loads(sheet_value), columns)
+        arrays = {column: _convertColumn(column, values[column]) for column in columns}
+        return cls(name, np.asarray(keys), arrays)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """DataFrame of the rows ``start:stop``, the arrays are not copied."""
+        return pd.DataFrame(
+            {column: array[start:stop] for column, array in self.columns.items()},
+            index=self.index[start:stop],
+        )
+
+    def toDict(self) -> Dict[str, Dict]:
+        """The columns as ``{column: {index: value}}``, like ``DataFrame.to_dict()``."""
+        return self.frame().to_dict()
+
+    def pages(self, page_size: int = 50) -> int:
+        """Number of preview pages."""
+        return max(1, -(-len(self) // page_size))
+
+    def previewHTML(self, page: int = 0, page_size: int = 50) -> str:
+        """Escaped HTML table of one page of rows, rendered on first request.
+
+        Args:
+            page: Page number, starting at 0
+            page_size: Rows per page, Default 50
+
+        Returns:
+            html: The escaped HTML table, like ``WDCMLDocument.content``
+        """
+        key = (page, page_size)
+        content = self._pages.get(key)
+        if content is None:
+            start = page * page_size
+            content = self._pages[key] = self.renderHTML(start, start + page_size)
+        return content
+
+    def renderHTML(self, start: int = 0, stop: Optional[int] = None) -> str:
+        """Escaped HTML table of the rows ``start:stop``, not cached."""
+        return (
+            html.escape(self.frame(start, stop).to_html(notebook=True))
+            .replace("\n ", "")
+            .replace("\n", "")
+        )
+
+
+class WDCMLLazyDocument:
+    """ML document with the selected columns of every sheet, see ``loadMLDoc``.
+
+    Attributes:
+        targetsList: Target column names
+        trainList: Train column names
+        sheets: The WDCMLSheets
+    """
+
+    def __init__(self, targetsList: List[str], trainList: List[str]) -> None:
+        self.targetsList = targetsList
+        self.trainList = trainList
+        self.sheets: List[WDCMLSheet] = []
+
+    def previewHTML(self, sheet: int = 0, page: int = 0, page_size: int = 50) -> str:
+        """Escaped HTML preview of one page of a sheet, see ``WDCMLSheet.previewHTML``."""
+        return self.sheets[sheet].previewHTML(page, page_size)
+
+    def toMLDocument(self, content: bool = True) -> WDCMLDocument:
+        """Build the WDCMLDocument.
+
+        Args:
+            content: Render the full HTML of all sheets into ``content``, Default True
+
+        Returns:
+            doc: The WDCMLDocument, ``raw_json`` and ``df_data`` hold the selected columns only
+        """
+        newdoc = WDCMLDocument()
+        newdoc.targetsList = self.targetsList
+        newdoc.trainList = self.trainList
+        for sheet in self.sheets:
+            data = sheet.toDict()
+            newdoc.raw_json.append(data)
+            newdoc.df_data.append(data)
+            if content:
+                newdoc.content += sheet.renderHTML()
+        return newdoc
+
+
+def loadMLDoc(
+    data: dict,
+    optionTargetFields: str = "IMPULSKATEGORIE, IMPULSART",
+    optionTrainFields: str = "SACHVERHALT",
+) -> WDCMLLazyDocument:
+    """Load the sheets of an ML payload, keeping only the target and train columns.
+
+    Args:
+        data: Sheet name to the JSON of the sheet (pandas ``columns`` or ``records`` layout)
+        optionTargetFields: Comma separated target column names
+        optionTrainFields: Comma separated train column names
+
+    Returns:
+        doc: The WDCMLLazyDocument
+    """
+    doc = WDCMLLazyDocument(
+        _splitFields(optionTargetFields), _splitFields(optionTrainFields)
+    )
+    columns = doc.targetsList + doc.trainList
+    for sheet_key, sheet_value in data.items():
+        doc.sheets.append(WDCMLSheet.parse(sheet_key, sheet_value, columns))
+    return doc
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Inverted Index and Phrase Search over WDC Documents.
+
+``WDCSearchIndex`` indexes the tokens, lemmas (``WDCWord.lemma``), dependency labels (``WDCWord.label``) and
+entity types of a corpus of WDCDocuments with positional postings ``(document, sentence, position)``. Hits map
+back to the page, paragraph and sentence ids of the ``WDCPosition``. Added documents are buffered in memory,
+``flush`` writes them as an immutable segment file which is memory-mapped and decoded on demand.
+"""
+import mmap
+import os
+import struct
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import msgpack
+from pydantic import BaseModel
+
+from msaSDK.models.wdc import WDCDocument
+from msaSDK.services.wdc import WDCDocumentIndex
+
+if __name__ == "__main__":
+    pass
+
+SEARCH_FIELDS: Tuple[str, ...] = ("token", "lemma", "dep", "entity")
+"""Indexed fields: token and lemma are lower cased, dep is the dependency label, entity the entity type."""
+WDX_MAGIC = b"WDX1"
+_HEADER = struct.Struct("<4sI")
+
+Posting = Tuple[int, int, int]
+
+
+class WDCSearchHit(BaseModel):
+    """
+    **WDCSearchHit** Pydantic Response Class, one match of a WDCSearchIndex query
+    """
+
+    doc: str
+    """Name of the document."""
+    pageid: int
+    """Page id of the sentence."""
+    paraid: int
+    """Paragraph id of the sentence."""
+    senid: int
+    """Sentence id."""
+    position: int
+    """Token (token field) or word (lemma, dep) position in the sentence of the first matched term, -1 for entities."""
+
+
+def _normalize(field: str, term: str) -> str:
+    return term.lower() if field in ("token", "lemma") else term
+
+
+class _Segment(ABC):
+    # common reading interface of the memory buffer and the segment files
+
+    docs: List[str]
+
+    @abstractmethod
+    def postings(self, field: str, term: str) -> Sequence[int]:
+        """Flat ``(doc, sentence, position)`` triples of a term, ``()`` if unknown."""
+
+    @abstractmethod
+    def sentence(self, doc: int, sen: int) -> Tuple[int, int, int]:
+        """Page, paragraph and sentence id of a sentence of a document of the segment."""
+
+
+class _MemorySegment(_Segment):
+    def __init__(self) -> None:
+        self.docs: List[str] = []
+        self.terms: Dict[str, Dict[str, array]] = {field: {} for field in SEARCH_FIELDS}
+        self.sentences: List[array] = []
+
+    def _post(self, field: str, term: str, doc: int, sen: int, pos: int) -> None:
+        if not term:
+            return
+        postings = self.terms[field].get(term)
+        if postings is None:
+            postings = self.terms[field][term] = array("i")
+        postings.extend((doc, sen, pos))
+
+    def add(self, name: str, doc: WDCDocument) -> None:
+        index = WDCDocumentIndex(doc)
+        docno = len(self.docs)
+        self.docs.append(name)
+        sentences = array("i")
+        for sen in range(len(index.sentences)):
+            sentences.extend(index.sentenceIds(sen))
+            for pos, tok in enumerate(index.sentenceTokens(sen)):
+                self._post("token", tok.text.lower(), docno, sen, pos)
+            for pos, wrd in enumerate(index.sentenceWords(sen)):
+                self._post("lemma", (wrd.lemma or "").lower(), docno, sen, pos)
+                self._post("dep", wrd.label or "", docno, sen, pos)
+        self.sentences.append(sentences)
+        for ent in index.entities:
+            for epos in ent.positions[:1]:
+                ent_sen = index.sen_key.get((epos.pageid, epos.paraid, epos.senid))
+                if ent_sen is not None:
+                    self._post("entity", ent.type, docno, ent_sen, -1)
+
+    def postings(self, field: str, term: str) -> Sequence[int]:
+        return self.terms[field].get(term, ())
+
+    def sentence(self, doc: int, sen: int) -> Tuple[int, int, int]:
+        table = self.sentences[doc]
+        return table[sen * 3], table[sen * 3 + 1], table[sen * 3 + 2]
+
+    def write(self, path: str) -> None:
+        body = array("i")
+        terms: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        for field, postings in self.terms.items():
+            terms[field] = {}
+            for term, values in postings.items():
+                terms[field][term] = (len(body), len(values))
+                body.extend(values)
+        sentences = []
+        for table in self.sentences:
+            sentences.append((len(body), len(table)))
+            body.extend(table)
+        header = msgpack.packb(
+            {"docs": self.docs, "terms": terms, "sentences": sentences},
+            use_bin_type=True,
+        )
+        # the body starts 4 byte aligned, so it can be cast to int32 in place
+        padding = -(_HEADER.size + len(header)) % 4
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(WDX_MAGIC, len(header) + padding))
+            f.write(header + b"\0" * padding)
+            body.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class _FileSegment(_Segment):
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != WDX_MAGIC:
+            raise ValueError("Not a WDC search index segment: " + path)
+        start = _HEADER.size
+        unpacker = msgpack.Unpacker(raw=False, use_list=False, strict_map_key=False)
+        unpacker.feed(self._mmap[start : start + size])
+        header = unpacker.unpack()
+        self.docs: List[str] = list(header["docs"])
+        self._terms: Dict[str, Dict[str, Tuple[int, int]]] = header["terms"]
+        self._sentences: Tuple[Tuple[int, int], ...] = header["sentences"]
+        self._body = memoryview(self._mmap)[start + size :].cast("i")
+
+    def postings(self, field: str, term: str) -> Sequence[int]:
+        location = self._terms.get(field, {}).get(term)
+        if location is None:
+            return ()
+        offset, count = location
+        return self._body[offset : offset + count]
+
+    def sentence(self, doc: int, sen: int) -> Tuple[int, int, int]:
+        offset = self._sentences[doc][0] + sen * 3
+        return self._body[offset], self._body[offset + 1], self._body[offset + 2]
+
+    def close(self) -> None:
+        self._body.release()
+        self._mmap.close()
+
+
+class WDCSearchIndex:
+    """Inverted index over a corpus of WDCDocuments.
+
+    Args:
+        directory: Directory of the segment files, existing segments are opened, Default None keeps the
+            index in memory only
+
+    Examples:
+    ```python
+    index = WDCSearchIndex("./wdc_index")
+    index.add("contract-17", doc)
+    index.flush()
+    hits = index.phrase("token", ["notice", "period"])
+    hits = index.term("lemma", "terminate") + index.entities("ORG")
+    ```
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory
+        self.segments: List[_FileSegment] = []
+        self._memory = _MemorySegment()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".wdx"):
+                    self.segments.append(_FileSegment(os.path.join(directory, name)))
+
+    def _all(self) -> List[_Segment]:
+        return list(self.segments) + [self._memory]
+
+    def add(self, name: str, doc: WDCDocument) -> None:
+        """Index a document.
+
+        Args:
+            name: Name of the document, reported by the hits
+            doc: The WDCDocument
+        """
+        self._memory.add(name, doc)
+
+    def flush(self) -> Optional[str]:
+        """Write the documents added since the last flush as new memory-mapped segment.
+
+        Returns:
+            path: Path of the segment file, None if nothing to write or the index has no directory
+        """
+        if not self.directory or not self._memory.docs:
+            return None
+        path = self._nextSegmentPath(self.directory)
+        self._memory.write(path)
+        self.segments.append(_FileSegment(path))
+        self._memory = _MemorySegment()
+        return path
+
+    @staticmethod
+    def _nextSegmentPath(directory: str) -> str:
+        # one above the highest segment number in the directory, len(self.segments) could name an existing file
+        numbers = [
+            int(name[:-4])
+            for name in os.listdir(directory)
+            if name.endswith(".wdx") and name[:-4].isdigit()
+        ]
+        return os.path.join(
+            directory, "{:08d}.wdx".format(max(numbers, default=-1) + 1)
+        )
+
+    @staticmethod
+    def _hits(segment: _Segment, postings: Iterable[Posting]) -> List[WDCSearchHit]:
+        hits = []
+        for doc, sen, pos in postings:
+            pageid, paraid, senid = segment.sentence(doc, sen)
+            hits.append(
+                WDCSearchHit(
+                    doc=segment.docs[doc],
+                    pageid=pageid,
+                    paraid=paraid,
+                    senid=senid,
+                    position=pos,
+                )
+            )
+        return hits
+
+    @staticmethod
+    def _triples(values: Sequence[int]) -> Iterable[Posting]:
+        for i in range(0, len(values), 3):
+            yield values[i], values[i + 1], values[i + 2]
+
+    def term(self, field: str, term: str) -> List[WDCSearchHit]:
+        """Find a single term.
+
+        Args:
+            field: One of ``SEARCH_FIELDS``
+            term: The term
+
+        Returns:
+            hits: List of WDCSearchHit in index order
+        """
+        if field not in SEARCH_FIELDS:
+            raise ValueError(
+                "Search field must be one of {}, got: {}".format(SEARCH_FIELDS, field)
+            )
+        term = _normalize(field, term)
+        hits: List[WDCSearchHit] = []
+        for segment in self._all():
+            hits.extend(
+                self._hits(segment, self._triples(segment.postings(field, term)))
+            )
+        return hits
+
+    def phrase(self, field: str, terms: Sequence[str]) -> List[WDCSearchHit]:
+        """Find consecutive terms in the same sentence.
+
+        Args:
+            field: ``token`` or ``lemma``
+            terms: The terms of the phrase, in order
+
+        Returns:
+            hits: List of WDCSearchHit, the position is the one of the first term
+        """
+        if field not in ("token", "lemma"):
+            raise ValueError(
+                "Phrase search needs the token or lemma field, got: " + str(field)
+            )
+        terms = [_normalize(field, term) for term in terms]
+        if not terms:
+            return []
+        hits: List[WDCSearchHit] = []
+        for segment in self._all():
+            # candidate starts, narrowed down by each further term
+            starts: Set[Posting] = set(self._triples(segment.postings(field, terms[0])))
+            for offset, term in enumerate(terms[1:], 1):
+                if not starts:
+                    break
+                starts &= {
+                    (doc, sen, pos - offset)
+                    for doc, sen, pos in self._triples(segment.postings(field, term))
+                }
+            hits.extend(self._hits(segment, sorted(starts)))
+        return hits
+
+    def entities(self, type: str) -> List[WDCSearchHit]:
+        """Find the sentences with entities of a type.
+
+        Args:
+            type: Entity type, like ``ORG``
+
+        Returns:
+            hits: List of WDCSearchHit, one per entity
+        """
+        return self.term("entity", type)
+
+    def close(self) -> None:
+        """Close the memory maps of the segments."""
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
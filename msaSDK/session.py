@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Iterator, Optional, Tuple, Type, TypeVar
 from uuid import UUID, uuid4
 
 from fastapi import HTTPException
-from fastapi_sessions.backends.implementations import InMemoryBackend
+from fastapi_sessions.backends.session_backend import (BackendError,
+                                                       SessionBackend)
 from fastapi_sessions.frontends.implementations import (CookieParameters,
                                                         SessionCookie)
 from fastapi_sessions.session_verifier import SessionVerifier
@@ -12,6 +18,10 @@ from pydantic import BaseModel
 if __name__ == "__main__":
     pass
 
+# the type variables of SessionBackend, declared here as fastapi_sessions ships no type information
+ID = TypeVar("ID")
+SessionModel = TypeVar("SessionModel", bound=BaseModel)
+
 
 def xuuid4():
     return uuid4()
@@ -43,7 +53,282 @@ class SessionData(BaseModel):
     input: str = ""
 
 
-backend = InMemoryBackend[UUID, SessionData]()
+class MSASessionStats(BaseModel):
+    """
+    **MSASessionStats** Pydantic Response Class, metrics of the MSASessionBackend
+    """
+
+    entries: int = 0
+    """Number of sessions in the local cache."""
+    max_entries: int = 0
+    """Capacity of the local cache."""
+    hits: int = 0
+    """Reads answered by the local cache."""
+    shared_hits: int = 0
+    """Reads answered by the shared tier."""
+    misses: int = 0
+    """Reads of unknown or expired sessions."""
+    hit_rate: float = 0.0
+    """Share of the reads which found the session (local or shared), 0.0 to 1.0."""
+    evictions: int = 0
+    """Sessions dropped from the local cache because it was full (least recently used first)."""
+    expirations: int = 0
+    """Sessions dropped because their TTL expired."""
+    shared: bool = False
+    """True if the shared SQLite tier is used."""
+
+
+class MSASessionBackend(Generic[ID, SessionModel], SessionBackend[ID, SessionModel]):
+    """Bounded session backend with LRU and TTL eviction and an optional shared SQLite tier.
+
+    Sessions expire ``ttl`` seconds after their last access (sliding expiry). The local cache keeps at most
+    ``max_entries`` sessions and drops the least recently used one first.
+
+    With ``shared_path`` the sessions are written through to a SQLite DB (WAL mode), so all worker processes
+    of a multi-worker server see the same sessions. The local cache then only serves reads for ``cache_ttl``
+    seconds, changes of another worker become visible after at most that time.
+
+    Args:
+        model: Pydantic model of the session data, needed to load sessions from the shared tier
+        max_entries: Capacity of the local cache, Default 10000
+        ttl: Seconds of inactivity after which a session expires, Default 3600
+        shared_path: Path of the shared SQLite DB, Default None keeps the sessions in this process only
+        cache_ttl: Seconds the local cache answers reads without asking the shared tier, Default 1.0
+    """
+
+    def __init__(
+        self,
+        model: Type[SessionModel],
+        max_entries: int = 10000,
+        ttl: float = 3600.0,
+        shared_path: Optional[str] = None,
+        cache_ttl: float = 1.0,
+    ) -> None:
+        self.model = model
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # session id -> (expires, cached until, data)
+        self.data: "OrderedDict[ID, Tuple[float, float, SessionModel]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        if shared_path:
+            self._conn = sqlite3.connect(
+                shared_path, timeout=10, check_same_thread=False, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS msa_session ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def _cache(self, session_id: ID, expires: float, data: SessionModel) -> None:
+        now = time.time()
+        cached_until = now + self.cache_ttl if self._conn else expires
+        self.data[session_id] = (expires, cached_until, data)
+        self.data.move_to_end(session_id)
+        while len(self.data) > self.max_entries:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def _shared(self) -> sqlite3.Connection:
+        # the shared tier helpers are only called if a shared DB is configured
+        if self._conn is None:
+            raise BackendError("No shared session DB configured")
+        return self._conn
+
+    def _shared_get(self, session_id: ID) -> Optional[Tuple[float, SessionModel]]:
+        with self._lock:
+            row = self._shared.execute(
+                "SELECT data, expires FROM msa_session WHERE id=?", (str(session_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[1], self.model.parse_raw(row[0])
+
+    def _shared_put(self, session_id: ID, data: SessionModel, expires: float) -> None:
+        with self._lock:
+            self._shared.execute(
+                "INSERT OR REPLACE INTO msa_session (id, data, expires) VALUES (?, ?, ?)",
+                (str(session_id), data.json(), expires),
+            )
+            now = time.time()
+            if now - self._last_sweep > 60:
+                self._last_sweep = now
+                cursor = self._shared.execute(
+                    "DELETE FROM msa_session WHERE expires < ?", (now,)
+                )
+                self.expirations += cursor.rowcount
+
+    def _shared_delete(self, session_id: ID, expired_before: Optional[float] = None) -> None:
+        with self._lock:
+            if expired_before is None:
+                self._shared.execute("DELETE FROM msa_session WHERE id=?", (str(session_id),))
+            else:
+                # only if no other worker refreshed it in the meantime
+                self._shared.execute(
+                    "DELETE FROM msa_session WHERE id=? AND expires < ?",
+                    (str(session_id), expired_before),
+                )
+
+    def _get(self, session_id: ID, count: bool = True) -> Optional[SessionModel]:
+        now = time.time()
+        entry = self.data.get(session_id)
+        if entry is not None:
+            expires, cached_until, data = entry
+            if expires < now:
+                del self.data[session_id]
+                if not self._conn:
+                    self.expirations += 1
+                    self.misses += count
+                    return None
+                # another worker may have kept the session alive, the shared tier decides
+            elif cached_until >= now:
+                self.data.move_to_end(session_id)
+                self.hits += count
+                self._touch(session_id, expires, data, now)
+                return data
+        if self._conn:
+            shared = self._shared_get(session_id)
+            if shared is not None and shared[0] >= now:
+                self.shared_hits += count
+                self._touch(session_id, shared[0], shared[1], now, cache=True)
+                return shared[1]
+            if shared is not None:
+                self.expirations += 1
+                self._shared_delete(session_id, expired_before=now)
+        self.data.pop(session_id, None)
+        self.misses += count
+        return None
+
+    def _touch(
+        self,
+        session_id: ID,
+        expires: float,
+        data: SessionModel,
+        now: float,
+        cache: bool = False,
+    ) -> None:
+        # sliding expiry, the shared tier is only written once half of the TTL is used up
+        if expires - now < self.ttl / 2:
+            expires = now + self.ttl
+            if self._conn:
+                self._shared_put(session_id, data, expires)
+            cache = True
+        if cache:
+            self._cache(session_id, expires, data)
+
+    async def create(self, session_id: ID, data: SessionModel) -> None:
+        """Create a new session entry."""
+        if self._get(session_id, count=False) is not None:
+            raise BackendError("create can't overwrite an existing session")
+        await self._put(session_id, data)
+
+    async def read(self, session_id: ID) -> Optional[SessionModel]:
+        """Read an existing session data."""
+        data = self._get(session_id)
+        if data is None:
+            return None
+        return data.copy(deep=True)
+
+    async def update(self, session_id: ID, data: SessionModel) -> None:
+        """Update an existing session."""
+        if self._get(session_id, count=False) is None:
+            raise BackendError("session does not exist, cannot update")
+        await self._put(session_id, data)
+
+    async def delete(self, session_id: ID) -> None:
+        """Delete a session."""
+        self.data.pop(session_id, None)
+        if self._conn:
+            self._shared_delete(session_id)
+
+    async def _put(self, session_id: ID, data: SessionModel) -> None:
+        data = data.copy(deep=True)
+        expires = time.time() + self.ttl
+        if self._conn:
+            self._shared_put(session_id, data, expires)
+        self._cache(session_id, expires, data)
+
+    def stats(self) -> MSASessionStats:
+        """Get the hit-rate and eviction metrics.
+
+        Returns:
+            stats: MSASessionStats
+        """
+        reads = self.hits + self.shared_hits + self.misses
+        return MSASessionStats(
+            entries=len(self.data),
+            max_entries=self.max_entries,
+            hits=self.hits,
+            shared_hits=self.shared_hits,
+            misses=self.misses,
+            hit_rate=(self.hits + self.shared_hits) / reads if reads else 0.0,
+            evictions=self.evictions,
+            expirations=self.expirations,
+            shared=self._conn is not None,
+        )
+
+    def collect(self) -> Iterator:
+        """Yield the metrics as Prometheus metric families, see ``register_prometheus``."""
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        stats = self.stats()
+        reads = CounterMetricFamily(
+            "msa_session_reads", "Session reads by result", labels=["result"]
+        )
+        reads.add_metric(["hit"], stats.hits)
+        reads.add_metric(["shared_hit"], stats.shared_hits)
+        reads.add_metric(["miss"], stats.misses)
+        yield reads
+        evictions = CounterMetricFamily(
+            "msa_session_evictions", "Sessions dropped by reason", labels=["reason"]
+        )
+        evictions.add_metric(["lru"], stats.evictions)
+        evictions.add_metric(["ttl"], stats.expirations)
+        yield evictions
+        yield GaugeMetricFamily(
+            "msa_session_entries", "Sessions in the local cache", value=stats.entries
+        )
+
+    def register_prometheus(self, registry=None) -> None:
+        """Register the metrics with a Prometheus registry, exposed by the ``/metrics`` route.
+
+        Args:
+            registry: prometheus_client CollectorRegistry, Default the global ``REGISTRY``
+        """
+        if registry is None:
+            from prometheus_client import REGISTRY
+
+            registry = REGISTRY
+        registry.register(self)
+
+
+def getSessionBackend() -> MSASessionBackend[UUID, SessionData]:
+    """Create the session backend, configured by environment variables.
+
+    ``SESSION_MAX_ENTRIES`` (Default 10000), ``SESSION_TTL`` in seconds (Default 3600),
+    ``SESSION_SHARED_DB`` path of the SQLite DB shared by the workers (Default empty, not shared) and
+    ``SESSION_CACHE_TTL`` in seconds (Default 1.0).
+    """
+    return MSASessionBackend[UUID, SessionData](
+        model=SessionData,
+        max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+        ttl=float(os.getenv("SESSION_TTL", "3600")),
+        shared_path=os.getenv("SESSION_SHARED_DB") or None,
+        cache_ttl=float(os.getenv("SESSION_CACHE_TTL", "1.0")),
+    )
+
+
+backend = getSessionBackend()
+"""Session backend of the module, its metrics are registered by MSAApp if ``instrument`` is enabled."""
 
 
 class BasicVerifier(SessionVerifier[UUID, SessionData]):
@@ -52,7 +337,7 @@ class BasicVerifier(SessionVerifier[UUID, SessionData]):
         *,
         identifier: str,
         auto_error: bool,
-        backend: InMemoryBackend[UUID, SessionData],
+        backend: SessionBackend[UUID, SessionData],
         auth_http_exception: HTTPException,
     ):
         self._identifier = identifier
@@ -1,24 +1,186 @@
 # -*- coding: utf-8 -*-
+"""User Progress Store.
+
+Keeps the latest progress events of each user in a bounded ring buffer and pushes new events to the
+subscribers of the user (SSE or WebSocket, see ``msaSDK.router.progress``). Users without activity and
+without subscribers get evicted after ``idle_timeout`` seconds.
+"""
 import asyncio
+import json
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
 from functools import lru_cache
-from typing import Dict, List
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
 
 if __name__ == "__main__":
     pass
 
 
+class MSAUserProgressStats(BaseModel):
+    """
+    **MSAUserProgressStats** Pydantic Response Class, metrics of the MSAUserProgress store
+    """
+
+    users: int = 0
+    """Number of users with a progress buffer."""
+    subscribers: int = 0
+    """Number of connected subscribers."""
+    events: int = 0
+    """Number of progress events added."""
+    delivered: int = 0
+    """Number of events queued to subscribers."""
+    dropped: int = 0
+    """Number of events dropped because a subscriber was too slow, the oldest queued event is dropped first."""
+    evicted: int = 0
+    """Number of users evicted because they were idle or the store was full."""
+
+
+class MSAUserProgressSubscription:
+    """Subscription to the progress events of one user, created by ``MSAUserProgress.subscribe``.
+
+    Events are ``(seq, event)`` tuples. The queue is bounded, if the subscriber can't keep up the oldest
+    queued event is dropped, progress is latest-value-wins so the client still ends on the current state.
+
+    Args:
+        store: The MSAUserProgress store
+        user: User of the subscription
+        max_queue: Maximum number of queued events
+    """
+
+    def __init__(self, store: "MSAUserProgress", user: str, max_queue: int) -> None:
+        self.store = store
+        self.user = user
+        self.queue: "asyncio.Queue[Tuple[int, Dict]]" = asyncio.Queue(max_queue)
+        self.dropped: int = 0
+
+    def push(self, seq: int, event: Dict) -> None:
+        """Queue an event without blocking the producer."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.store.dropped += 1
+        self.queue.put_nowait((seq, event))
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, Dict]]:
+        """Wait for the next event.
+
+        Args:
+            timeout: Seconds to wait, Default None waits forever
+
+        Returns:
+            event: ``(seq, event)`` or None on timeout
+        """
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        """Unsubscribe."""
+        self.store.unsubscribe(self)
+
+    def __aiter__(self) -> AsyncIterator[Tuple[int, Dict]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Tuple[int, Dict]]:
+        while True:
+            yield await self.queue.get()
+
+
 class MSAUserProgress:
-    def __init__(self) -> None:
+    """Store of the user progress events.
+
+    Args:
+        capacity: Number of events kept per user, older events get dropped, Default 100
+        idle_timeout: Seconds without events after which a user without subscribers is evicted, Default 3600
+        max_users: Maximum number of users, the least recently active user is evicted first, Default 100000
+        max_queue: Maximum number of queued events per subscriber, Default 100
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        idle_timeout: float = 3600.0,
+        max_users: int = 100000,
+        max_queue: int = 100,
+    ) -> None:
         super().__init__()
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.max_users = max_users
+        self.max_queue = max_queue
+
+        self.user_progress: Dict[str, Deque[Dict]] = {}
+        self.subscribers: Dict[str, Set[MSAUserProgressSubscription]] = {}
+        self.events: int = 0
+        self.delivered: int = 0
+        self.dropped: int = 0
+        self.evicted: int = 0
+        # user -> sequence number of the last event
+        self._seq: Dict[str, int] = {}
+        # highest sequence number of the evicted users, a returning user continues above it
+        self._seq_evicted: int = 0
+        # users ordered by their last activity, oldest first
+        self._last_seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def _publish(self, user: str, entry: Dict) -> None:
+        now = time.monotonic()
+        msgs = self.user_progress.get(user)
+        if msgs is None:
+            msgs = self.user_progress[user] = deque(maxlen=self.capacity)
+        msgs.append(entry)
+        seq = self._seq[user] = self._seq.get(user, self._seq_evicted) + 1
+        self._last_seen[user] = now
+        self._last_seen.move_to_end(user)
+        self.events += 1
+        for subscription in self.subscribers.get(user, ()):
+            subscription.push(seq, entry)
+            self.delivered += 1
+        self.evictIdle(now)
 
-        self.user_progress = {}
+    def evictIdle(self, now: Optional[float] = None) -> int:
+        """Evict idle users without subscribers, and the least recently active users above ``max_users``.
+
+        Called on every event, only looks at the least recently active users.
+
+        Args:
+            now: ``time.monotonic()`` timestamp, Default now
+
+        Returns:
+            count: Number of evicted users
+        """
+        now = time.monotonic() if now is None else now
+        count = 0
+        while self._last_seen:
+            user, last_seen = next(iter(self._last_seen.items()))
+            if (
+                now - last_seen < self.idle_timeout
+                and len(self._last_seen) <= self.max_users
+            ):
+                break
+            if self.subscribers.get(user):
+                # keep subscribed users, look at them again after the next timeout
+                self._last_seen.move_to_end(user)
+                self._last_seen[user] = now
+                if len(self.subscribers) >= len(self._last_seen):
+                    break
+                continue
+            del self._last_seen[user]
+            self.user_progress.pop(user, None)
+            self._seq_evicted = max(self._seq_evicted, self._seq.pop(user, 0))
+            count += 1
+        self.evicted += count
+        return count
 
     async def addToProgress(
         self, event: str, message: Dict
     ):  # user: str, progressPercent: int, progressMessage: str = ""
         data: Dict = message
-        print(str(datetime.utcnow()), "addToProgress", data)
         if event and event.__eq__("user.progress"):
             if data:
                 if "user" in data.keys():
@@ -31,18 +193,9 @@ class MSAUserProgress:
                         progressMessage = data["pM"]
 
                     msg: str = ""
-                    utc_start: str = str(datetime.utcnow())
                     if len(progressMessage) > 0:
-                        msg = utc_start + ": " + progressMessage
-                    if user in self.user_progress.keys():
-                        msgs: List = self.user_progress[user]
-                        msgs.append({"data": progressPercent, "msg": msg})
-                    else:
-                        self.user_progress[user] = [
-                            {"data": progressPercent, "msg": msg}
-                        ]
-                    # print(user, msg, str(progressPercent))
-                    await asyncio.sleep(0.1)
+                        msg = str(datetime.utcnow()) + ": " + progressMessage
+                    self._publish(user, {"data": progressPercent, "msg": msg})
 
     def resetProgress(self, event: str, message: Dict):  # user: str
         data: Dict = message
@@ -51,9 +204,84 @@ class MSAUserProgress:
                 if "user" in data.keys():
                     user = data["user"]
                     if user in self.user_progress.keys():
-                        msgs: List = self.user_progress[user]
-                        msgs.clear()
-                        msgs.append({"data": 0, "msg": ""})
+                        self.user_progress[user].clear()
+                        self._publish(user, {"data": 0, "msg": ""})
+
+    def getProgress(self, user: str, after: int = 0) -> List[Tuple[int, Dict]]:
+        """Get the buffered events of a user.
+
+        Args:
+            user: The user
+            after: Only events with a higher sequence number, Default 0 all buffered events
+
+        Returns:
+            events: List of ``(seq, event)``, oldest first
+        """
+        msgs = self.user_progress.get(user)
+        if not msgs:
+            return []
+        first = self._seq[user] - len(msgs) + 1
+        return [(first + i, entry) for i, entry in enumerate(msgs) if first + i > after]
+
+    def subscribe(self, user: str) -> MSAUserProgressSubscription:
+        """Subscribe to the new progress events of a user, unsubscribe with ``close``."""
+        subscription = MSAUserProgressSubscription(self, user, self.max_queue)
+        self.subscribers.setdefault(user, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: MSAUserProgressSubscription) -> None:
+        subscriptions = self.subscribers.get(subscription.user)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscribers[subscription.user]
+
+    async def stream(
+        self, user: str, after: int = 0, keepalive: float = 15.0
+    ) -> AsyncIterator[Optional[Tuple[int, Dict]]]:
+        """Iterate the buffered and then the new events of a user, used by the SSE and WebSocket routes.
+
+        Args:
+            user: The user
+            after: Skip events up to this sequence number, like the SSE ``Last-Event-ID``
+            keepalive: Seconds without event after which None is yielded
+
+        Returns:
+            events: Async iterator of ``(seq, event)``, None as keepalive
+        """
+        subscription = self.subscribe(user)
+        try:
+            last = after
+            for seq, entry in self.getProgress(user, after):
+                last = seq
+                yield seq, entry
+            while True:
+                item = await subscription.get(keepalive)
+                if item is None:
+                    yield None
+                elif item[0] > last:
+                    last = item[0]
+                    yield item
+        finally:
+            subscription.close()
+
+    @staticmethod
+    def toSSE(item: Optional[Tuple[int, Dict]]) -> str:
+        """Format a ``stream`` item as Server-Sent Event, None as keepalive comment."""
+        if item is None:
+            return ": keepalive\n\n"
+        return "id: {}\ndata: {}\n\n".format(item[0], json.dumps(item[1]))
+
+    def stats(self) -> MSAUserProgressStats:
+        """Get the metrics of the store."""
+        return MSAUserProgressStats(
+            users=len(self.user_progress),
+            subscribers=sum(len(s) for s in self.subscribers.values()),
+            events=self.events,
+            delivered=self.delivered,
+            dropped=self.dropped,
+            evicted=self.evicted,
+        )
 
 
 @lru_cache()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Warmup phase for MSAApp.
+
+Pre-builds the artefacts the first requests would otherwise pay for (OpenAPI schema, Jinja templates,
+i18n catalogs, DB connections, Admin Site schema) before the service reports ready.
+"""
+import time
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
+
+import httpx
+
+from msaSDK.models.service import MSAWarmupReport, MSAWarmupStep
+
+if TYPE_CHECKING:
+    # msaSDK.service imports this module
+    from msaSDK.service import MSAApp
+
+if __name__ == "__main__":
+    pass
+
+
+class MSAWarmup:
+    """Runs the warmup phase of a MSAApp instance.
+
+    Each step is executed twice, the first call gives the cold latency, the second call the warm latency.
+    Builders are called directly, routes are called with synthetic in-process requests (no network involved).
+
+    Args:
+        msa_app: The MSAApp instance to warm up.
+        routes: List of route paths to call with GET, Default None uses ``settings.warmup_routes``.
+
+    Attributes:
+        report: MSAWarmupReport with the cold vs. warm latency of each step.
+    """
+
+    def __init__(self, msa_app: "MSAApp", routes: Optional[List[str]] = None) -> None:
+        self.msa_app = msa_app
+        self.routes: List[str] = (
+            routes if routes is not None else msa_app.settings.warmup_routes
+        )
+        self.report: MSAWarmupReport = MSAWarmupReport(name=msa_app.settings.name)
+
+    async def run(self) -> MSAWarmupReport:
+        """Run all warmup steps and return the report.
+
+        Returns:
+            report: MSAWarmupReport
+        """
+        start = time.perf_counter()
+        await self.warm_builder("openapi", self.build_openapi)
+        if self.msa_app.settings.templates or self.msa_app.settings.pages:
+            await self.warm_builder("templates", self.compile_templates)
+        if self.msa_app.settings.site or self.msa_app.settings.site_auth:
+            await self.warm_builder("i18n", self.load_i18n)
+        if self.msa_app.sqlite_db_engine:
+            await self.warm_builder("sqlite_db", self.connect_sqlite_db)
+        if self.msa_app.json_db_engine is not None:
+            await self.warm_builder("json_db", self.msa_app.json_db_engine.tables)
+
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.msa_app),
+            base_url="http://msa-warmup",
+        ) as client:
+            for route in self.routes:
+                await self.warm_route(client, route)
+            if self.msa_app.site:
+                # the admin app page builds the complete amis schema
+                await self.warm_route(
+                    client, self.msa_app.site.router_path + "/", method="POST"
+                )
+
+        self.report.duration_ms = (time.perf_counter() - start) * 1000
+        self.report.ready = True
+        self.report.message = "Warmup finished in {:.1f} ms".format(
+            self.report.duration_ms
+        )
+        return self.report
+
+    async def warm_builder(
+        self, name: str, builder: Callable[[], Any]
+    ) -> MSAWarmupStep:
+        """Call a builder twice and record its cold and warm latency.
+
+        Args:
+            name: Name of the step in the report
+            builder: sync or async callable without arguments
+
+        Returns:
+            step: MSAWarmupStep
+        """
+        step = MSAWarmupStep(name=name, kind="builder")
+        try:
+            step.cold_ms = await self._timed(builder)
+            step.warm_ms = await self._timed(builder)
+        except Exception as e:
+            step.error = e.__str__()
+            self.msa_app.logger.error("Warmup - " + name + " failed: " + step.error)
+        self.report.steps.append(step)
+        return step
+
+    async def warm_route(
+        self, client: httpx.AsyncClient, path: str, method: str = "GET"
+    ) -> MSAWarmupStep:
+        """Call a route twice in-process and record its cold and warm latency.
+
+        Args:
+            client: httpx client bound to the MSAApp
+            path: Route path
+            method: HTTP Method, Default GET
+
+        Returns:
+            step: MSAWarmupStep
+        """
+        step = MSAWarmupStep(name=method + " " + path, kind="route")
+        kwargs = {"json": {}} if method == "POST" else {}
+        try:
+            start = time.perf_counter()
+            resp = await client.request(method, path, **kwargs)
+            step.cold_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            resp = await client.request(method, path, **kwargs)
+            step.warm_ms = (time.perf_counter() - start) * 1000
+            step.status_code = resp.status_code
+        except Exception as e:
+            step.error = e.__str__()
+            self.msa_app.logger.error(
+                "Warmup - " + step.name + " failed: " + step.error
+            )
+        self.report.steps.append(step)
+        return step
+
+    def build_openapi(self) -> dict:
+        """Build (and cache on the app) the OpenAPI schema."""
+        return self.msa_app.openapi()
+
+    def compile_templates(self) -> int:
+        """Compile all Jinja templates of the MSAUITemplate Engine into the environment cache."""
+        env = self.msa_app.templates.env
+        names = [name for name in env.list_templates() if name.endswith(".html")]
+        for name in names:
+            env.get_template(name)
+        return len(names)
+
+    def load_i18n(self) -> str:
+        """Load the gettext catalogs of the Admin Site and resolve the active language."""
+        import msaSDK.admin  # noqa: F401 loads the translations on import
+        from msaSDK.admin.utils.translation import i18n
+
+        return i18n(self.msa_app.settings.site_title, i18n.get_language())
+
+    async def connect_sqlite_db(self) -> None:
+        """Establish a pooled connection to the SQLite DB."""
+        from sqlalchemy import text
+
+        async with self.msa_app.sqlite_db_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    @staticmethod
+    async def _timed(func: Callable[[], Any]) -> float:
+        start = time.perf_counter()
+        result = func()
+        if hasattr(result, "__await__"):
+            await result
+        return (time.perf_counter() - start) * 1000
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Query count and timing of the related labels of an admin list page (msaSDK.admin.loading.MSALoadPlan)
+against loading them row by row through lazy relationships, for several page sizes.
+
+The plan has to cost the same number of queries for every page size, the script fails otherwise.
+
+Usage:
+    python scripts/bench_eagerload.py [perPage,perPage,...]
+
+    python scripts/bench_eagerload.py 10,100,500
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy_database import AsyncDatabase
+from sqlmodel import Field, Relationship, SQLModel, select
+
+from msaSDK.admin.loading import MSALoadPlan, labelKey
+
+
+class BenchTagLink(SQLModel, table=True):
+    article_id: Optional[int] = Field(default=None, foreign_key="bencharticle.id", primary_key=True)
+    tag_id: Optional[int] = Field(default=None, foreign_key="benchtag.id", primary_key=True)
+
+
+class BenchAuthor(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+
+
+class BenchCategory(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+
+
+class BenchTag(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+
+
+class BenchArticle(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title: str
+    author_id: Optional[int] = Field(default=None, foreign_key="benchauthor.id")
+    category_id: Optional[int] = Field(default=None, foreign_key="benchcategory.id")
+    category: Optional[BenchCategory] = Relationship()
+    tags: List[BenchTag] = Relationship(link_model=BenchTagLink)
+
+
+async def fill(engine, rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            BenchAuthor.__table__.insert(), [{"name": "author{}".format(i)} for i in range(100)]
+        )
+        await conn.execute(
+            BenchCategory.__table__.insert(), [{"name": "category{}".format(i)} for i in range(20)]
+        )
+        await conn.execute(BenchTag.__table__.insert(), [{"name": "tag{}".format(i)} for i in range(50)])
+        await conn.execute(
+            BenchArticle.__table__.insert(),
+            [
+                {
+                    "title": "article{}".format(i),
+                    "author_id": i % 100 + 1,
+                    "category_id": i % 20 + 1,
+                }
+                for i in range(rows)
+            ],
+        )
+        await conn.execute(
+            BenchTagLink.__table__.insert(),
+            [
+                {"article_id": i + 1, "tag_id": (i * 7 + k) % 50 + 1}
+                for i in range(rows)
+                for k in range(3)
+            ],
+        )
+
+
+def lazy(session, items):
+    # what rendering the relationships row by row costs: one query per row and relationship
+    for item in items:
+        article = session.get(BenchArticle, item["id"])
+        item[labelKey("category")] = article.category.name if article.category else None
+        item[labelKey("tags")] = [tag.name for tag in article.tags]
+        author = session.get(BenchAuthor, item["author_id"])
+        item[labelKey("author_id")] = author.name if author else None
+    return items
+
+
+async def bench(per_pages: List[int]) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench_eagerload.db")
+    engine = create_async_engine("sqlite+aiosqlite:///" + path)
+    await fill(engine, max(per_pages))
+    db = AsyncDatabase(engine)
+    queries = []
+    event.listen(
+        engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2])
+    )
+    plan = MSALoadPlan(
+        BenchArticle,
+        [BenchArticle.category, BenchArticle.tags],
+        [BenchArticle.__table__.c.author_id],
+    )
+    plan_queries = set()
+    for per_page in per_pages:
+        page = select(BenchArticle.id, BenchArticle.title, BenchArticle.author_id).limit(per_page)
+        rows = [dict(row) for row in await db.async_execute(page, on_close_pre=lambda r: r.mappings().all())]
+
+        queries.clear()
+        start = time.perf_counter()
+        expected = await db.async_run_sync(lazy, [dict(row) for row in rows], commit=False)
+        lazy_s, lazy_n = time.perf_counter() - start, len(queries)
+
+        queries.clear()
+        start = time.perf_counter()
+        items = await plan.load(db, [dict(row) for row in rows])
+        plan_s, plan_n = time.perf_counter() - start, len(queries)
+
+        assert items == expected, "plan and lazy loading differ"
+        plan_queries.add(plan_n)
+        print(
+            "  perPage {:>4}: lazy {:4} queries {:8.2f} ms, plan {} queries {:6.2f} ms".format(
+                per_page, lazy_n, lazy_s * 1000, plan_n, plan_s * 1000
+            )
+        )
+    assert len(plan_queries) == 1, "the plan query count depends on the page size"
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = sys.argv[1] if len(sys.argv) > 1 else "10,100,500"
+    asyncio.run(bench([int(size) for size in sizes.split(",")]))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the FTS5 search of admin search_fields (msaSDK.admin.search.MSAFTSIndex) against the
+``LIKE '%term%'`` filter, for several table sizes. Each search counts the matches and reads the first page.
+
+Usage:
+    python scripts/bench_fts.py [rows,rows,...]
+
+    python scripts/bench_fts.py 10000,100000,1000000
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Field, SQLModel, select
+
+from msaSDK.admin.search import MSAFTSIndex
+
+WORDS = [
+    "invoice", "contract", "delivery", "payment", "customer", "supplier", "warranty", "shipment",
+    "order", "refund", "account", "service", "product", "quality", "report", "meeting",
+]
+
+
+class BenchArticle(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title: str
+    body: str
+
+
+async def fill(engine, rows: int) -> None:
+    rnd = random.Random(rows)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        for start in range(0, rows, 20000):
+            await conn.execute(
+                BenchArticle.__table__.insert(),
+                [
+                    {
+                        "title": " ".join(rnd.choices(WORDS, k=4)) + " {}".format(i),
+                        "body": " ".join(rnd.choices(WORDS, k=30)),
+                    }
+                    for i in range(start, min(rows, start + 20000))
+                ],
+            )
+
+
+async def run(engine, stmt, order, repeat: int = 5):
+    best = None
+    async with engine.connect() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            total = (
+                await conn.execute(select(func.count("*")).select_from(stmt.subquery()))
+            ).scalar()
+            await conn.execute(stmt.order_by(*order).limit(10))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best, total
+
+
+async def bench(rows: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench_fts.db")
+    engine = create_async_engine("sqlite+aiosqlite:///" + path)
+    await fill(engine, rows)
+    index = MSAFTSIndex(BenchArticle, [BenchArticle.title, BenchArticle.body])
+    start = time.perf_counter()
+    await index.create(engine)
+    print(
+        "{} rows: FTS5 index ({}) built in {:.2f} s".format(
+            rows, index.tokenizer, time.perf_counter() - start
+        )
+    )
+    base = select(BenchArticle)
+    for field, term in (("title", "warranty"), ("body", "shipment refund"), ("title", "{}".format(rows - 1))):
+        like = base.where(getattr(BenchArticle, field).like("%{}%".format(term)))
+        like_s, like_total = await run(engine, like, [BenchArticle.id])
+        fts, ranking = index.search(base, {field: term})
+        fts_s, fts_total = await run(engine, fts, ranking)
+        print(
+            "  {:>5} ~ {:<16} LIKE {:8.2f} ms ({} rows), FTS5 {:8.2f} ms ({} rows)".format(
+                field, term, like_s * 1000, like_total, fts_s * 1000, fts_total
+            )
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000"
+    for size in sizes.split(","):
+        asyncio.run(bench(int(size)))
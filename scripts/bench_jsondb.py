@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the JSON DB secondary indexes (msaSDK.jsondb.index) against TinyDB full scans.
+
+Usage:
+    python scripts/bench_jsondb.py [sizes ...]
+
+    python scripts/bench_jsondb.py 10000 100000 1000000
+"""
+import random
+import sys
+import time
+
+from tinydb import Query, TinyDB
+from tinydb.storages import MemoryStorage
+
+from msaSDK.jsondb.index import MSAJSONIndexedDB
+
+
+def timed(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def search(table, cond) -> list:
+    # the TinyDB query cache would answer the repeated runs
+    table.clear_cache()
+    return table.search(cond)
+
+
+def bench(size: int) -> None:
+    rnd = random.Random(size)
+    docs = [
+        {
+            "user": "user{}".format(i),
+            "age": rnd.randint(0, 99),
+            "city": rnd.choice(["Zurich", "Bern", "Basel", "Geneva", "Lugano"]),
+        }
+        for i in range(size)
+    ]
+    plain = TinyDB(storage=MemoryStorage)
+    plain.insert_multiple(docs)
+    indexed = MSAJSONIndexedDB(storage=MemoryStorage)
+    indexed.insert_multiple(docs)
+    table = indexed.table("_default")
+
+    start = time.perf_counter()
+    table.create_index("user")
+    table.create_index("age", kind="sorted")
+    build_ms = (time.perf_counter() - start) * 1000
+
+    user = Query().user == "user{}".format(size // 2)
+    age = (Query().age >= 30) & (Query().age < 31)
+    combined = (Query().age > 90) & (Query().city == "Bern")
+    print("{:>9} docs, index build {:8.1f} ms".format(size, build_ms))
+    for name, cond in (("equality", user), ("range", age), ("range & scan", combined)):
+        scan_ms = timed(lambda: search(plain.table("_default"), cond))
+        plan_ms = timed(lambda: search(table, cond))
+        hits = len(table.search(cond))
+        print(
+            "  {:<14} {:>7} hits  scan {:9.2f} ms  indexed {:8.2f} ms  x{:.0f}".format(
+                name, hits, scan_ms, plan_ms, scan_ms / plan_ms if plan_ms else 0
+            )
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for size in sizes:
+        bench(size)
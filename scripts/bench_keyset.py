@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the keyset pagination (msaSDK.crud.MSAKeysetSQLModelCrud) against OFFSET pagination of
+``POST /list`` on a SQLite table, for a shallow and for deep pages.
+
+Usage:
+    python scripts/bench_keyset.py [rows] [perPage]
+
+    python scripts/bench_keyset.py 1000000 100
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, FastAPI
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Field, SQLModel
+
+from msaSDK.crud import MSAKeysetSQLModelCrud
+
+
+class BenchRow(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(..., index=True)
+    value: int = 0
+
+
+class OffsetCrud(MSAKeysetSQLModelCrud):
+    # the keyset disabled, every page uses OFFSET like MSASQLModelCrud
+    def get_keyset(self, orderBy, orderDir):
+        return None
+
+
+async def fill(engine, rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        for start in range(0, rows, 50000):
+            await conn.execute(
+                BenchRow.__table__.insert(),
+                [
+                    {"name": "name{:08d}".format((i * 7919) % rows), "value": i}
+                    for i in range(start, min(rows, start + 50000))
+                ],
+            )
+
+
+async def timed(client: httpx.AsyncClient, url: str, repeat: int = 5):
+    best = None
+    data = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.post(url, json=None)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        data = response.json()["data"]
+    return best, data
+
+
+async def bench(rows: int, per_page: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench_keyset.db")
+    engine = create_async_engine("sqlite+aiosqlite:///" + path)
+    await fill(engine, rows)
+    keyset = MSAKeysetSQLModelCrud(BenchRow, engine).register_crud()
+    offset = OffsetCrud(BenchRow, engine, router=APIRouter(prefix="/offset")).register_crud()
+    app = FastAPI()
+    app.include_router(keyset.router)
+    app.include_router(offset.router)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print("{} rows, {} per page".format(rows, per_page))
+        last_page = rows // per_page
+        for order in ("", "&orderBy=name"):
+            print("order by {}".format(order[9:] or "id"))
+            for page in (2, last_page // 2, last_page):
+                query = "?page={}&perPage={}&show_total=0{}".format(page, per_page, order)
+                offset_s, offset_data = await timed(client, "/offset/list" + query)
+                # the cursor of the page before, as a client paging forward has it
+                _, before = await timed(
+                    client,
+                    "/benchrow/list?page={}&perPage={}&show_total=0{}".format(
+                        page - 1, per_page, order
+                    ),
+                    repeat=1,
+                )
+                keyset_s, keyset_data = await timed(
+                    client,
+                    "/benchrow/list?perPage={}&show_total=0{}&cursor={}".format(
+                        per_page, order, before["next_cursor"]
+                    ),
+                )
+                same = [item["id"] for item in offset_data["items"]] == [
+                    item["id"] for item in keyset_data["items"]
+                ]
+                print(
+                    "  page {:>7}: offset {:8.2f} ms, keyset {:6.2f} ms, same rows: {}".format(
+                        page, offset_s * 1000, keyset_s * 1000, same
+                    )
+                )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        bench(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        )
+    )
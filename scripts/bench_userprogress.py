@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the user progress store (msaSDK.userprogress) with concurrent producers and subscribers.
+
+Every user has one producer task and one subscriber, like a browser on the SSE route, the slow subscribers
+only read every ``slow_every`` events and show the backpressure.
+
+Usage:
+    python scripts/bench_userprogress.py [users] [events per user]
+
+    python scripts/bench_userprogress.py 10000 20
+"""
+import asyncio
+import resource
+import statistics
+import sys
+import time
+
+from msaSDK.userprogress import MSAUserProgress
+
+
+async def bench(users: int, events: int) -> None:
+    store = MSAUserProgress(capacity=100, max_queue=8)
+    latencies = []
+    received = [0]
+    ready = asyncio.Event()
+
+    async def subscriber(user: str, slow: bool) -> None:
+        stream = store.stream(user, keepalive=5.0)
+        await ready.wait()
+        async for item in stream:
+            if item is None:
+                break
+            seq, entry = item
+            latencies.append(time.perf_counter() - float(entry["msg"].split(": ", 1)[1]))
+            received[0] += 1
+            if slow:
+                await asyncio.sleep(0.01)
+            if entry["data"] == 100:
+                break
+        await stream.aclose()
+
+    async def producer(user: str) -> None:
+        await ready.wait()
+        for i in range(1, events + 1):
+            await store.addToProgress(
+                "user.progress",
+                {"user": user, "pP": i * 100 // events, "pM": repr(time.perf_counter())},
+            )
+            await asyncio.sleep(0)
+
+    names = ["user{}".format(i) for i in range(users)]
+    subscribers = [
+        asyncio.ensure_future(subscriber(name, i % 10 == 0)) for i, name in enumerate(names)
+    ]
+    producers = [asyncio.ensure_future(producer(name)) for name in names]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    ready.set()
+    await asyncio.gather(*producers)
+    produce_s = time.perf_counter() - start
+    await asyncio.gather(*subscribers)
+    total_s = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    stats = store.stats()
+    latencies.sort()
+    print("{} users x {} events".format(users, events))
+    print(
+        "  produce {:.2f} s ({:.0f} events/s), all delivered after {:.2f} s".format(
+            produce_s, stats.events / produce_s, total_s
+        )
+    )
+    print(
+        "  received {}  dropped {}  latency p50 {:.2f} ms  p99 {:.2f} ms".format(
+            received[0],
+            stats.dropped,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000,
+        )
+    )
+    print("  peak RSS {:.1f} MB".format(peak / 1024))
+    # the former store slept 0.1 s in every addToProgress call
+    print("  former store: at least {:.1f} s per producer".format(events * 0.1))
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(bench(users, events))
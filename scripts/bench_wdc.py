@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the batch WDC token/word conversion (msaSDK.services.wdc.convertTokens) against the former
+per-token coroutines, on a synthetic document of stanza-like sentences.
+
+Usage:
+    python scripts/bench_wdc.py [sentences] [tokens per sentence]
+
+    python scripts/bench_wdc.py 10000 20
+"""
+import asyncio
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from msaSDK.models.wdc import WDCToken, WDCWord
+from msaSDK.services.wdc import DEP_ROLES, convertTokens
+
+DEPS = list(DEP_ROLES) + ["root", "det", "punct", "amod", "case"]
+
+
+def synthetic_sentences(count: int, length: int) -> list:
+    rnd = random.Random(count)
+    sentences = []
+    for _ in range(count):
+        tokens, char = [], 0
+        for i in range(1, length + 1):
+            text = "w{}".format(rnd.randint(0, 9999))
+            word = SimpleNamespace(
+                id=i,
+                text=text,
+                misc=None,
+                lemma=text,
+                upos="NOUN",
+                xpos="NN",
+                feats="Number=Sing",
+                head=rnd.randint(0, length),
+                deprel="dep",
+                deps=rnd.choice(DEPS),
+            )
+            tokens.append(
+                SimpleNamespace(
+                    id=(i,),
+                    text=text,
+                    misc="",
+                    start_char=char,
+                    end_char=char + len(text),
+                    ner="O",
+                    words=[word],
+                )
+            )
+            char += len(text) + 1
+        sentences.append(SimpleNamespace(tokens=tokens))
+    return sentences
+
+
+# the former conversion, one coroutine per token and word and an if-chain for the role
+async def legacy_role(dep) -> str:
+    for key, role in DEP_ROLES.items():
+        if dep == key:
+            return role
+    return ""
+
+
+async def legacy_word(wrd):
+    nwrd = WDCWord()
+    nwrd.id = wrd.id
+    nwrd.text = wrd.text
+    nwrd.misc = wrd.misc
+    nwrd.lemma = wrd.lemma
+    nwrd.pos = wrd.upos
+    nwrd.type = wrd.xpos
+    nwrd.morph = wrd.feats
+    if nwrd.morph is None:
+        nwrd.morph = ""
+    if wrd.head:
+        nwrd.head = wrd.head
+    if wrd.deprel:
+        nwrd.label = wrd.deprel
+    if wrd.deps:
+        nwrd.deps = wrd.deps
+        nwrd.role = await legacy_role(nwrd.deps)
+    return nwrd
+
+
+async def legacy_token(tok):
+    ntok = WDCToken()
+    ntok.id = tok.id[0]
+    ntok.text = tok.text
+    ntok.misc["nlp"] = tok.misc
+    ntok.position.s = tok.start_char
+    ntok.position.e = tok.end_char
+    if tok.ner:
+        ntok.ner = tok.ner
+    for wrd in tok.words:
+        ntok.words.append(await legacy_word(wrd))
+    return ntok
+
+
+async def legacy(sentences: list) -> int:
+    count = 0
+    for sen in sentences:
+        for tok in sen.tokens:
+            await legacy_token(tok)
+            count += 1
+    return count
+
+
+def batch(sentences: list) -> int:
+    return sum(len(convertTokens(sen.tokens)) for sen in sentences)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sentences = synthetic_sentences(count, length)
+
+    start = time.perf_counter()
+    tokens = asyncio.run(legacy(sentences))
+    legacy_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batch(sentences)
+    batch_s = time.perf_counter() - start
+    print("{} sentences, {} tokens".format(count, tokens))
+    print("  per-token coroutines {:7.2f} s".format(legacy_s))
+    print("  batch conversion     {:7.2f} s  x{:.1f}".format(batch_s, legacy_s / batch_s))
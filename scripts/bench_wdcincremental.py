@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the incremental WDC conversion (msaSDK.services.wdcincremental) for single paragraph edits,
+against converting the whole document again.
+
+Usage:
+    python scripts/bench_wdcincremental.py [pages] [paragraphs per page] [sentences per paragraph]
+
+    python scripts/bench_wdcincremental.py 500 5 8
+"""
+import asyncio
+import copy
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from msaSDK.services.wdcincremental import WDCIncrementalBuilder
+
+
+def synthetic_pages(pages: int, paragraphs: int, sentences: int) -> list:
+    rnd = random.Random(pages)
+    return [
+        SimpleNamespace(
+            text=SimpleNamespace(
+                paragraphs=[
+                    SimpleNamespace(
+                        semantic_type="text",
+                        sentences=[synthetic_sentence(rnd, si) for si in range(sentences)],
+                        sentences_en=[],
+                    )
+                    for _ in range(paragraphs)
+                ]
+            )
+        )
+        for _ in range(pages)
+    ]
+
+
+def synthetic_sentence(rnd: random.Random, si: int) -> SimpleNamespace:
+    tokens = ["w{}".format(rnd.randint(0, 9999)) for _ in range(rnd.randint(5, 25))]
+    return SimpleNamespace(
+        id=si,
+        text=" ".join(tokens),
+        tokens=tokens,
+        upos=["NOUN"] * len(tokens),
+        xpos=["NN"] * len(tokens),
+    )
+
+
+async def bench(pages: int, paragraphs: int, sentences: int) -> None:
+    sdu_pages = synthetic_pages(pages, paragraphs, sentences)
+    builder = WDCIncrementalBuilder()
+    start = time.perf_counter()
+    doc = await builder.build(sdu_pages)
+    full_s = time.perf_counter() - start
+    print(
+        "{} pages, {} paragraphs: full conversion {:.3f} s".format(
+            pages, builder.converted, full_s
+        )
+    )
+
+    rnd = random.Random(0)
+    for name, edit in (
+        ("edit first page", 0),
+        ("edit middle page", pages // 2),
+        ("edit last page", pages - 1),
+    ):
+        edited = copy.deepcopy(sdu_pages)
+        paragraph = edited[edit].text.paragraphs[0]
+        paragraph.sentences[0] = synthetic_sentence(rnd, 0)
+        start = time.perf_counter()
+        doc = await builder.update(doc, edited)
+        update_s = time.perf_counter() - start
+        converted, reused = builder.stats()
+        expected = await WDCIncrementalBuilder().build(copy.deepcopy(edited))
+        print(
+            "  {:<17} {:.3f} s  x{:5.1f}  converted {} reused {}  identical {}".format(
+                name, update_s, full_s / update_s, converted, reused, doc == expected
+            )
+        )
+        sdu_pages = edited
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]] + [500, 5, 8][len(sys.argv) - 1 :]
+    asyncio.run(bench(*args[:3]))